@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bitacora', '0002_bitacora_empresa_bitacora_modulo'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bitacora',
+            index=models.Index(fields=['empresa', 'fecha', 'id'], name='bitacora_empresa_fecha_id_idx'),
+        ),
+    ]
@@ -30,7 +30,9 @@ class Bitacora(models.Model):
         verbose_name = 'Bitácora'
         verbose_name_plural = 'Bitácoras'
         ordering = ['-fecha']
+        indexes = [
+            models.Index(fields=['empresa', 'fecha', 'id'], name='bitacora_empresa_fecha_id_idx'),
+        ]
 
     def __str__(self):
         return f"[{self.modulo}] {self.usuario} → {self.accion} ({self.fecha.strftime('%Y-%m-%d %H:%M')})"
-    
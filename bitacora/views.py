@@ -3,6 +3,7 @@ from django.shortcuts import render
 from rest_framework import viewsets, permissions
 from .models import Bitacora
 from .serializers import BitacoraSerializer
+from utils.pagination import FechaCursorPagination
 from utils.permissions import ModulePermission
 
 class BitacoraViewSet(viewsets.ReadOnlyModelViewSet):
@@ -10,8 +11,19 @@ class BitacoraViewSet(viewsets.ReadOnlyModelViewSet):
     Permite consultar los registros de bitácora.
     Solo lectura; no se crean manualmente desde la API.
     """
-    queryset = Bitacora.objects.all().select_related('usuario')
+    # El UserSerializer anidado lee el rol y la empresa (con su plan) de cada usuario
+    queryset = Bitacora.objects.all().select_related('usuario__role', 'usuario__empresa__plan')
     serializer_class = BitacoraSerializer
     permission_classes = [ModulePermission]
     module_name = "Bitacora"
+    pagination_class = FechaCursorPagination
+
+    def get_queryset(self):
+        """Solo la bitácora de la empresa del usuario (el SUPER_ADMIN ve todo)."""
+        queryset = self.queryset
+        user = self.request.user
+        if user.is_superuser or getattr(user.role, "name", "") == "SUPER_ADMIN":
+            return queryset
+        empresa = getattr(user, "empresa", None)
+        return queryset.filter(empresa=empresa) if empresa else queryset.none()
 # Create your views here.
@@ -0,0 +1,12 @@
+# idempotencia/management/commands/purge_idempotency_keys.py
+from django.core.management.base import BaseCommand
+
+from utils.idempotency import purgar
+
+
+class Command(BaseCommand):
+    help = "🧹 Borra las Idempotency-Key vencidas (IDEMPOTENCY_TTL_HORAS). Pensado para cron."
+
+    def handle(self, *args, **options):
+        borradas = purgar()
+        self.stdout.write(self.style.SUCCESS(f"✅ Claves de idempotencia vencidas borradas: {borradas}"))
@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+
+
+class SolicitudIdempotente(models.Model):
+    """
+    Respuesta guardada de un POST con cabecera Idempotency-Key: si el cliente
+    reintenta con la misma clave se devuelve ésta en vez de repetir la
+    operación. Ver utils/idempotency.py.
+    """
+    EN_CURSO = 'en_curso'
+    COMPLETADA = 'completada'
+    ESTADOS = [
+        (EN_CURSO, 'En curso'),
+        (COMPLETADA, 'Completada'),
+    ]
+    # "<usuario_id>:<método> <ruta>:<Idempotency-Key>"
+    clave = models.CharField(max_length=255, unique=True)
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True
+    )
+    # sha256 del cuerpo: la misma clave con otro cuerpo es un error del cliente
+    huella = models.CharField(max_length=64)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default=EN_CURSO)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    respuesta = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    creada = models.DateTimeField(auto_now_add=True)
+    expira = models.DateTimeField(db_index=True)
+
+    class Meta:
+        db_table = 'solicitud_idempotente'
+        verbose_name = 'Solicitud idempotente'
+        verbose_name_plural = 'Solicitudes idempotentes'
+
+    def __str__(self):
+        return f"{self.clave} ({self.estado})"
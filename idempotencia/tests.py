@@ -0,0 +1,122 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+
+from tenants.models import Empresa
+from users.models import Role, User
+from utils.idempotency import huella_de, idempotente, purgar
+
+from .models import SolicitudIdempotente
+
+
+class VistaContada(APIView):
+    """POST que cuenta cuántas veces corrió de verdad y responde lo que se le pida."""
+
+    llamadas = 0
+    status_code = status.HTTP_201_CREATED
+
+    @idempotente
+    def post(self, request):
+        VistaContada.llamadas += 1
+        return Response({"llamada": VistaContada.llamadas, **request.data}, status=VistaContada.status_code)
+
+
+# ---------------------------------------------------------------------
+# 🔹 @idempotente (utils/idempotency.py)
+# ---------------------------------------------------------------------
+class IdempotenteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        empresa = Empresa.objects.create(nombre="Tienda", nit="100")
+        rol = Role.objects.create(name="ADMIN", empresa=empresa)
+        cls.usuario = User.objects.create_user("admin@tienda.com", "x", empresa=empresa, role=rol)
+
+    def setUp(self):
+        VistaContada.llamadas = 0
+        VistaContada.status_code = status.HTTP_201_CREATED
+
+    def _post(self, data, clave="clave-1", usuario=None):
+        extra = {"HTTP_IDEMPOTENCY_KEY": clave} if clave else {}
+        request = APIRequestFactory().post("/pagar/", data, format="json", **extra)
+        force_authenticate(request, user=usuario or self.usuario)
+        return VistaContada.as_view()(request)
+
+    def _huella(self, data):
+        request = APIRequestFactory().post("/pagar/", data, format="json")
+        force_authenticate(request, user=self.usuario)
+        return huella_de(VistaContada().initialize_request(request))
+
+    def test_reintento_devuelve_la_respuesta_guardada(self):
+        primera = self._post({"monto": 10})
+        segunda = self._post({"monto": 10})
+        self.assertEqual(VistaContada.llamadas, 1)
+        self.assertEqual(primera.status_code, 201)
+        self.assertEqual((segunda.status_code, segunda.data), (201, {"llamada": 1, "monto": 10}))
+        self.assertEqual(segunda["Idempotent-Replayed"], "true")
+        self.assertFalse(primera.has_header("Idempotent-Replayed"))
+        registro = SolicitudIdempotente.objects.get()
+        self.assertEqual((registro.estado, registro.status_code), (SolicitudIdempotente.COMPLETADA, 201))
+
+    def test_misma_clave_con_otro_cuerpo(self):
+        self._post({"monto": 10})
+        response = self._post({"monto": 99})
+        self.assertEqual(response.status_code, 409)
+        self.assertIn("otro cuerpo", response.data["detail"])
+        self.assertEqual(VistaContada.llamadas, 1)
+
+    def test_en_curso_responde_409_sin_correr_la_vista(self):
+        SolicitudIdempotente.objects.create(
+            clave=f"{self.usuario.pk}:POST /pagar/:clave-1", usuario=self.usuario,
+            huella=self._huella({"monto": 10}), expira=timezone.now() + timedelta(hours=1),
+        )
+        response = self._post({"monto": 10})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertEqual(VistaContada.llamadas, 0)
+
+    def test_en_curso_se_libera_pasado_el_timeout_del_request(self):
+        huella = self._huella({"monto": 10})
+        with self.settings(REQUEST_TIMEOUT_SEGUNDOS=90, IDEMPOTENCY_MARGEN_SEGUNDOS=30):
+            registro = SolicitudIdempotente.objects.create(
+                clave=f"{self.usuario.pk}:POST /pagar/:clave-1", usuario=self.usuario,
+                huella=huella, expira=timezone.now() + timedelta(hours=1),
+            )
+            # Más de un minuto esperando a Stripe: la primera puede seguir viva
+            SolicitudIdempotente.objects.filter(pk=registro.pk).update(creada=timezone.now() - timedelta(seconds=100))
+            self.assertEqual(self._post({"monto": 10}).status_code, 409)
+            self.assertEqual(VistaContada.llamadas, 0)
+
+            # Pasado el timeout + margen el worker ya se cortó: la clave cuenta como nueva
+            SolicitudIdempotente.objects.filter(pk=registro.pk).update(creada=timezone.now() - timedelta(seconds=121))
+            self.assertEqual(self._post({"monto": 10}).status_code, 201)
+            self.assertEqual(VistaContada.llamadas, 1)
+
+    def test_errores_5xx_no_se_guardan(self):
+        VistaContada.status_code = status.HTTP_502_BAD_GATEWAY
+        self.assertEqual(self._post({"monto": 10}).status_code, 502)
+        self.assertFalse(SolicitudIdempotente.objects.exists())
+
+        # El reintento corre la vista otra vez y ahora sí queda guardado
+        VistaContada.status_code = status.HTTP_201_CREATED
+        response = self._post({"monto": 10})
+        self.assertEqual((response.status_code, response.data["llamada"]), (201, 2))
+        self.assertFalse(response.has_header("Idempotent-Replayed"))
+        self.assertEqual(SolicitudIdempotente.objects.get().status_code, 201)
+
+    def test_clave_por_usuario_y_sin_cabecera(self):
+        otro = User.objects.create_user("caja@tienda.com", "x", empresa=self.usuario.empresa, role=self.usuario.role)
+        self._post({"monto": 10})
+        self.assertEqual(self._post({"monto": 10}, usuario=otro).data["llamada"], 2)
+        self.assertEqual(self._post({"monto": 10}, clave=None).data["llamada"], 3)
+        self.assertEqual(SolicitudIdempotente.objects.count(), 2)
+
+    def test_purgar_vencidas(self):
+        self._post({"monto": 10})
+        self.assertEqual(purgar(), 0)
+        self.assertEqual(purgar(timezone.now() + timedelta(days=2)), 1)
+        self.assertEqual(self._post({"monto": 10}).data["llamada"], 2)
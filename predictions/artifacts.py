@@ -0,0 +1,174 @@
+# predictions/artifacts.py
+"""
+Almacén versionado de artefactos ML.
+
+Estructura en disco:
+
+    ml_models/<nombre>/<version>/model.pkl
+    ml_models/<nombre>/<version>/manifest.json   (copia inmutable)
+    ml_models/<nombre>/<version>/bosque.pkl      (árboles en arreglos planos, ver inference.py)
+    ml_models/<nombre>/manifest.json             (versión ACTIVA)
+
+    ml_models/empresas/<empresa_id>/<nombre>/...  (modelo dedicado de una empresa,
+                                                   mismo formato que arriba)
+
+El manifest guarda las columnas de entrada, la fecha de entrenamiento y una
+huella de los datos usados. Publicar una versión nueva (o volver a una
+anterior) solo reescribe `ml_models/<nombre>/manifest.json` con un rename
+atómico; los workers lo notan por el mtime y cambian de modelo sin reiniciar.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import uuid
+
+import joblib
+import pandas as pd
+from django.conf import settings
+from django.utils import timezone
+
+from .inference import COMPILED_FILENAME, compilar
+
+MODEL_FILENAME = 'model.pkl'
+MANIFEST_FILENAME = 'manifest.json'
+EMPRESAS_DIRNAME = 'empresas'
+
+
+class ArtifactError(Exception):
+    pass
+
+
+def models_dir():
+    return getattr(settings, 'ML_MODELS_DIR', os.path.join(settings.BASE_DIR, 'ml_models'))
+
+
+def directorio_empresa(empresa_id, base_dir=None):
+    """Raíz de los modelos dedicados de `empresa_id` (se usa como `base_dir`)."""
+    return os.path.join(base_dir or models_dir(), EMPRESAS_DIRNAME, str(int(empresa_id)))
+
+
+def directorio_modelo(nombre, base_dir=None):
+    return os.path.join(base_dir or models_dir(), nombre)
+
+
+def directorio_version(nombre, version, base_dir=None):
+    return os.path.join(directorio_modelo(nombre, base_dir), version)
+
+
+def ruta_manifest(nombre, base_dir=None):
+    return os.path.join(directorio_modelo(nombre, base_dir), MANIFEST_FILENAME)
+
+
+def huella_datos(df):
+    """Huella estable (sha256) del dataset de entrenamiento."""
+    h = hashlib.sha256()
+    h.update(repr((tuple(df.columns), df.shape)).encode())
+    if not df.empty:
+        h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return h.hexdigest()
+
+
+def _escribir_json_atomico(path, data):
+    directorio = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directorio, prefix='.manifest-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def leer_manifest(nombre, version=None, base_dir=None):
+    """Manifest activo de `nombre` (o el de una versión concreta). None si no hay."""
+    if version is None:
+        path = ruta_manifest(nombre, base_dir)
+    else:
+        path = os.path.join(directorio_version(nombre, version, base_dir), MANIFEST_FILENAME)
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def listar_versiones(nombre, base_dir=None):
+    directorio = directorio_modelo(nombre, base_dir)
+    if not os.path.isdir(directorio):
+        return []
+    return sorted(
+        entrada for entrada in os.listdir(directorio)
+        if not entrada.startswith('.')
+        and os.path.isfile(os.path.join(directorio, entrada, MANIFEST_FILENAME))
+    )
+
+
+def listar_empresas(nombre, base_dir=None):
+    """IDs de las empresas que tienen una versión ACTIVA dedicada de `nombre`."""
+    raiz = os.path.join(base_dir or models_dir(), EMPRESAS_DIRNAME)
+    if not os.path.isdir(raiz):
+        return []
+    return sorted(
+        int(entrada) for entrada in os.listdir(raiz)
+        if entrada.isdigit()
+        and os.path.isfile(ruta_manifest(nombre, os.path.join(raiz, entrada)))
+    )
+
+
+def publicar_modelo(nombre, model, features, X=None, target=None, extra=None,
+                    activar=True, base_dir=None):
+    """
+    Guarda `model` como una versión nueva de `nombre` y (por defecto) la activa.
+
+    La versión se escribe primero en un directorio temporal y se renombra al
+    final, así nunca queda una versión a medio escribir visible para los workers.
+    """
+    trained_at = timezone.now()
+    version = f"{trained_at.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:6]}"
+    directorio = directorio_modelo(nombre, base_dir)
+    os.makedirs(directorio, exist_ok=True)
+
+    manifest = {
+        'name': nombre,
+        'version': version,
+        'features': list(features),
+        'target': target,
+        'trained_at': trained_at.isoformat(),
+        'data_fingerprint': huella_datos(X) if X is not None else None,
+        'rows': int(len(X)) if X is not None else None,
+        'model_class': type(model).__name__,
+    }
+    if extra:
+        manifest.update(extra)
+
+    tmp_dir = tempfile.mkdtemp(dir=directorio, prefix=f'.{version}-')
+    try:
+        joblib.dump(model, os.path.join(tmp_dir, MODEL_FILENAME))
+        compilado = compilar(model)
+        if compilado is not None:
+            joblib.dump(compilado, os.path.join(tmp_dir, COMPILED_FILENAME))
+        with open(os.path.join(tmp_dir, MANIFEST_FILENAME), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        os.rename(tmp_dir, directorio_version(nombre, version, base_dir))
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    if activar:
+        activar_version(nombre, version, base_dir)
+    return manifest
+
+
+def activar_version(nombre, version, base_dir=None):
+    """Apunta el manifest activo de `nombre` a `version` (sirve también para rollback)."""
+    manifest = leer_manifest(nombre, version, base_dir)
+    if manifest is None:
+        raise ArtifactError(f"No existe la versión '{version}' del modelo '{nombre}'.")
+    _escribir_json_atomico(ruta_manifest(nombre, base_dir), manifest)
+    return manifest
@@ -0,0 +1,223 @@
+# predictions/cache.py
+"""
+Caché de predicciones.
+
+Una predicción de demanda (o de ventas por subcategoría) solo cambia si:
+  - cambia la semana / el mes          -> va en la clave (`bucket`)
+  - se publica otra versión del modelo -> va en la clave (`version`)
+  - entran ventas nuevas al feature store de ese producto/subcategoría
+    -> se invalida con un contador de generación por entidad
+
+Clave:  pred:<modelo>:<empresa|global>:<version>:<entidad>:<id>:<bucket>
+Valor:  (generación global, generación de la entidad, payload)
+
+Invalidar no borra claves (no se pueden listar en memcached/redis): se
+cambia la generación y lo guardado con la anterior deja de valer. Las
+generaciones se leen ANTES de calcular la predicción y se guardan con
+ella, así una venta que entra mientras se calcula no deja un resultado
+viejo marcado como nuevo. Si una generación se pierde (eviction) se toma
+como fallo de caché, nunca como acierto.
+
+Backends (ML_PREDICTION_CACHE):
+  'django' -> el cache de Django ML_PREDICTION_CACHE_ALIAS (redis, ...). Tiene
+              que ser compartido entre workers: con un LocMemCache la caché
+              queda desactivada (ver utils/cache.py)
+  'local'  -> diccionario en memoria del proceso con TTL y tope LRU (solo
+              con un proceso: las invalidaciones no llegan a otros workers)
+  'none'   -> sin caché
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from utils.cache import cache_compartido
+
+GEN_GLOBAL = 'pred:gen'
+
+
+# ---------------------------------------------------------------------
+# 🔹 Backends
+# ---------------------------------------------------------------------
+class DjangoCacheBackend:
+    """Cualquier cache de `settings.CACHES`."""
+
+    def __init__(self, alias='default'):
+        from django.core.cache import caches
+        self.cache = caches[alias]
+
+    def get_many(self, keys):
+        return self.cache.get_many(keys)
+
+    def set_many(self, mapping, timeout=None):
+        self.cache.set_many(mapping, timeout=timeout)
+
+
+class LocalTTLBackend:
+    """Diccionario en memoria (por proceso) con vencimiento y tope LRU."""
+
+    def __init__(self, max_entries=10_000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()   # key -> (vence, valor)
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        ahora = time.monotonic()
+        encontrados = {}
+        with self._lock:
+            for key in keys:
+                item = self._data.get(key)
+                if item is None:
+                    continue
+                vence, valor = item
+                if vence is not None and vence <= ahora:
+                    del self._data[key]
+                    continue
+                self._data.move_to_end(key)
+                encontrados[key] = valor
+        return encontrados
+
+    def set_many(self, mapping, timeout=None):
+        vence = time.monotonic() + timeout if timeout is not None else None
+        with self._lock:
+            for key, valor in mapping.items():
+                self._data[key] = (vence, valor)
+                self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class NullBackend:
+    def get_many(self, keys):
+        return {}
+
+    def set_many(self, mapping, timeout=None):
+        pass
+
+
+def backend_desde_settings():
+    tipo = getattr(settings, 'ML_PREDICTION_CACHE', 'django')
+    if tipo == 'django':
+        alias = getattr(settings, 'ML_PREDICTION_CACHE_ALIAS', 'default')
+        if cache_compartido(alias, "predicciones") is None:
+            return NullBackend()
+        return DjangoCacheBackend(alias)
+    if tipo == 'local':
+        return LocalTTLBackend(getattr(settings, 'ML_PREDICTION_CACHE_MAX_ENTRIES', 10_000))
+    if tipo in ('none', '', None):
+        return NullBackend()
+    raise ValueError(f"ML_PREDICTION_CACHE desconocido: '{tipo}' (django | local | none)")
+
+
+# ---------------------------------------------------------------------
+# 🔹 Caché de predicciones
+# ---------------------------------------------------------------------
+def _nueva_generacion():
+    return time.time_ns()
+
+
+class Consulta:
+    """Resultado de `PredictionCache.consultar`: aciertos + lo necesario para guardar el resto."""
+
+    def __init__(self, cache, claves, generaciones):
+        self._cache = cache
+        self._claves = claves              # id -> clave de la entrada
+        self._generaciones = generaciones  # (global, {id: gen})
+        self.encontrados = {}
+
+    def faltantes(self):
+        return [i for i in self._claves if i not in self.encontrados]
+
+    def guardar(self, payloads):
+        """Guarda {id: payload} con las generaciones leídas al consultar."""
+        gen_global, gen_entidad = self._generaciones
+        if gen_global is None:
+            return
+        self._cache.backend.set_many(
+            {self._claves[i]: (gen_global, gen_entidad[i], payload) for i, payload in payloads.items()},
+            timeout=self._cache.ttl,
+        )
+
+
+class PredictionCache:
+
+    def __init__(self, backend=None, ttl=None):
+        self._backend = backend
+        self._ttl = ttl
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = backend_desde_settings()
+        return self._backend
+
+    @property
+    def ttl(self):
+        if self._ttl is not None:
+            return self._ttl
+        return getattr(settings, 'ML_PREDICTION_CACHE_TTL', 3600)
+
+    @staticmethod
+    def _clave_gen(entidad, entidad_id):
+        return f'pred:gen:{entidad}:{entidad_id}'
+
+    @staticmethod
+    def _clave(cargado, entidad, entidad_id, bucket):
+        return (
+            f'pred:{cargado.nombre}:{cargado.empresa_id or "global"}:{cargado.version or "sin-version"}'
+            f':{entidad}:{entidad_id}:{bucket}'
+        )
+
+    def consultar(self, cargado, entidad, ids, bucket):
+        """
+        Busca las predicciones de `ids` (una sola ida al backend).
+        `cargado` es el ModeloCargado del registro (nombre, empresa, versión).
+        """
+        ids = list(ids)
+        claves = {i: self._clave(cargado, entidad, i, bucket) for i in ids}
+        claves_gen = {i: self._clave_gen(entidad, i) for i in ids}
+        datos = self.backend.get_many([GEN_GLOBAL, *claves_gen.values(), *claves.values()])
+
+        # Generaciones que no existen (nunca creadas o perdidas): se crean nuevas
+        nuevas = {}
+        gen_global = datos.get(GEN_GLOBAL)
+        if gen_global is None:
+            gen_global = nuevas[GEN_GLOBAL] = _nueva_generacion()
+        gen_entidad = {}
+        for i, clave_gen in claves_gen.items():
+            gen = datos.get(clave_gen)
+            if gen is None:
+                gen = nuevas[clave_gen] = _nueva_generacion()
+            gen_entidad[i] = gen
+        if nuevas:
+            self.backend.set_many(nuevas, timeout=None)
+
+        consulta = Consulta(self, claves, (gen_global, gen_entidad))
+        for i, clave in claves.items():
+            entrada = datos.get(clave)
+            if entrada is not None and entrada[0] == gen_global and entrada[1] == gen_entidad[i]:
+                consulta.encontrados[i] = entrada[2]
+        return consulta
+
+    def invalidate(self, entidad, ids):
+        """Invalida las predicciones de esas entidades (p. ej. productos con ventas nuevas)."""
+        ids = list(ids)
+        if ids:
+            gen = _nueva_generacion()
+            self.backend.set_many({self._clave_gen(entidad, i): gen for i in ids}, timeout=None)
+
+    def invalidate_all(self):
+        """Invalida todo (feature store recalculado, modelos reemplazados a mano, ...)."""
+        self.backend.set_many({GEN_GLOBAL: _nueva_generacion()}, timeout=None)
+
+    def reset(self):
+        """Vuelve a leer el backend de settings (tests con override_settings)."""
+        self._backend = None
+
+
+prediction_cache = PredictionCache()
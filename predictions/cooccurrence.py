@@ -0,0 +1,202 @@
+# predictions/cooccurrence.py
+"""
+Co-ocurrencias de productos con matrices dispersas (scipy.sparse).
+
+El modelo 3 armaba TODOS los pares posibles con `permutations(productos, 2)`:
+O(P²) filas (20k SKUs = 400M filas). Aquí se parte de la matriz
+ventas × productos (binaria) y:
+
+    C = Xᵀ · X      -> C[i, j] = nº de ventas donde i y j se compraron juntos
+
+Con C se puede:
+  - muestrear pares negativos en una proporción fija respecto a los
+    positivos (entrenamiento del clasificador con memoria acotada), o
+  - calcular una similitud ítem-ítem (coseno o lift) sin clasificador.
+"""
+import numpy as np
+import scipy.sparse as sp
+
+METRICAS_SIMILITUD = ('cosine', 'lift')
+
+
+def matriz_ventas_productos(venta_ids, producto_ids, productos=None):
+    """
+    Matriz dispersa binaria (ventas × productos) y el arreglo ordenado de
+    productos que corresponde a cada columna. Con `productos` (ordenado y
+    que contenga todos los `producto_ids`) se usa ese eje de columnas.
+    """
+    ventas, fila = np.unique(np.asarray(venta_ids), return_inverse=True)
+    if productos is None:
+        productos, columna = np.unique(np.asarray(producto_ids), return_inverse=True)
+    else:
+        columna = np.searchsorted(productos, np.asarray(producto_ids))
+    X = sp.csr_matrix(
+        (np.ones(len(fila), dtype=np.float32), (fila, columna)),
+        shape=(len(ventas), len(productos)),
+    )
+    # Si un producto aparece dos veces en la misma venta cuenta una sola vez
+    X.data[:] = 1
+    return X, productos
+
+
+def coocurrencias(X):
+    """C = XᵀX sin la diagonal, y la diagonal aparte (ventas por producto)."""
+    C = (X.T @ X).tocsr()
+    ventas_por_producto = C.diagonal().copy()
+    C.setdiag(0)
+    C.eliminate_zeros()
+    return C, ventas_por_producto
+
+
+def reindexar(C, productos, productos_destino):
+    """Lleva C (eje `productos`) al eje más grande `productos_destino` (ambos ordenados)."""
+    pos = np.searchsorted(productos_destino, productos)
+    coo = C.tocoo()
+    P = len(productos_destino)
+    return sp.csr_matrix((coo.data, (pos[coo.row], pos[coo.col])), shape=(P, P))
+
+
+def pares_positivos(C, productos):
+    """(A, B, veces_juntos) para cada par que se compró junto al menos una vez."""
+    # Índices ordenados: el orden de los pares no depende de cómo se armó C
+    coo = C.tocsr().sorted_indices().tocoo()
+    return productos[coo.row], productos[coo.col], coo.data.astype(np.float64)
+
+
+def muestrear_negativos(C, productos, n, rng=None, max_intentos=20):
+    """
+    Muestrea `n` pares (A, B) con A != B que NUNCA se compraron juntos.
+    Se sortean candidatos al azar y se descartan los que están en C, sin
+    construir nunca la lista completa de pares.
+    """
+    rng = np.random.default_rng(rng)
+    P = len(productos)
+    n_posibles = P * (P - 1) - C.nnz
+    n = int(min(n, max(n_posibles, 0)))
+    if n == 0:
+        return productos[:0], productos[:0]
+
+    coo = C.tocoo()
+    codigos_positivos = np.sort(coo.row.astype(np.int64) * P + coo.col)
+
+    elegidos = np.empty(0, dtype=np.int64)
+    for _ in range(max_intentos):
+        faltan = n - len(elegidos)
+        if faltan <= 0:
+            break
+        candidatos = rng.integers(0, P * P, size=int(faltan * 1.3) + 16, dtype=np.int64)
+        filas, columnas = np.divmod(candidatos, P)
+        candidatos = candidatos[filas != columnas]
+        pos = np.searchsorted(codigos_positivos, candidatos)
+        pos[pos == len(codigos_positivos)] = 0
+        es_positivo = codigos_positivos[pos] == candidatos if len(codigos_positivos) else np.zeros(len(candidatos), bool)
+        candidatos = candidatos[~es_positivo]
+        elegidos = np.unique(np.concatenate([elegidos, candidatos]))
+        if len(elegidos) > n:
+            elegidos = rng.choice(elegidos, size=n, replace=False)
+
+    filas, columnas = np.divmod(elegidos, P)
+    return productos[filas], productos[columnas]
+
+
+def dataset_clasificador(venta_ids, producto_ids, negativos_por_positivo=3, rng=None):
+    """
+    Dataset (producto_A, producto_B, compraron_juntos, peso) para el modelo 3.
+
+    Cada par positivo aparece UNA vez con peso = nº de ventas en que se
+    compraron juntos (antes se repetía una fila por venta).
+    """
+    X, productos = matriz_ventas_productos(venta_ids, producto_ids)
+    C, _ = coocurrencias(X)
+    return dataset_clasificador_coocurrencias(C, productos, negativos_por_positivo, rng)
+
+
+def dataset_clasificador_coocurrencias(C, productos, negativos_por_positivo=3, rng=None):
+    """Igual que `dataset_clasificador` pero partiendo de C ya calculada (modo incremental)."""
+    pos_a, pos_b, veces = pares_positivos(C, productos)
+    neg_a, neg_b = muestrear_negativos(C, productos, len(pos_a) * negativos_por_positivo, rng=rng)
+
+    producto_a = np.concatenate([pos_a, neg_a]).astype(np.int64)
+    producto_b = np.concatenate([pos_b, neg_b]).astype(np.int64)
+    target = np.concatenate([np.ones(len(pos_a), np.int64), np.zeros(len(neg_a), np.int64)])
+    peso = np.concatenate([veces, np.ones(len(neg_a))])
+    return producto_a, producto_b, target, peso
+
+
+def similitud_items(C, ventas_por_producto, n_ventas, metrica='cosine'):
+    """
+    Similitud ítem-ítem dispersa a partir de las co-ocurrencias:
+
+      cosine: C[i,j] / sqrt(n_i · n_j)          (entre 0 y 1)
+      lift:   C[i,j] · N / (n_i · n_j)          (>1 = se compran juntos más que por azar)
+    """
+    if metrica not in METRICAS_SIMILITUD:
+        raise ValueError(f"Métrica desconocida '{metrica}'. Opciones: {METRICAS_SIMILITUD}")
+    n = np.asarray(ventas_por_producto, dtype=np.float64)
+    with np.errstate(divide='ignore'):
+        if metrica == 'cosine':
+            escala = np.where(n > 0, 1.0 / np.sqrt(n), 0.0)
+            S = sp.diags(escala) @ C @ sp.diags(escala)
+        else:
+            escala = np.where(n > 0, 1.0 / n, 0.0)
+            S = (sp.diags(escala) @ C @ sp.diags(escala)) * float(n_ventas)
+    return S.tocsr()
+
+
+class ItemSimilarityModel:
+    """
+    Modelo de recomendación basado en similitud ítem-ítem.
+
+    Tiene la misma interfaz que usa la vista (`predict_proba` sobre
+    producto_A / producto_B), así se publica y se sirve igual que el
+    RandomForestClassifier. Con 'lift' el "score" no es una probabilidad,
+    solo sirve para ordenar.
+    """
+    classes_ = np.array([0, 1])
+
+    def __init__(self, productos, similitud, metrica='cosine'):
+        self.productos = np.asarray(productos, dtype=np.int64)
+        self.similitud = similitud.tocsr()
+        self.metrica = metrica
+
+    @classmethod
+    def entrenar(cls, venta_ids, producto_ids, metrica='cosine'):
+        X, productos = matriz_ventas_productos(venta_ids, producto_ids)
+        C, ventas_por_producto = coocurrencias(X)
+        return cls.desde_coocurrencias(productos, C, ventas_por_producto, X.shape[0], metrica)
+
+    @classmethod
+    def desde_coocurrencias(cls, productos, C, ventas_por_producto, n_ventas, metrica='cosine'):
+        return cls(productos, similitud_items(C, ventas_por_producto, n_ventas, metrica), metrica)
+
+    def _posiciones(self, ids):
+        ids = np.asarray(ids, dtype=np.int64)
+        pos = np.searchsorted(self.productos, ids)
+        pos = np.minimum(pos, len(self.productos) - 1)
+        conocido = self.productos[pos] == ids if len(self.productos) else np.zeros(len(ids), bool)
+        return pos, conocido
+
+    def predict_proba(self, X):
+        pos_a, ok_a = self._posiciones(X['producto_A'])
+        pos_b, ok_b = self._posiciones(X['producto_B'])
+        score = np.zeros(len(pos_a), dtype=np.float64)
+        ok = ok_a & ok_b
+        if ok.any():
+            score[ok] = np.asarray(self.similitud[pos_a[ok], pos_b[ok]]).ravel()
+        return np.column_stack([1.0 - np.clip(score, 0.0, 1.0), score])
+
+    def top_k(self, k, producto_ids=None):
+        """Índice (producto_ids, vecinos, scores) leyendo directo las filas de la matriz."""
+        productos = self.productos if producto_ids is None else np.unique(np.asarray(producto_ids, dtype=np.int64))
+        vecinos = np.full((len(productos), k), -1, dtype=np.int64)
+        scores = np.zeros((len(productos), k), dtype=np.float64)
+        pos, conocido = self._posiciones(productos)
+        S = self.similitud
+        for fila in np.flatnonzero(conocido):
+            i = pos[fila]
+            inicio, fin = S.indptr[i], S.indptr[i + 1]
+            columnas, valores = S.indices[inicio:fin], S.data[inicio:fin]
+            orden = np.lexsort((columnas, -valores))[:k]
+            vecinos[fila, :len(orden)] = self.productos[columnas[orden]]
+            scores[fila, :len(orden)] = valores[orden]
+        return productos, vecinos, scores
@@ -0,0 +1,67 @@
+# predictions/dataset.py
+"""
+Extracción de los datos de entrenamiento en UNA sola pasada.
+
+Antes train_models.py leía la tabla `detalle_venta` completa tres veces
+(una por modelo) y cada vez armaba un DataFrame desde una lista de dicts.
+Aquí se recorre la tabla una vez con un cursor del lado del servidor
+(`.iterator(chunk_size=...)`) y cada bloque se convierte enseguida a
+columnas NumPy tipadas, así en memoria nunca hay más de `chunk_size`
+objetos Python a la vez.
+"""
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+
+from ventas.models import DetalleVenta
+
+DEFAULT_CHUNK_SIZE = 20_000
+
+# Los IDs que pueden venir NULL (producto sin subcategoría, detalle sin empresa)
+# se guardan con este valor para poder usar int32 en lugar de float64.
+SIN_ID = -1
+
+COLUMNAS = {
+    # columna DataFrame: (campo ORM, dtype)
+    'venta_id': ('venta_id', np.int32),
+    'producto_id': ('producto_id', np.int32),
+    'subcategoria_id': ('producto__subcategoria_id', np.int32),
+    # La empresa de la venta (detalle_venta.empresa puede venir NULL en filas viejas)
+    'empresa_id': ('venta__empresa_id', np.int32),
+    'cantidad': ('cantidad', np.int32),
+    'fecha': ('venta__fecha', 'datetime64[ns]'),
+}
+
+
+def _columna(valores, dtype):
+    if dtype == 'datetime64[ns]':
+        # Fechas con zona horaria -> UTC sin zona (los cortes de semana/mes
+        # quedan igual que con el índice tz-aware que se usaba antes)
+        return pd.to_datetime(list(valores), utc=True).tz_convert(None).values
+    return np.fromiter((SIN_ID if v is None else v for v in valores), dtype=dtype, count=len(valores))
+
+
+def extraer_detalles(queryset=None, chunk_size=DEFAULT_CHUNK_SIZE, columnas=COLUMNAS):
+    """
+    Devuelve un DataFrame con una fila por DetalleVenta y las columnas de
+    `columnas` (por defecto `COLUMNAS`: ids int32, cantidad int32, fecha datetime64).
+    """
+    if queryset is None:
+        queryset = DetalleVenta.objects.all()
+    campos = [campo for campo, _ in columnas.values()]
+    filas = queryset.order_by().values_list(*campos).iterator(chunk_size=chunk_size)
+
+    bloques = {nombre: [] for nombre in columnas}
+    while True:
+        bloque = list(islice(filas, chunk_size))
+        if not bloque:
+            break
+        for nombre, valores in zip(columnas, zip(*bloque)):
+            bloques[nombre].append(_columna(valores, columnas[nombre][1]))
+
+    data = {}
+    for nombre, (_, dtype) in columnas.items():
+        partes = bloques[nombre]
+        data[nombre] = np.concatenate(partes) if partes else np.empty(0, dtype=dtype)
+    return pd.DataFrame(data, columns=list(columnas))
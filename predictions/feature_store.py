@@ -0,0 +1,196 @@
+# predictions/feature_store.py
+"""
+Feature store de ventas para las vistas de predicción.
+
+Las pistas `ventas_semana_anterior` (modelo 2) y `ventas_mes_anterior`
+(modelo 1) se calculaban en cada request con un JOIN detalle_venta ×
+venta y un SUM sobre un rango de fechas. Aquí se guardan ya agregadas:
+
+    VentaSemanalProducto       (producto, lunes de la semana) -> unidades
+    VentaMensualSubcategoria   (subcategoría, día 1 del mes)  -> unidades
+
+Se actualizan cuando se confirma una venta (señales `venta_registrada` y
+`ventas_registradas`, la del lote que sincroniza un POS) y una consulta
+de predicción solo lee una fila por producto/subcategoría.
+Las semanas y meses se cortan en UTC, igual que en el entrenamiento.
+
+Ventas cargadas por otros caminos (admin, seeds, importaciones) no pasan
+por la señal: para recalcular todo, `manage.py rebuild_feature_store`.
+"""
+import datetime
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Max, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.utils import timezone
+
+from utils.bulk import BATCH_SIZE, acumular, insertar_por_bloques
+from ventas.models import DetalleVenta
+
+from .models import VentaMensualSubcategoria, VentaSemanalProducto
+
+UTC = datetime.timezone.utc
+
+
+# ---------------------------------------------------------------------
+# 🔹 Cortes de semana / mes
+# ---------------------------------------------------------------------
+def _fecha_utc(fecha=None):
+    fecha = fecha or timezone.now()
+    if timezone.is_aware(fecha):
+        fecha = fecha.astimezone(UTC)
+    return fecha.date() if isinstance(fecha, datetime.datetime) else fecha
+
+
+def inicio_semana(fecha=None):
+    """Lunes (UTC) de la semana de `fecha`."""
+    dia = _fecha_utc(fecha)
+    return dia - timedelta(days=dia.weekday())
+
+
+def inicio_mes(fecha=None):
+    """Día 1 (UTC) del mes de `fecha`."""
+    return _fecha_utc(fecha).replace(day=1)
+
+
+def semana_anterior(hoy=None):
+    return inicio_semana(hoy) - timedelta(days=7)
+
+
+def mes_anterior(hoy=None):
+    return (inicio_mes(hoy) - timedelta(days=1)).replace(day=1)
+
+
+# ---------------------------------------------------------------------
+# 🔹 Lectura (vistas de predicción)
+# ---------------------------------------------------------------------
+def ventas_semana_anterior(producto_ids=None, hoy=None, empresa_id=None):
+    """
+    {producto_id: unidades de la semana anterior} de `producto_ids` (o de
+    todo el catálogo de `empresa_id`), en una sola consulta por índice.
+    """
+    filas = VentaSemanalProducto.objects.filter(semana=semana_anterior(hoy))
+    if producto_ids is not None:
+        filas = filas.filter(producto_id__in=producto_ids)
+    if empresa_id is not None:
+        filas = filas.filter(empresa_id=empresa_id)
+    return dict(filas.values_list('producto_id', 'cantidad'))
+
+
+def ventas_mes_anterior(subcategoria_id, hoy=None):
+    """Unidades de la subcategoría en el mes anterior (0 si no vendió)."""
+    return (
+        VentaMensualSubcategoria.objects.filter(subcategoria_id=subcategoria_id, mes=mes_anterior(hoy))
+        .values_list('cantidad', flat=True).first()
+    ) or 0
+
+
+def historial_semanal(producto_ids=None, desde=None, hasta=None, empresa_id=None):
+    """(producto_id, semana, unidades) entre dos lunes, inclusive (ventanas de rezagos)."""
+    filas = VentaSemanalProducto.objects.filter(semana__gte=desde, semana__lte=hasta)
+    if producto_ids is not None:
+        filas = filas.filter(producto_id__in=producto_ids)
+    if empresa_id is not None:
+        filas = filas.filter(empresa_id=empresa_id)
+    return list(filas.values_list('producto_id', 'semana', 'cantidad'))
+
+
+def historial_mensual(subcategoria_ids, desde=None, hasta=None):
+    """(subcategoria_id, mes, unidades) entre dos días 1, inclusive."""
+    return list(
+        VentaMensualSubcategoria.objects.filter(subcategoria_id__in=subcategoria_ids, mes__gte=desde, mes__lte=hasta)
+        .values_list('subcategoria_id', 'mes', 'cantidad')
+    )
+
+
+# ---------------------------------------------------------------------
+# 🔹 Escritura
+# ---------------------------------------------------------------------
+def registrar_venta(venta):
+    """
+    Suma los detalles de `venta` a su semana y su mes (las mismas consultas
+    con 1 o con 50 productos en el ticket).
+    Devuelve (producto_ids, subcategoria_ids) que cambiaron.
+    """
+    return registrar_ventas([venta])
+
+
+def registrar_ventas(ventas):
+    """
+    `registrar_venta` para un lote (p. ej. las ventas que sincroniza un POS
+    sin conexión): una consulta de detalles y las escrituras de cada semana y
+    mes distintos del lote, no las de cada venta.
+    """
+    ventas = {v.id: v for v in ventas}
+    if not ventas:
+        return [], []
+    por_producto = (
+        DetalleVenta.objects.filter(venta_id__in=list(ventas))
+        .values('venta_id', 'producto_id', 'producto__subcategoria_id')
+        .annotate(total=Sum('cantidad'))
+        .order_by()
+    )
+    por_semana = defaultdict(lambda: {'cantidad': 0})        # (empresa, producto, semana) -> n
+    por_subcategoria = defaultdict(lambda: {'cantidad': 0})  # (empresa, subcategoría, mes) -> n
+    for fila in por_producto:
+        if not fila['total']:
+            continue
+        venta = ventas[fila['venta_id']]
+        por_semana[venta.empresa_id, fila['producto_id'], inicio_semana(venta.fecha)]['cantidad'] += fila['total']
+        if fila['producto__subcategoria_id']:
+            clave = (venta.empresa_id, fila['producto__subcategoria_id'], inicio_mes(venta.fecha))
+            por_subcategoria[clave]['cantidad'] += fila['total']
+
+    with transaction.atomic():
+        acumular(VentaSemanalProducto, ('producto_id', 'semana'), por_semana)
+        acumular(VentaMensualSubcategoria, ('subcategoria_id', 'mes'), por_subcategoria)
+    producto_ids = {producto_id for _, producto_id, _ in por_semana}
+    subcategoria_ids = {subcategoria_id for _, subcategoria_id, _ in por_subcategoria}
+    return list(producto_ids), list(subcategoria_ids)
+
+
+def reconstruir(empresa_id=None):
+    """
+    Recalcula el feature store desde detalle_venta (todo, o una empresa).
+    Devuelve (filas_semanales, filas_mensuales).
+    """
+    detalles = DetalleVenta.objects.order_by()
+    semanales = VentaSemanalProducto.objects.all()
+    mensuales = VentaMensualSubcategoria.objects.all()
+    if empresa_id is not None:
+        detalles = detalles.filter(venta__empresa_id=empresa_id)
+        semanales = semanales.filter(empresa_id=empresa_id)
+        mensuales = mensuales.filter(empresa_id=empresa_id)
+
+    por_semana = (
+        detalles.annotate(semana=TruncWeek('venta__fecha', tzinfo=UTC))
+        .values('producto_id', 'semana')
+        .annotate(total=Sum('cantidad'), empresa_id=Max('venta__empresa_id'))
+    )
+    por_mes = (
+        detalles.filter(producto__subcategoria__isnull=False)
+        .annotate(mes=TruncMonth('venta__fecha', tzinfo=UTC))
+        .values('producto__subcategoria_id', 'mes')
+        .annotate(total=Sum('cantidad'), empresa_id=Max('venta__empresa_id'))
+    )
+
+    with transaction.atomic():
+        semanales.delete()
+        mensuales.delete()
+        insertar_por_bloques(VentaSemanalProducto, (
+            VentaSemanalProducto(
+                empresa_id=f['empresa_id'], producto_id=f['producto_id'],
+                semana=_fecha_utc(f['semana']), cantidad=f['total'],
+            )
+            for f in por_semana.iterator(chunk_size=BATCH_SIZE)
+        ))
+        insertar_por_bloques(VentaMensualSubcategoria, (
+            VentaMensualSubcategoria(
+                empresa_id=f['empresa_id'], subcategoria_id=f['producto__subcategoria_id'],
+                mes=_fecha_utc(f['mes']), cantidad=f['total'],
+            )
+            for f in por_mes.iterator(chunk_size=BATCH_SIZE)
+        ))
+    return semanales.count(), mensuales.count()
@@ -0,0 +1,352 @@
+# predictions/features.py
+"""
+Pistas (features) de los modelos 1 y 2, las MISMAS en entrenamiento y en línea.
+
+Antes cada lado armaba sus pistas por su cuenta: el entrenamiento con
+`groupby(...).resample(...)` y `shift(1)` (lento con grupos grandes) y las
+vistas con el feature store. Aquí las dos rutas terminan en la misma
+función, `pistas_de_ventana`, que recibe para cada fila las ventas de los
+`alcance` periodos anteriores (de la más vieja a la más reciente):
+
+    entrenamiento  la ventana sale de la serie densa de cada grupo
+                   (`serie_densa` + `ventana_previa`, NumPy sobre los
+                   offsets de cada grupo ya ordenado; sin resample)
+    en línea       la ventana sale del feature store (VentaSemanalProducto /
+                   VentaMensualSubcategoria), una consulta para todo el lote
+
+Pistas disponibles (`Pistas` dice cuáles usa un modelo):
+
+    ventas_semana_anterior / ventas_mes_anterior     rezago 1 (nombre histórico)
+    ventas_semana_lag_<j> / ventas_mes_lag_<j>       rezagos 2..k
+    media_ultimas_<w>_semanas / media_ultimos_<w>_meses
+                                                     media de los w periodos anteriores
+    precio_venta, descuento_pct                      precio de lista y descuento activo
+                                                     (products.Descuento); en el modelo 1,
+                                                     promedio de la subcategoría
+
+Los periodos se numeran como enteros: semanas desde el lunes 1970-01-05 y
+meses desde 1970-01 (cortes en UTC, los mismos del feature store). Un
+periodo sin ventas o anterior a la primera venta del grupo cuenta como 0.
+
+Ojo: `Descuento` no tiene fechas, así que las pistas de precio son las de
+HOY también para las filas históricas del entrenamiento. Por eso vienen
+apagadas (`train_models --con-precios` las activa) hasta que haya historia
+de precios; un modelo que no las usa tampoco consulta precios en línea.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+from django.db.models import Case, DecimalField, F, Max, Q, When
+
+from . import feature_store
+
+# Lunes 1970-01-05: día 4 desde la época (1970-01-01 fue jueves)
+_DIA_PRIMER_LUNES = 4
+
+PERIODOS = {
+    # periodo: (columna id, rezago 1, prefijo rezagos, formato media, pistas de calendario)
+    'semana': ('producto_id', 'ventas_semana_anterior', 'ventas_semana_lag_',
+               'media_ultimas_{}_semanas', ['mes', 'semana_del_anio']),
+    'mes': ('subcategoria_id', 'ventas_mes_anterior', 'ventas_mes_lag_',
+            'media_ultimos_{}_meses', ['mes']),
+}
+COLUMNAS_PRECIO = ['precio_venta', 'descuento_pct']
+
+
+class Pistas:
+    """Qué pistas usa un modelo (y en qué orden van sus columnas)."""
+
+    def __init__(self, periodo, rezagos=1, ventanas=(), precios=False):
+        if periodo not in PERIODOS:
+            raise ValueError(f"Periodo desconocido: '{periodo}' ({' | '.join(PERIODOS)})")
+        self.periodo = periodo
+        self.rezagos = max(1, int(rezagos))
+        self.ventanas = tuple(sorted({int(w) for w in ventanas if int(w) > 0}))
+        self.precios = bool(precios)
+
+    @property
+    def alcance(self):
+        """Periodos anteriores que hacen falta para calcular todas las pistas."""
+        return max((self.rezagos, *self.ventanas))
+
+    def nombre_rezago(self, j):
+        _, rezago_1, prefijo, _, _ = PERIODOS[self.periodo]
+        return rezago_1 if j == 1 else f"{prefijo}{j}"
+
+    def nombre_media(self, w):
+        return PERIODOS[self.periodo][3].format(w)
+
+    @property
+    def columnas(self):
+        columna_id, _, _, _, calendario = PERIODOS[self.periodo]
+        return (
+            [columna_id, *calendario]
+            + [self.nombre_rezago(j) for j in range(1, self.rezagos + 1)]
+            + [self.nombre_media(w) for w in self.ventanas]
+            + (COLUMNAS_PRECIO if self.precios else [])
+        )
+
+    @classmethod
+    def desde_columnas(cls, periodo, columnas):
+        """Las pistas que pide un modelo ya entrenado (por los nombres de sus columnas)."""
+        _, _, prefijo, formato_media, _ = PERIODOS[periodo]
+        rezagos, ventanas = 1, []
+        patron_media = re.compile(re.escape(formato_media).replace(r'\{\}', r'(\d+)') + '$')
+        for columna in columnas:
+            if columna.startswith(prefijo) and columna[len(prefijo):].isdigit():
+                rezagos = max(rezagos, int(columna[len(prefijo):]))
+            coincide = patron_media.match(columna)
+            if coincide:
+                ventanas.append(int(coincide.group(1)))
+        return cls(periodo, rezagos, ventanas, precios='precio_venta' in columnas)
+
+    def __repr__(self):
+        return f"Pistas({self.periodo!r}, rezagos={self.rezagos}, ventanas={self.ventanas}, precios={self.precios})"
+
+
+def columnas_del_modelo(cargado):
+    """Columnas con las que se entrenó el modelo de un `ModeloCargado`."""
+    if cargado.compilado is not None and cargado.compilado.columnas is not None:
+        return cargado.compilado.columnas
+    columnas = getattr(cargado.modelo, 'feature_names_in_', None)
+    if columnas is None:
+        columnas = cargado.manifest.get('features', [])
+    return list(columnas)
+
+
+# ---------------------------------------------------------------------
+# 🔹 Periodos como enteros
+# ---------------------------------------------------------------------
+# Reglas de pandas con los mismos cortes que indice_semana / indice_mes
+# (semanas de lunes a domingo, etiquetadas con el domingo; meses
+# calendario). 'ME' es el alias de fin de mes desde pandas 2.2 ('M' está
+# deprecado).
+REGLA_SEMANA = 'W'
+REGLA_MES = 'ME'
+
+
+def indice_semana(fechas):
+    """Número de semana (lunes a domingo, UTC) de fechas datetime64 / date."""
+    dias = np.asarray(fechas, dtype='datetime64[D]').astype(np.int64)
+    return (dias - _DIA_PRIMER_LUNES) // 7
+
+
+def indice_mes(fechas):
+    return np.asarray(fechas, dtype='datetime64[M]').astype(np.int64)
+
+
+def lunes_de_semana(indices):
+    dias = np.asarray(indices, dtype=np.int64) * 7 + _DIA_PRIMER_LUNES
+    return dias.astype('datetime64[D]')
+
+
+def calendario(periodo, indices):
+    """Pistas de calendario de cada periodo (como las etiquetaba el resample de pandas)."""
+    indices = np.atleast_1d(np.asarray(indices, dtype=np.int64))
+    if periodo == 'mes':
+        return {'mes': indices % 12 + 1}
+    # resample('W') etiqueta cada semana con su domingo
+    domingos = pd.DatetimeIndex(lunes_de_semana(indices) + np.timedelta64(6, 'D'))
+    return {
+        'mes': domingos.month.values.astype(np.int64),
+        'semana_del_anio': domingos.isocalendar().week.values.astype(np.int64),
+    }
+
+
+# ---------------------------------------------------------------------
+# 🔹 Núcleo común: ventana de periodos anteriores -> pistas
+# ---------------------------------------------------------------------
+def pistas_de_ventana(ventana, pistas):
+    """
+    `ventana`: (filas, alcance) con las ventas de los periodos anteriores,
+    la última columna es el periodo inmediatamente anterior.
+    """
+    ventana = np.asarray(ventana, dtype=np.int64)
+    columnas = {}
+    for j in range(1, pistas.rezagos + 1):
+        columnas[pistas.nombre_rezago(j)] = ventana[:, -j]
+    for w in pistas.ventanas:
+        columnas[pistas.nombre_media(w)] = ventana[:, -w:].sum(axis=1) / w
+    return columnas
+
+
+# ---------------------------------------------------------------------
+# 🔹 Entrenamiento: series densas por grupo
+# ---------------------------------------------------------------------
+def serie_densa(grupos, periodos, cantidades):
+    """
+    Una fila por (grupo, periodo) desde el primer hasta el último periodo
+    con ventas de cada grupo (los huecos en 0), ordenada por grupo y periodo.
+    Devuelve (grupos, periodos, cantidades, inicio_del_grupo) por fila.
+    """
+    tabla = (
+        pd.DataFrame({'g': grupos, 'p': periodos, 'c': cantidades})
+        .groupby(['g', 'p'], sort=True)['c'].sum()
+    )
+    g = tabla.index.get_level_values('g').values.astype(np.int64)
+    p = tabla.index.get_level_values('p').values.astype(np.int64)
+    c = tabla.values.astype(np.int64)
+    if not len(g):
+        vacio = np.empty(0, dtype=np.int64)
+        return vacio, vacio, vacio, vacio
+
+    cortes = np.flatnonzero(np.diff(g)) + 1
+    primeras, ultimas = np.r_[0, cortes], np.r_[cortes - 1, len(g) - 1]
+    desde = p[primeras]
+    largos = p[ultimas] - desde + 1
+    offsets = np.r_[0, np.cumsum(largos)[:-1]]
+
+    inicio = np.repeat(offsets, largos)
+    densos_g = np.repeat(g[primeras], largos)
+    densos_p = np.repeat(desde, largos) + (np.arange(largos.sum()) - inicio)
+    densos_c = np.zeros(largos.sum(), dtype=np.int64)
+    filas_por_grupo = np.diff(np.r_[primeras, len(g)])
+    densos_c[np.repeat(offsets - desde, filas_por_grupo) + p] = c
+    return densos_g, densos_p, densos_c, inicio
+
+
+def ventana_previa(cantidades, inicio_del_grupo, alcance):
+    """Para cada fila, las ventas de los `alcance` periodos anteriores de SU grupo (0 si no hay)."""
+    n = len(cantidades)
+    ventana = np.zeros((n, alcance), dtype=np.int64)
+    posiciones = np.arange(n)
+    for j in range(1, alcance + 1):
+        origen = posiciones - j
+        validos = origen >= inicio_del_grupo
+        ventana[validos, alcance - j] = cantidades[origen[validos]]
+    return ventana
+
+
+def tabla_entrenamiento(grupos, periodos, cantidades, pistas, precios=None):
+    """
+    X (columnas de `pistas`) e y (ventas del periodo) a partir de ventas
+    agrupadas o sueltas por (grupo, índice de periodo).
+    """
+    g, p, c, inicio = serie_densa(grupos, periodos, cantidades)
+    columna_id = PERIODOS[pistas.periodo][0]
+    columnas = {columna_id: g, **calendario(pistas.periodo, p)}
+    columnas.update(pistas_de_ventana(ventana_previa(c, inicio, pistas.alcance), pistas))
+    if pistas.precios:
+        columnas.update(pistas_precio(pistas.periodo, g, precios))
+    X = pd.DataFrame({nombre: columnas[nombre] for nombre in pistas.columnas}, columns=pistas.columnas)
+    return X, pd.Series(c, name='target_ventas_actuales')
+
+
+# ---------------------------------------------------------------------
+# 🔹 Precio y descuento (products.Producto / products.Descuento)
+# ---------------------------------------------------------------------
+def tabla_precios(producto_ids=None, subcategoria_ids=None):
+    """
+    DataFrame indexado por producto_id con subcategoria_id, precio_venta y
+    descuento_pct (el mayor descuento activo, en %; 0 si no tiene). Una consulta.
+    """
+    from products.models import Producto
+
+    pct = Case(
+        When(descuentos__tipo='PORCENTAJE', then=F('descuentos__porcentaje')),
+        When(descuentos__tipo='MONTO', precio_venta__gt=0,
+             then=F('descuentos__monto') * 100 / F('precio_venta')),
+        output_field=DecimalField(max_digits=12, decimal_places=4),
+    )
+    productos = Producto.objects.order_by()
+    if producto_ids is not None:
+        productos = productos.filter(id__in=list(producto_ids))
+    if subcategoria_ids is not None:
+        productos = productos.filter(subcategoria_id__in=list(subcategoria_ids), esta_activo=True)
+    filas = list(
+        productos.annotate(descuento=Max(pct, filter=Q(descuentos__esta_activo=True)))
+        .values_list('id', 'subcategoria_id', 'precio_venta', 'descuento')
+    )
+    return pd.DataFrame({
+        'subcategoria_id': np.fromiter((-1 if f[1] is None else f[1] for f in filas), np.int64, len(filas)),
+        'precio_venta': np.fromiter((float(f[2] or 0) for f in filas), np.float64, len(filas)),
+        'descuento_pct': np.fromiter((float(f[3] or 0) for f in filas), np.float64, len(filas)),
+    }, index=pd.Index(np.fromiter((f[0] for f in filas), np.int64, len(filas)), name='producto_id'))
+
+
+def pistas_precio(periodo, ids, precios=None):
+    """precio_venta / descuento_pct por producto (semana) o promedio por subcategoría (mes)."""
+    ids = np.asarray(ids, dtype=np.int64)
+    if precios is None:
+        precios = (tabla_precios(producto_ids=np.unique(ids)) if periodo == 'semana'
+                   else tabla_precios(subcategoria_ids=np.unique(ids)))
+    if periodo == 'mes':
+        precios = precios.groupby('subcategoria_id')[COLUMNAS_PRECIO].mean()
+    alineados = precios[COLUMNAS_PRECIO].reindex(ids)
+    return {c: alineados[c].fillna(0).values.astype(np.float64) for c in COLUMNAS_PRECIO}
+
+
+# ---------------------------------------------------------------------
+# 🔹 En línea: la ventana sale del feature store
+# ---------------------------------------------------------------------
+def _lunes(indice):
+    return lunes_de_semana(indice).item()
+
+
+def _dia_1(indice):
+    return np.datetime64(int(indice), 'M').astype('datetime64[D]').item()
+
+
+def _matriz_ventana(ids, filas, actual, alcance, indice):
+    fila_de = {i: n for n, i in enumerate(ids)}
+    ventana = np.zeros((len(ids), alcance), dtype=np.int64)
+    for id_, periodo, cantidad in filas:
+        n = fila_de.get(id_)
+        if n is not None:
+            ventana[n, alcance - (actual - int(indice(periodo)))] = cantidad
+    return ventana
+
+
+def ventana_semanal(producto_ids, alcance=1, hoy=None, empresa_id=None):
+    """
+    Ventas de `producto_ids` en las `alcance` semanas cerradas anteriores a
+    la de `hoy`. Con `empresa_id` la consulta filtra por empresa en vez de
+    mandar la lista de ids (catálogo completo).
+    """
+    actual = int(indice_semana(feature_store.inicio_semana(hoy)))
+    filas = feature_store.historial_semanal(
+        None if empresa_id is not None else producto_ids,
+        desde=_lunes(actual - alcance), hasta=_lunes(actual - 1), empresa_id=empresa_id,
+    )
+    return _matriz_ventana(producto_ids, filas, actual, alcance, indice_semana)
+
+
+def ventana_mensual(subcategoria_ids, alcance=1, hoy=None):
+    """Ventas de las subcategorías en los `alcance` meses cerrados anteriores al de `hoy`."""
+    actual = int(indice_mes(feature_store.inicio_mes(hoy)))
+    filas = feature_store.historial_mensual(
+        subcategoria_ids, desde=_dia_1(actual - alcance), hasta=_dia_1(actual - 1),
+    )
+    return _matriz_ventana(subcategoria_ids, filas, actual, alcance, indice_mes)
+
+
+def pistas_en_linea(pistas, ids, periodo_actual, ventana, precios=None):
+    """Columnas para predecir `periodo_actual` con la ventana dada (misma ruta que el entrenamiento)."""
+    ids = np.asarray(ids, dtype=np.int64)
+    columna_id = PERIODOS[pistas.periodo][0]
+    columnas = {columna_id: ids}
+    columnas.update({k: np.broadcast_to(v, len(ids)) for k, v in calendario(pistas.periodo, periodo_actual).items()})
+    columnas.update(pistas_de_ventana(ventana, pistas))
+    if pistas.precios:
+        columnas.update(pistas_precio(pistas.periodo, ids, precios))
+    return columnas
+
+
+def pistas_demanda(cargado, producto_ids, hoy=None, empresa_id=None):
+    """
+    Columnas para el modelo 2 de `cargado`: calendario de la semana de
+    `hoy`, ventana desde el feature store y, si el modelo las usa, precios.
+    """
+    pistas = Pistas.desde_columnas('semana', columnas_del_modelo(cargado))
+    ventana = ventana_semanal(producto_ids, pistas.alcance, hoy, empresa_id)
+    actual = indice_semana(feature_store.inicio_semana(hoy))
+    return pistas_en_linea(pistas, producto_ids, actual, ventana)
+
+
+def pistas_ventas_subcategoria(cargado, subcategoria_ids, hoy=None):
+    """Columnas para el modelo 1 de `cargado` (mes de `hoy`)."""
+    pistas = Pistas.desde_columnas('mes', columnas_del_modelo(cargado))
+    ventana = ventana_mensual(subcategoria_ids, pistas.alcance, hoy)
+    actual = indice_mes(feature_store.inicio_mes(hoy))
+    return pistas_en_linea(pistas, subcategoria_ids, actual, ventana)
@@ -0,0 +1,266 @@
+# predictions/incremental.py
+"""
+Entrenamiento incremental a partir de una marca de agua.
+
+En vez de releer y reagrupar TODA la historia de `detalle_venta` en cada
+corrida, se guarda en disco (ml_models/acumulado.pkl) lo ya agregado:
+
+    semanas   ventas por (empresa, producto, semana)           -> modelo 2
+    meses     ventas por (empresa, subcategoría, mes)          -> modelo 1
+    C         co-ocurrencias producto × producto (dispersa)    -> modelo 3
+    marca     último DetalleVenta.id procesado
+    recientes ids ya incorporados en la ventana (marca - ML_INCREMENTAL_VENTANA_IDS, marca]
+
+Cada corrida lee solo los detalles con id > marca, los agrupa con los
+mismos cortes de semana/mes (`resample`) y los suma a lo guardado. Los
+datasets que salen de aquí son los mismos que con la historia completa:
+volver a hacer `resample` sobre buckets ya agregados no los cambia.
+
+Los ids se asignan al insertar pero las filas se ven recién al hacer
+commit: una transacción lenta puede aparecer DESPUÉS de que la marca pasó
+su id. Por eso cada corrida vuelve a mirar los ids de la ventana final y
+suma los que no estén en `recientes`. Garantía: un detalle se suma una
+sola vez siempre que su transacción haga commit antes de que se asignen
+ML_INCREMENTAL_VENTANA_IDS ids más después del suyo; uno más tardío que eso
+se pierde hasta el próximo `--desde-cero`.
+
+Limitaciones (para rehacerlo todo: `train_models --incremental --desde-cero`):
+  - commits más tardíos que la ventana (arriba);
+  - no se ven detalles borrados o editados ya incorporados;
+  - un producto que cambia de subcategoría deja sus meses viejos en la anterior.
+"""
+import os
+import tempfile
+
+import joblib
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from django.conf import settings
+from django.db.models import Max, Q
+
+from ventas.models import DetalleVenta
+
+from .artifacts import models_dir
+from .cooccurrence import matriz_ventas_productos, reindexar
+from .dataset import COLUMNAS, DEFAULT_CHUNK_SIZE, SIN_ID, extraer_detalles
+from .features import REGLA_MES, REGLA_SEMANA
+
+ACUMULADO_FILENAME = 'acumulado.pkl'
+FORMATO = 2
+
+# Además de las columnas de siempre, el id de cada detalle (para `recientes`)
+COLUMNAS_CON_ID = {**COLUMNAS, 'id': ('id', np.int64)}
+
+CLAVES_SEMANAS = ['empresa_id', 'producto_id']
+CLAVES_MESES = ['empresa_id', 'subcategoria_id']
+
+
+def ruta_acumulado(base_dir=None):
+    return os.path.join(base_dir or models_dir(), ACUMULADO_FILENAME)
+
+
+def ventana_ids():
+    return getattr(settings, 'ML_INCREMENTAL_VENTANA_IDS', 50_000)
+
+
+def _vacio(claves):
+    return pd.DataFrame({
+        **{c: np.empty(0, dtype=np.int32) for c in claves},
+        'fecha': np.empty(0, dtype='datetime64[ns]'),
+        'cantidad': np.empty(0, dtype=np.int64),
+    })
+
+
+def _agrupar(df, claves, regla):
+    """Ventas por `claves` y periodo (mismos cortes que en train: REGLA_SEMANA / REGLA_MES)."""
+    if df.empty:
+        return _vacio(claves)
+    agrupado = df.set_index('fecha').groupby(claves).resample(regla)['cantidad'].sum().reset_index()
+    # Las semanas/meses sin ventas se vuelven a rellenar al armar el dataset
+    agrupado = agrupado[agrupado['cantidad'] != 0]
+    return agrupado.astype({'cantidad': np.int64})[claves + ['fecha', 'cantidad']]
+
+
+def _sumar(viejo, nuevo, claves):
+    if nuevo.empty:
+        return viejo
+    juntos = pd.concat([viejo, nuevo], ignore_index=True)
+    return (
+        juntos.groupby(claves + ['fecha'], as_index=False, sort=True)['cantidad'].sum()
+        .astype({'cantidad': np.int64})
+    )
+
+
+def _matriz(df, productos):
+    X, _ = matriz_ventas_productos(df['venta_id'].values, df['producto_id'].values, productos)
+    return X.astype(np.float64)
+
+
+class Acumulado:
+    """Todo lo que los tres modelos necesitan, ya agregado."""
+
+    def __init__(self):
+        self.formato = FORMATO
+        self.marca = 0                       # último DetalleVenta.id incorporado
+        self.recientes = np.empty(0, dtype=np.int64)          # ids incorporados de la ventana final
+        self.ultima_fecha = None
+        self.semanas = _vacio(CLAVES_SEMANAS)
+        self.meses = _vacio(CLAVES_MESES)
+        self.productos = np.empty(0, dtype=np.int64)          # eje de C (ordenado)
+        self.producto_empresa = np.empty(0, dtype=np.int32)   # empresa de cada producto
+        self.C = sp.csr_matrix((0, 0), dtype=np.float64)
+        self.ventas_por_producto = np.empty(0, dtype=np.float64)
+        self.ventas_por_empresa = pd.Series(dtype=np.int64)   # ventas con al menos un detalle
+        self.filas_por_empresa = pd.Series(dtype=np.int64)    # detalles de venta
+
+    @property
+    def n_ventas(self):
+        return int(self.ventas_por_empresa.sum())
+
+    def incorporar(self, nuevos, previos):
+        """
+        Suma los detalles `nuevos` (id > marca o tardíos de la ventana).
+        `previos` son los detalles ya incorporados de las ventas que
+        aparecen en `nuevos` (para no contar dos veces los pares de una
+        venta que creció).
+        """
+        if nuevos.empty:
+            return
+
+        # --- Modelos 1 y 2: buckets por mes / semana ---
+        self.semanas = _sumar(self.semanas, _agrupar(nuevos, CLAVES_SEMANAS, REGLA_SEMANA), CLAVES_SEMANAS)
+        con_subcategoria = nuevos[nuevos['subcategoria_id'] != SIN_ID]
+        self.meses = _sumar(self.meses, _agrupar(con_subcategoria, CLAVES_MESES, REGLA_MES), CLAVES_MESES)
+        self.filas_por_empresa = self.filas_por_empresa.add(
+            nuevos['empresa_id'].value_counts(), fill_value=0
+        ).astype(np.int64)
+
+        # --- Modelo 3: eje de productos (se agrega lo que no existía) ---
+        productos = np.union1d(self.productos, nuevos['producto_id'].values.astype(np.int64))
+        if len(productos) != len(self.productos):
+            pos = np.searchsorted(productos, self.productos)
+            producto_empresa = np.full(len(productos), SIN_ID, dtype=np.int32)
+            producto_empresa[pos] = self.producto_empresa
+            ventas_por_producto = np.zeros(len(productos), dtype=np.float64)
+            ventas_por_producto[pos] = self.ventas_por_producto
+            self.C = reindexar(self.C, self.productos, productos)
+            self.productos, self.producto_empresa, self.ventas_por_producto = (
+                productos, producto_empresa, ventas_por_producto
+            )
+        empresa_de_nuevos = nuevos.drop_duplicates('producto_id')
+        pos = np.searchsorted(self.productos, empresa_de_nuevos['producto_id'].values)
+        self.producto_empresa[pos] = empresa_de_nuevos['empresa_id'].values
+
+        # --- Modelo 3: ΔC = (pares de las ventas tocadas) - (lo que ya estaba contado) ---
+        X_todo = _matriz(pd.concat([previos, nuevos], ignore_index=True), self.productos)
+        delta = (X_todo.T @ X_todo).tocsr()
+        if not previos.empty:
+            X_previo = _matriz(previos, self.productos)
+            delta = (delta - X_previo.T @ X_previo).tocsr()
+        self.ventas_por_producto = self.ventas_por_producto + delta.diagonal()
+        delta.setdiag(0)
+        self.C = (self.C + delta).tocsr()
+        self.C.eliminate_zeros()
+
+        ventas_nuevas = nuevos[~nuevos['venta_id'].isin(previos['venta_id'])].drop_duplicates('venta_id')
+        self.ventas_por_empresa = self.ventas_por_empresa.add(
+            ventas_nuevas['empresa_id'].value_counts(), fill_value=0
+        ).astype(np.int64)
+
+        ultima = nuevos['fecha'].max()
+        if self.ultima_fecha is None or ultima > pd.Timestamp(self.ultima_fecha):
+            self.ultima_fecha = ultima.isoformat()
+
+    def de_empresa(self, empresa_id):
+        """Vista de solo una empresa (sus buckets y su bloque de C)."""
+        parcial = Acumulado()
+        parcial.marca, parcial.ultima_fecha = self.marca, self.ultima_fecha
+        parcial.semanas = self.semanas[self.semanas['empresa_id'] == empresa_id]
+        parcial.meses = self.meses[self.meses['empresa_id'] == empresa_id]
+        mascara = self.producto_empresa == empresa_id
+        parcial.productos = self.productos[mascara]
+        parcial.producto_empresa = self.producto_empresa[mascara]
+        parcial.C = self.C[mascara][:, mascara].tocsr()
+        parcial.ventas_por_producto = self.ventas_por_producto[mascara]
+        parcial.ventas_por_empresa = self.ventas_por_empresa[self.ventas_por_empresa.index == empresa_id]
+        parcial.filas_por_empresa = self.filas_por_empresa[self.filas_por_empresa.index == empresa_id]
+        return parcial
+
+
+def cargar_acumulado(base_dir=None):
+    """El acumulado guardado, o None si no hay (o es de un formato viejo)."""
+    try:
+        acumulado = joblib.load(ruta_acumulado(base_dir))
+    except FileNotFoundError:
+        return None
+    if getattr(acumulado, 'formato', None) != FORMATO:
+        return None
+    return acumulado
+
+
+def guardar_acumulado(acumulado, base_dir=None):
+    path = ruta_acumulado(base_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.acumulado-', suffix='.tmp')
+    os.close(fd)
+    try:
+        joblib.dump(acumulado, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+def actualizar_acumulado(base_dir=None, chunk_size=DEFAULT_CHUNK_SIZE, desde_cero=False):
+    """
+    Carga el acumulado, le suma los detalles nuevos (y los que hicieron
+    commit tarde dentro de la ventana) y lo guarda.
+    Devuelve (acumulado, filas_nuevas, marca_anterior).
+    """
+    acumulado = None if desde_cero else cargar_acumulado(base_dir)
+    if acumulado is None:
+        acumulado = Acumulado()
+    marca_anterior = acumulado.marca
+    desde = max(acumulado.marca - ventana_ids(), 0)
+
+    # Se fija el tope ANTES de leer: lo que entre mientras tanto queda para la próxima
+    marca_nueva = max(DetalleVenta.objects.aggregate(m=Max('id'))['m'] or 0, acumulado.marca)
+    # Ids de la ventana que no estaban cuando se leyó: commits tardíos (casi siempre ninguno)
+    tardios = np.setdiff1d(
+        np.fromiter(
+            DetalleVenta.objects.filter(id__gt=desde, id__lte=acumulado.marca).values_list('id', flat=True),
+            dtype=np.int64,
+        ),
+        acumulado.recientes,
+    )
+    if marca_nueva == acumulado.marca and not len(tardios):
+        return acumulado, 0, marca_anterior
+
+    qs_nuevos = DetalleVenta.objects.filter(
+        Q(id__gt=acumulado.marca, id__lte=marca_nueva) | Q(id__in=tardios.tolist())
+    )
+    nuevos = extraer_detalles(qs_nuevos, chunk_size=chunk_size, columnas=COLUMNAS_CON_ID)
+    if acumulado.marca:
+        previos = extraer_detalles(
+            DetalleVenta.objects.filter(
+                id__lte=acumulado.marca,
+                venta_id__in=qs_nuevos.values('venta_id'),
+            ),
+            chunk_size=chunk_size,
+            columnas=COLUMNAS_CON_ID,
+        )
+        # Solo lo que ya se había sumado (no los tardíos de esta misma corrida)
+        previos = previos[(previos['id'] <= desde) | previos['id'].isin(acumulado.recientes)]
+    else:
+        previos = nuevos.iloc[:0]
+
+    acumulado.incorporar(nuevos, previos)
+    acumulado.marca = marca_nueva
+    # El id sale de la MISMA lectura que los datos: lo que no se vio ahora queda fuera de `recientes`
+    recientes = np.union1d(acumulado.recientes, nuevos['id'].to_numpy())
+    acumulado.recientes = recientes[recientes > marca_nueva - ventana_ids()]
+    guardar_acumulado(acumulado, base_dir)
+    return acumulado, len(nuevos), marca_anterior
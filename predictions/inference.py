@@ -0,0 +1,219 @@
+# predictions/inference.py
+"""
+Inferencia compilada para los RandomForest (modelos 1, 2 y 3 en modo clasificador).
+
+`model.predict(df)` con UNA fila paga más en armar el DataFrame, validar la
+entrada en sklearn y despachar árbol por árbol (con joblib) que en recorrer
+los árboles. Aquí los árboles del bosque se exportan una vez a arreglos
+NumPy planos (todos los nodos de todos los árboles juntos):
+
+    feature      columna que compara cada nodo
+    umbral       umbral del nodo (float64, como en sklearn)
+    izquierdo    hijo izquierdo (índice global); en una hoja, el propio nodo
+    derecho      hijo derecho   (índice global); en una hoja, el propio nodo
+    faltante_izq si un NaN va a la izquierda (missing_go_to_left)
+    valor        predicción de la hoja (probabilidades ya normalizadas en clasificadores)
+    raices       nodo raíz de cada árbol
+
+y un lote de filas se recorre por todos los árboles a la vez, un nivel por
+iteración; en cada nivel solo siguen los pares (fila, árbol) que todavía no
+llegaron a una hoja.
+
+El resultado es EXACTAMENTE el de sklearn con n_jobs=1: X se pasa a float32
+y se compara contra el umbral en float64 (lo mismo que hace el Cython de
+sklearn), y las predicciones de los árboles se suman en el mismo orden. Con
+n_jobs > 1 sklearn suma los árboles en el orden en que terminan los hilos,
+así que ahí la diferencia puede ser de un ulp.
+
+Con lotes grandes el costo por llamada de sklearn ya se amortiza y su
+recorrido en Cython (con hilos) gana al de NumPy: por encima de
+FILAS_MAXIMAS_COMPILADO filas `predecir` vuelve a `model.predict`
+(`manage.py bench_inference` muestra dónde se cruzan).
+
+Los arreglos se publican junto al modelo (ml_models/<nombre>/<version>/bosque.pkl)
+y el registro los abre con mmap; para versiones viejas sin ese archivo se
+compilan al cargar.
+"""
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+
+COMPILED_FILENAME = 'bosque.pkl'
+FORMATO = 1
+FILAS_MAXIMAS_COMPILADO = 256
+
+
+class BosqueCompilado:
+    """Bosque de árboles exportado a arreglos planos."""
+
+    def __init__(self, feature, umbral, izquierdo, derecho, faltante_izq, valor, raices,
+                 profundidad, columnas=None, clases=None):
+        self.formato = FORMATO
+        self.feature = feature
+        self.umbral = umbral
+        self.izquierdo = izquierdo
+        self.derecho = derecho
+        self.faltante_izq = faltante_izq
+        self.valor = valor              # (nodos, salidas): 1 en regresión, n_clases en clasificación
+        self.raices = raices
+        self.profundidad = profundidad
+        self.columnas = list(columnas) if columnas is not None else None
+        self.clases = clases            # None en regresión
+
+    @property
+    def es_clasificador(self):
+        return self.clases is not None
+
+    @property
+    def n_arboles(self):
+        return len(self.raices)
+
+    # -----------------------------------------------------------------
+    # 🔹 Entrada
+    # -----------------------------------------------------------------
+    def matriz(self, columnas):
+        """
+        Arma X (float32) desde {columna: valor o arreglo} en el orden con el
+        que se entrenó el modelo. Los escalares se repiten para todo el lote.
+        """
+        if self.columnas is None:
+            raise ValueError("El modelo no guardó los nombres de sus columnas; pase X directamente.")
+        faltan = [c for c in self.columnas if c not in columnas]
+        if faltan:
+            raise ValueError(f"Faltan columnas para predecir: {faltan}")
+        arreglos = [np.asarray(columnas[c]) for c in self.columnas]
+        n = _n_filas(columnas)
+        X = np.empty((n, len(arreglos)), dtype=np.float32)
+        for j, a in enumerate(arreglos):
+            X[:, j] = a
+        return X
+
+    # -----------------------------------------------------------------
+    # 🔹 Recorrido
+    # -----------------------------------------------------------------
+    def hojas(self, X):
+        """Hoja alcanzada por cada fila en cada árbol: arreglo (filas, árboles)."""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        n, n_columnas = X.shape
+        # float32 -> float64 es exacto: comparar así es lo mismo que hace sklearn
+        # (float32 <= umbral float64), pero sin convertir en cada nivel
+        x_plano = X.astype(np.float64).ravel()
+        hay_nan = np.isnan(x_plano).any()
+
+        nodo = np.tile(self.raices, n)                                   # (fila, árbol) aplanado
+        base = np.repeat(np.arange(n, dtype=np.intp) * n_columnas, self.n_arboles)
+        activos = np.arange(len(nodo))
+        for _ in range(self.profundidad):
+            actual = nodo[activos]
+            x = x_plano[base[activos] + self.feature[actual]]
+            a_la_izquierda = x <= self.umbral[actual]
+            if hay_nan:
+                a_la_izquierda |= np.isnan(x) & self.faltante_izq[actual]
+            siguiente = np.where(a_la_izquierda, self.izquierdo[actual], self.derecho[actual])
+            nodo[activos] = siguiente
+            # Solo siguen los pares (fila, árbol) que todavía no llegaron a una hoja
+            activos = activos[self.izquierdo[siguiente] != siguiente]
+            if not len(activos):
+                break
+        return nodo.reshape(n, self.n_arboles)
+
+    def _promedio(self, X):
+        valores = self.valor[self.hojas(X)]          # (filas, árboles, salidas)
+        total = np.zeros((valores.shape[0], valores.shape[2]), dtype=np.float64)
+        # Árbol por árbol y en orden: misma suma (bit a bit) que sklearn
+        for t in range(valores.shape[1]):
+            total += valores[:, t]
+        total /= self.n_arboles
+        return total
+
+    def predict(self, X):
+        if self.es_clasificador:
+            return self.clases.take(np.argmax(self._promedio(X), axis=1), axis=0)
+        return self._promedio(X)[:, 0]
+
+    def predict_proba(self, X):
+        if not self.es_clasificador:
+            raise AttributeError("predict_proba solo existe para clasificadores.")
+        return self._promedio(X)
+
+
+# ---------------------------------------------------------------------
+# 🔹 Exportar un bosque de sklearn
+# ---------------------------------------------------------------------
+def compilar(model):
+    """
+    BosqueCompilado de `model`, o None si no es un RandomForest que se
+    pueda compilar (p. ej. los modelos de similitud o multi-salida): en ese
+    caso se sigue usando `model.predict`.
+    """
+    if not isinstance(model, (RandomForestRegressor, RandomForestClassifier)):
+        return None
+    if not hasattr(model, 'estimators_') or model.n_outputs_ != 1:
+        return None
+    clasificador = isinstance(model, RandomForestClassifier)
+
+    arboles = [e.tree_ for e in model.estimators_]
+    tamanos = np.array([t.node_count for t in arboles], dtype=np.int64)
+    raices = np.concatenate([[0], np.cumsum(tamanos)[:-1]]).astype(np.intp)
+
+    partes = {k: [] for k in ('feature', 'umbral', 'izquierdo', 'derecho', 'faltante_izq', 'valor')}
+    for raiz, t in zip(raices, arboles):
+        propios = np.arange(t.node_count, dtype=np.intp)
+        hoja = t.children_left == -1
+        partes['feature'].append(np.where(hoja, 0, t.feature).astype(np.intp))
+        partes['umbral'].append(t.threshold.astype(np.float64))
+        partes['izquierdo'].append(np.where(hoja, propios, t.children_left) + raiz)
+        partes['derecho'].append(np.where(hoja, propios, t.children_right) + raiz)
+        partes['faltante_izq'].append(np.asarray(t.missing_go_to_left, dtype=bool))
+        if clasificador:
+            # Lo mismo que DecisionTreeClassifier.predict_proba, pero una vez por nodo
+            valor = t.value[:, 0, :model.n_classes_].astype(np.float64)
+            normalizador = valor.sum(axis=1)[:, np.newaxis]
+            normalizador[normalizador == 0.0] = 1.0
+            valor = valor / normalizador
+        else:
+            valor = t.value[:, 0, :1].astype(np.float64)
+        partes['valor'].append(valor)
+
+    arreglos = {k: np.ascontiguousarray(np.concatenate(v)) for k, v in partes.items()}
+    return BosqueCompilado(
+        raices=raices,
+        profundidad=max(t.max_depth for t in arboles),
+        columnas=getattr(model, 'feature_names_in_', None),
+        clases=model.classes_ if clasificador else None,
+        **arreglos,
+    )
+
+
+# ---------------------------------------------------------------------
+# 🔹 Predicción (compilada si se puede, sklearn si no)
+# ---------------------------------------------------------------------
+def _n_filas(columnas):
+    return max((np.asarray(v).size for v in columnas.values() if np.ndim(v)), default=1)
+
+
+def armar_dataframe(model, columnas):
+    """DataFrame con las columnas en el orden con el que se entrenó `model`."""
+    orden = list(getattr(model, 'feature_names_in_', columnas))
+    n = _n_filas(columnas)
+    return pd.DataFrame({c: np.broadcast_to(columnas[c], n) for c in orden}, columns=orden)
+
+
+def _usar_compilado(compilado, columnas):
+    return compilado is not None and _n_filas(columnas) <= FILAS_MAXIMAS_COMPILADO
+
+
+def predecir(model, columnas, compilado=None):
+    """`model.predict` sobre {columna: valores}; con lotes chicos usa el bosque compilado."""
+    if _usar_compilado(compilado, columnas):
+        return compilado.predict(compilado.matriz(columnas))
+    return model.predict(armar_dataframe(model, columnas))
+
+
+def predecir_proba(model, columnas, compilado=None):
+    """`model.predict_proba` sobre {columna: valores}; con lotes chicos usa el bosque compilado."""
+    if _usar_compilado(compilado, columnas):
+        return compilado.predict_proba(compilado.matriz(columnas))
+    return model.predict_proba(armar_dataframe(model, columnas))
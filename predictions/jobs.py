@@ -0,0 +1,249 @@
+# predictions/jobs.py
+"""
+Entrenamientos en segundo plano (TrainingJob).
+
+La API solo inserta un job 'pendiente' (`encolar`) y responde enseguida: el
+request nunca espera al entrenamiento. El comando `run_training_worker`
+toma los pendientes (`tomar_siguiente`: SELECT ... FOR UPDATE SKIP LOCKED,
+así dos workers nunca toman el mismo), corre hasta
+ML_TRAINING_MAX_CONCURRENT a la vez en un pool de procesos y cada job va
+guardando su etapa y su progreso (`ejecutar`):
+
+    extraccion -> m1.dataset -> m1.fit -> m1.publicar -> ... -> indice
+
+Cada empresa tiene a lo sumo un job activo (pendiente o en curso): pedir
+otro mientras tanto devuelve el que ya existe. Los modelos publicados los
+recogen solos los procesos web (el registro revisa el manifest cada
+ML_MODELS_POLL_SECONDS).
+"""
+import io
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from ventas.models import DetalleVenta
+
+from .dataset import extraer_detalles
+from .models import TrainingJob
+from .recommendations import DEFAULT_TOP_K
+from .training import MODELOS, DatosInsuficientes, entrenar_modelo
+
+# Estados de cada etapa dentro de TrainingJob.etapas
+PENDIENTE, EN_CURSO, COMPLETADA, OMITIDA, FALLIDA = 'pendiente', 'en_curso', 'completada', 'omitida', 'fallida'
+TERMINADAS = (COMPLETADA, OMITIDA, FALLIDA)
+
+
+def min_filas():
+    """Detalles de venta mínimos para entrenar el modelo propio de una empresa."""
+    return getattr(settings, 'ML_TRAINING_MIN_FILAS', 1000)
+
+
+def etapas_de(claves):
+    etapas = ['extraccion']
+    for clave in claves:
+        etapas += [f'{clave}.dataset', f'{clave}.fit', f'{clave}.publicar']
+    if 'm3' in claves:
+        etapas.append('indice')
+    return etapas
+
+
+# ---------------------------------------------------------------------
+# 🔹 Cola
+# ---------------------------------------------------------------------
+def encolar(empresa_id, claves, opciones=None, usuario=None):
+    """
+    Crea un job pendiente y devuelve (job, creado). Si la empresa ya tiene
+    uno pendiente o en curso devuelve ése con creado=False.
+    """
+    claves = [c for c in MODELOS if c in claves]
+    activo = TrainingJob.objects.filter(empresa_id=empresa_id, estado__in=TrainingJob.ACTIVOS).first()
+    if activo is not None:
+        return activo, False
+    try:
+        with transaction.atomic():
+            job = TrainingJob.objects.create(
+                empresa_id=empresa_id,
+                solicitado_por=usuario if usuario is not None and usuario.is_authenticated else None,
+                modelos=claves,
+                opciones=opciones or {},
+                etapas=[{'etapa': etapa, 'estado': PENDIENTE} for etapa in etapas_de(claves)],
+            )
+    except IntegrityError:
+        # Otro request de la misma empresa lo encoló al mismo tiempo (restricción única)
+        return TrainingJob.objects.get(empresa_id=empresa_id, estado__in=TrainingJob.ACTIVOS), False
+    return job, True
+
+
+def tomar_siguiente(worker):
+    """Pasa a 'en_curso' el job pendiente más antiguo y lo devuelve (None si no hay)."""
+    while True:
+        with transaction.atomic():
+            job = (
+                TrainingJob.objects.select_for_update(skip_locked=True)
+                .filter(estado=TrainingJob.PENDIENTE)
+                .order_by('creado', 'id')
+                .first()
+            )
+            if job is None:
+                return None
+            ahora = timezone.now()
+            # UPDATE condicional: en bases sin FOR UPDATE (SQLite) solo uno de los workers lo gana
+            tomado = TrainingJob.objects.filter(pk=job.pk, estado=TrainingJob.PENDIENTE).update(
+                estado=TrainingJob.EN_CURSO, worker=worker, iniciado=ahora, actualizado=ahora,
+            )
+        if tomado:
+            job.refresh_from_db()
+            return job
+
+
+def latido(job_ids):
+    """El worker sigue vivo: renueva `actualizado` de sus jobs en curso."""
+    if job_ids:
+        TrainingJob.objects.filter(pk__in=list(job_ids), estado=TrainingJob.EN_CURSO).update(
+            actualizado=timezone.now()
+        )
+
+
+def marcar_fallido(job_id, error):
+    TrainingJob.objects.filter(pk=job_id, estado__in=TrainingJob.ACTIVOS).update(
+        estado=TrainingJob.FALLIDO, error=str(error), terminado=timezone.now(), actualizado=timezone.now(),
+    )
+
+
+def marcar_vencidos(minutos):
+    """Jobs en curso sin latido hace más de `minutos` (su worker murió): fallidos."""
+    limite = timezone.now() - timedelta(minutes=minutos)
+    vencidos = list(
+        TrainingJob.objects.filter(estado=TrainingJob.EN_CURSO, actualizado__lt=limite).values_list('id', flat=True)
+    )
+    for job_id in vencidos:
+        marcar_fallido(job_id, f"El worker dejó de responder (sin latido en {minutos} min).")
+    return vencidos
+
+
+# ---------------------------------------------------------------------
+# 🔹 Progreso
+# ---------------------------------------------------------------------
+class _Progreso:
+    """Lleva TrainingJob.etapas/etapa/progreso: una UPDATE por cambio de etapa."""
+
+    def __init__(self, job):
+        self.job_id = job.pk
+        self.etapas = [dict(e) for e in job.etapas] or [
+            {'etapa': etapa, 'estado': PENDIENTE} for etapa in etapas_de(job.modelos)
+        ]
+        self.actual = None
+        self.inicio = None
+
+    def _buscar(self, etapa):
+        for e in self.etapas:
+            if e['etapa'] == etapa:
+                return e
+        e = {'etapa': etapa, 'estado': PENDIENTE}
+        self.etapas.append(e)
+        return e
+
+    def _cerrar(self, estado):
+        if self.actual is not None:
+            self.actual['estado'] = estado
+            self.actual['segundos'] = round(time.perf_counter() - self.inicio, 3)
+            self.actual = None
+
+    def empezar(self, etapa):
+        self._cerrar(COMPLETADA)
+        self.actual = self._buscar(etapa)
+        self.actual['estado'] = EN_CURSO
+        self.inicio = time.perf_counter()
+        self.guardar(etapa=etapa)
+
+    def terminar(self, estado=COMPLETADA):
+        self._cerrar(estado)
+        self.guardar()
+
+    def omitir(self, prefijo):
+        """Marca como omitidas las etapas pendientes que empiezan con `prefijo`."""
+        for e in self.etapas:
+            if e['etapa'].startswith(prefijo) and e['estado'] == PENDIENTE:
+                e['estado'] = OMITIDA
+
+    @property
+    def porcentaje(self):
+        hechas = sum(e['estado'] in TERMINADAS for e in self.etapas)
+        return round(100 * hechas / len(self.etapas)) if self.etapas else 100
+
+    def guardar(self, **campos):
+        TrainingJob.objects.filter(pk=self.job_id).update(
+            etapas=self.etapas, progreso=self.porcentaje, actualizado=timezone.now(), **campos
+        )
+
+
+# ---------------------------------------------------------------------
+# 🔹 Ejecución (dentro del proceso del worker)
+# ---------------------------------------------------------------------
+def ejecutar(job_id, n_jobs=1):
+    """
+    Corre el job `job_id` (ya tomado por `tomar_siguiente`): extracción,
+    dataset, fit y publicación de cada modelo, e índice de recomendaciones.
+    Un modelo que falla no detiene a los demás; el job queda 'completado'
+    si se publicó al menos uno.
+    """
+    job = TrainingJob.objects.get(pk=job_id)
+    progreso = _Progreso(job)
+    resultados = []
+    try:
+        progreso.empezar('extraccion')
+        detalles = DetalleVenta.objects.all()
+        if job.empresa_id is not None:
+            detalles = detalles.filter(venta__empresa_id=job.empresa_id)
+        datos = extraer_detalles(detalles)
+        progreso.terminar()
+        if job.empresa_id is not None and len(datos) < min_filas():
+            raise DatosInsuficientes(
+                f"La empresa tiene {len(datos)} detalles de venta; se necesitan al menos {min_filas()} "
+                f"para un modelo propio (mientras tanto usa el global)."
+            )
+
+        for clave in job.modelos:
+            base = {'clave': clave, 'nombre': MODELOS[clave][0], 'empresa_id': job.empresa_id}
+            try:
+                resultado = entrenar_modelo(
+                    clave, datos, job.opciones, n_jobs, empresa_id=job.empresa_id,
+                    al_empezar=lambda etapa, clave=clave: progreso.empezar(f'{clave}.{etapa}'),
+                )
+                progreso.terminar()
+            except DatosInsuficientes as e:
+                progreso.terminar(OMITIDA)
+                resultado = {**base, 'omitido': str(e)}
+            except Exception as e:
+                progreso.terminar(FALLIDA)
+                resultado = {**base, 'error': f"{type(e).__name__}: {e}"}
+            progreso.omitir(f'{clave}.')
+            resultados.append(resultado)
+
+        if any(r['clave'] == 'm3' and 'version' in r for r in resultados):
+            progreso.empezar('indice')
+            call_command('build_recommendation_index', k=DEFAULT_TOP_K, empresa=job.empresa_id,
+                         stdout=io.StringIO())
+            progreso.terminar()
+        progreso.omitir('indice')
+
+        publicados = [r for r in resultados if 'version' in r]
+        problemas = [f"{r['clave']}: {r.get('error') or r.get('omitido')}" for r in resultados if 'version' not in r]
+        estado = TrainingJob.COMPLETADO if publicados else TrainingJob.FALLIDO
+        error = '; '.join(problemas) or None
+    except DatosInsuficientes as e:
+        progreso.terminar(OMITIDA)
+        estado, error = TrainingJob.FALLIDO, str(e)
+    except Exception as e:
+        progreso.terminar(FALLIDA)
+        estado, error = TrainingJob.FALLIDO, f"{type(e).__name__}: {e}"
+
+    progreso.omitir('')
+    progreso.guardar(
+        estado=estado, etapa='', resultados=resultados, error=error, terminado=timezone.now(),
+    )
+    return estado
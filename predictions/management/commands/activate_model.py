@@ -0,0 +1,66 @@
+# predictions/management/commands/activate_model.py
+from django.core.management.base import BaseCommand, CommandError
+
+from predictions.artifacts import (
+    ArtifactError,
+    activar_version,
+    directorio_empresa,
+    leer_manifest,
+    listar_versiones,
+)
+from predictions.registry import MODEL_FILES
+
+
+class Command(BaseCommand):
+    help = "🔁 Lista las versiones de un modelo ML o activa una (publicar / rollback sin reiniciar)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'nombre',
+            choices=sorted(MODEL_FILES),
+            help='Modelo a consultar o activar.',
+        )
+        parser.add_argument(
+            '--activar',
+            dest='version_objetivo',
+            metavar='VERSION',
+            help='Versión a activar. Sin este parámetro solo se listan las versiones.',
+        )
+        parser.add_argument(
+            '--empresa',
+            type=int,
+            help='Usar el modelo dedicado de esta empresa en lugar del global.',
+        )
+
+    def handle(self, *args, **options):
+        nombre = options['nombre']
+        version = options.get('version_objetivo')
+        empresa_id = options.get('empresa')
+        base_dir = directorio_empresa(empresa_id) if empresa_id is not None else None
+        etiqueta = f"'{nombre}'" + (f" (empresa {empresa_id})" if empresa_id is not None else "")
+
+        if not version:
+            activo = leer_manifest(nombre, base_dir=base_dir)
+            version_activa = activo['version'] if activo else None
+            versiones = listar_versiones(nombre, base_dir)
+            if not versiones:
+                self.stdout.write(self.style.WARNING(f"⚠️ {etiqueta} no tiene versiones publicadas."))
+                return
+            for v in versiones:
+                manifest = leer_manifest(nombre, v, base_dir)
+                marca = "👉" if v == version_activa else "  "
+                self.stdout.write(
+                    f"{marca} {v}  entrenado={manifest.get('trained_at')}  "
+                    f"filas={manifest.get('rows')}  huella={(manifest.get('data_fingerprint') or '')[:12]}"
+                )
+            return
+
+        try:
+            manifest = activar_version(nombre, version, base_dir)
+        except ArtifactError as e:
+            raise CommandError(str(e))
+
+        # Los workers lo detectan por el mtime del manifest (ML_MODELS_POLL_SECONDS)
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {etiqueta} ahora apunta a la versión {manifest['version']}."
+        ))
@@ -0,0 +1,130 @@
+# predictions/management/commands/bench_inference.py
+import statistics
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from predictions.inference import FILAS_MAXIMAS_COMPILADO, armar_dataframe
+from predictions.registry import MODEL_FILES, model_registry
+
+
+def _percentil(valores, p):
+    return float(np.percentile(valores, p)) * 1000
+
+
+class Command(BaseCommand):
+    help = "⏱️ Compara model.predict (sklearn + DataFrame) contra el bosque compilado y verifica que den lo mismo."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--modelos',
+            default=','.join(sorted(MODEL_FILES)),
+            help='Modelos a medir, separados por coma (default: todos).',
+        )
+        parser.add_argument(
+            '--empresa',
+            type=int,
+            help='Medir el modelo dedicado de esta empresa (si no tiene, el global).',
+        )
+        parser.add_argument(
+            '--filas',
+            default='1,10,100,1000',
+            help='Tamaños de lote a medir, separados por coma (default: 1,10,100,1000).',
+        )
+        parser.add_argument(
+            '--repeticiones',
+            type=int,
+            default=50,
+            help='Llamadas por tamaño de lote (default: 50).',
+        )
+        parser.add_argument(
+            '--semilla',
+            type=int,
+            default=42,
+            help='Semilla de las filas sintéticas (default: 42).',
+        )
+
+    def handle(self, *args, **options):
+        nombres = [n.strip() for n in options['modelos'].split(',') if n.strip()]
+        desconocidos = sorted(set(nombres) - set(MODEL_FILES))
+        if desconocidos:
+            raise CommandError(f"Modelos desconocidos: {', '.join(desconocidos)}")
+        try:
+            tamanos = [int(n) for n in options['filas'].split(',') if n.strip()]
+        except ValueError:
+            raise CommandError("--filas debe ser una lista de enteros separados por coma.")
+        rng = np.random.default_rng(options['semilla'])
+
+        for nombre in nombres:
+            cargado = model_registry.get_loaded(nombre, options.get('empresa'))
+            if cargado is None:
+                self.stdout.write(self.style.WARNING(f"⚠️ '{nombre}' no está entrenado; se omite."))
+                continue
+            if cargado.compilado is None:
+                self.stdout.write(self.style.WARNING(
+                    f"⚠️ '{nombre}' ({type(cargado.modelo).__name__}) no es un RandomForest compilable; se omite."
+                ))
+                continue
+            self._medir(cargado, tamanos, options['repeticiones'], rng)
+
+    def _filas(self, compilado, n, rng):
+        """Filas sintéticas en el rango de los umbrales de cada columna (todas son enteras)."""
+        internos = compilado.izquierdo != np.arange(len(compilado.izquierdo))
+        columnas = {}
+        for j, columna in enumerate(compilado.columnas):
+            umbrales = compilado.umbral[internos & (compilado.feature == j)]
+            bajo, alto = (umbrales.min(), umbrales.max()) if len(umbrales) else (0, 1)
+            columnas[columna] = rng.integers(int(np.floor(bajo)), int(np.ceil(alto)) + 2, size=n)
+        return columnas
+
+    def _medir(self, cargado, tamanos, repeticiones, rng):
+        modelo, compilado = cargado.modelo, cargado.compilado
+        metodo = 'predict_proba' if compilado.es_clasificador else 'predict'
+
+        # `predecir` usa el compilado hasta FILAS_MAXIMAS_COMPILADO filas; aquí se miden
+        # los dos caminos completos en todos los tamaños para ver dónde se cruzan.
+        def con_sklearn(columnas):
+            return getattr(modelo, metodo)(armar_dataframe(modelo, columnas))
+
+        def con_compilado(columnas):
+            return getattr(compilado, metodo)(compilado.matriz(columnas))
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"\n{cargado.nombre} (versión {cargado.version or 'sin versión'}, "
+            f"{compilado.n_arboles} árboles, {len(compilado.umbral)} nodos, profundidad {compilado.profundidad})"
+        ))
+        self.stdout.write(f"{'filas':>7}  {'sklearn p50':>12}  {'p95':>9}  {'compilado p50':>14}  {'p95':>9}  {'x':>7}  exacto")
+        self.stdout.write(f"(las vistas usan el compilado hasta {FILAS_MAXIMAS_COMPILADO} filas)")
+
+        for n in tamanos:
+            columnas = self._filas(compilado, n, rng)
+
+            # Exactitud: contra sklearn con n_jobs=1 (con más hilos el orden de la suma varía)
+            n_jobs = modelo.n_jobs
+            modelo.n_jobs = 1
+            try:
+                esperado = con_sklearn(columnas)
+            finally:
+                modelo.n_jobs = n_jobs
+            obtenido = con_compilado(columnas)
+            exacto = np.array_equal(esperado, obtenido)
+
+            tiempos = {'sklearn': [], 'compilado': []}
+            for _ in range(repeticiones):
+                inicio = time.perf_counter()
+                con_sklearn(columnas)
+                tiempos['sklearn'].append(time.perf_counter() - inicio)
+                inicio = time.perf_counter()
+                con_compilado(columnas)
+                tiempos['compilado'].append(time.perf_counter() - inicio)
+
+            p50_sk, p50_co = statistics.median(tiempos['sklearn']), statistics.median(tiempos['compilado'])
+            self.stdout.write(
+                f"{n:>7}  {p50_sk * 1000:>10.3f}ms  {_percentil(tiempos['sklearn'], 95):>7.3f}ms  "
+                f"{p50_co * 1000:>12.3f}ms  {_percentil(tiempos['compilado'], 95):>7.3f}ms  "
+                f"{p50_sk / p50_co:>6.1f}x  "
+                + (self.style.SUCCESS("sí") if exacto else self.style.ERROR(
+                    f"NO (máx. diferencia {np.max(np.abs(esperado - obtenido)):.3g})"
+                ))
+            )
@@ -0,0 +1,413 @@
+# predictions/management/commands/bench_predictions.py
+"""
+Benchmark de latencia y throughput de las predicciones.
+
+Siembra un catálogo y una historia de ventas sintéticos (dentro de una
+transacción que se revierte al final), entrena los tres modelos sobre esos
+datos en un directorio temporal y mide:
+
+  - las vistas PredictSales, PredictDemand y RecommendProduct con el cliente
+    de prueba de DRF (routing, middleware, serialización incluidos);
+  - el mismo cálculo llamando directo a pistas + modelo, sin HTTP.
+
+Por escenario reporta p50/p95/p99, requests/seg, consultas por request,
+el % del tiempo dentro de cursor.execute (SQL), el RSS máximo del proceso
+y, con una pasada aparte bajo cProfile, el reparto del tiempo propio entre
+BD (driver + ORM), pandas, sklearn, numpy, Django/DRF y predictions/.
+
+    python manage.py bench_predictions --productos 2000 --ventas 50000 --json bench.json
+
+Con --publicados no se entrena: se miden los modelos activos de
+ML_MODELS_DIR (p. ej. una versión candidata antes de activarla).
+"""
+import cProfile
+import gc
+import io
+import json
+import os
+import pstats
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from predictions import feature_store, features
+from predictions.cache import prediction_cache
+from predictions.dataset import extraer_detalles
+from predictions.inference import predecir
+from predictions.recommendations import puntuar_candidatos
+from predictions.registry import model_registry
+from predictions.training import DatosInsuficientes, entrenar_modelo, presupuesto_nucleos
+from products.models import Categoria, Producto, SubCategoria
+from sucursales.models import Sucursal
+from tenants.models import Empresa
+from users.models import User
+from ventas.models import DetalleVenta, Venta
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BATCH_SIZE = 1000
+
+# Categoría del tiempo propio de cada función en cProfile (la primera que coincide)
+CATEGORIAS = (
+    ('BD', ('django/db/', 'sqlite3', 'psycopg', 'MySQLdb')),
+    ('pandas', ('pandas/', 'pandas.')),
+    ('sklearn', ('sklearn/', 'sklearn.', 'joblib/', 'threadpoolctl')),
+    ('numpy', ('numpy/', 'numpy.')),
+    ('predictions', ('/predictions/',)),
+    ('Django/DRF', ('django/', 'rest_framework/')),
+)
+RESTO = 'resto'
+
+
+def _percentil(valores, p):
+    return float(np.percentile(valores, p)) * 1000
+
+
+def _rss_maximo_mb():
+    """Pico de memoria residente del proceso (MB), o None si no se puede medir."""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo da en KB, macOS en bytes
+    return pico / (1024 * 1024) if sys.platform == 'darwin' else pico / 1024
+
+
+def _categoria(funcion):
+    archivo, _, nombre = funcion
+    texto = f"{archivo.replace(os.sep, '/')} {nombre}"
+    for categoria, marcas in CATEGORIAS:
+        if any(marca in texto for marca in marcas):
+            return categoria
+    return RESTO
+
+
+class _TiempoBD:
+    """execute_wrapper que acumula consultas y tiempo dentro del driver."""
+
+    def __init__(self):
+        self.consultas = 0
+        self.segundos = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.segundos += time.perf_counter() - inicio
+            self.consultas += 1
+
+
+class Command(BaseCommand):
+    help = "⏱️ Mide latencia (p50/p95/p99), throughput, memoria y reparto de tiempo de las predicciones sobre datos sintéticos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--productos', type=int, default=200,
+                            help='Productos del catálogo sintético (default: 200).')
+        parser.add_argument('--subcategorias', type=int, default=10,
+                            help='Subcategorías del catálogo sintético (default: 10).')
+        parser.add_argument('--ventas', type=int, default=5000,
+                            help='Ventas de la historia sintética (default: 5000).')
+        parser.add_argument('--items-por-venta', type=int, default=3,
+                            help='Máximo de productos distintos por venta (default: 3).')
+        parser.add_argument('--semanas', type=int, default=52,
+                            help='Semanas de historia hacia atrás desde hoy (default: 52).')
+        parser.add_argument('--repeticiones', type=int, default=200,
+                            help='Requests medidos por escenario (default: 200).')
+        parser.add_argument('--calentamiento', type=int, default=10,
+                            help='Requests sin medir antes de cada escenario (default: 10).')
+        parser.add_argument('--perfil', type=int, default=50,
+                            help='Requests de la pasada con cProfile por escenario; 0 = sin perfil (default: 50).')
+        parser.add_argument('--arboles', type=int, default=100,
+                            help='n_estimators de los modelos entrenados (default: 100).')
+        parser.add_argument('--publicados', action='store_true',
+                            help='No entrenar: medir los modelos activos de ML_MODELS_DIR.')
+        parser.add_argument('--con-cache', action='store_true',
+                            help='Dejar activo el caché de predicciones (por defecto se mide sin caché).')
+        parser.add_argument('--semilla', type=int, default=42,
+                            help='Semilla de los datos sintéticos y de los ids pedidos (default: 42).')
+        parser.add_argument('--json', dest='salida_json',
+                            help='Guardar los resultados en este archivo JSON (para comparar corridas).')
+
+    def handle(self, *args, **options):
+        for opcion in ('productos', 'subcategorias', 'ventas', 'items_por_venta', 'semanas', 'repeticiones'):
+            if options[opcion] < 1:
+                raise CommandError(f"--{opcion.replace('_', '-')} debe ser mayor que 0.")
+        rng = np.random.default_rng(options['semilla'])
+
+        directorio = None if options['publicados'] else tempfile.mkdtemp(prefix='bench_predictions_')
+        ajustes = {'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'testserver']}
+        if directorio is not None:
+            ajustes['ML_MODELS_DIR'] = directorio
+        if not options['con_cache']:
+            ajustes['ML_PREDICTION_CACHE'] = 'none'
+        elif getattr(settings, 'ML_PREDICTION_CACHE', 'django') == 'django' and isinstance(
+            caches[getattr(settings, 'ML_PREDICTION_CACHE_ALIAS', 'default')], LocMemCache
+        ):
+            # Sin redis configurado: el benchmark corre en un solo proceso, vale el caché local
+            ajustes['ML_PREDICTION_CACHE'] = 'local'
+
+        try:
+            with override_settings(**ajustes):
+                model_registry.clear()
+                prediction_cache.reset()
+                with transaction.atomic():
+                    resultados = self._correr(options, rng, entrenar=directorio is not None)
+                    # Los datos sintéticos no quedan en la base
+                    transaction.set_rollback(True)
+        finally:
+            model_registry.clear()
+            prediction_cache.reset()
+            if directorio is not None:
+                shutil.rmtree(directorio, ignore_errors=True)
+
+        if options['salida_json']:
+            with open(options['salida_json'], 'w', encoding='utf-8') as f:
+                json.dump(resultados, f, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f"💾 Resultados guardados en {options['salida_json']}"))
+
+    # -----------------------------------------------------------------
+    # 🔹 Orquestación
+    # -----------------------------------------------------------------
+    def _correr(self, options, rng, entrenar):
+        inicio = time.perf_counter()
+        datos = self._sembrar(options, rng)
+        feature_store.reconstruir(datos['empresa_id'])
+        self.stdout.write(
+            f"🌱 {len(datos['productos'])} productos, {len(datos['subcategorias'])} subcategorías, "
+            f"{options['ventas']} ventas ({datos['detalles']} detalles) en {time.perf_counter() - inicio:.1f}s"
+        )
+
+        if entrenar:
+            self._entrenar(datos['empresa_id'], options['arboles'])
+        cargados = {
+            nombre: model_registry.get_loaded(nombre, datos['empresa_id'])
+            for nombre in ('sales_category_model', 'demand_product_model', 'recommendation_model')
+        }
+
+        resultados = {
+            'parametros': {k: options[k] for k in (
+                'productos', 'subcategorias', 'ventas', 'items_por_venta', 'semanas',
+                'repeticiones', 'arboles', 'publicados', 'con_cache', 'semilla')},
+            'escenarios': [],
+        }
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"\n{'escenario':<28} {'p50':>8} {'p95':>8} {'p99':>8} {'req/s':>8} "
+            f"{'consultas':>9} {'SQL':>6} {'RSS pico':>9}"
+        ))
+        for nombre, llamar in self._escenarios(datos, cargados, rng):
+            resultado = self._medir(nombre, llamar, options)
+            resultados['escenarios'].append(resultado)
+            rss = resultado['rss_pico_mb']
+            self.stdout.write(
+                f"{nombre:<28} {resultado['p50_ms']:>6.2f}ms {resultado['p95_ms']:>6.2f}ms "
+                f"{resultado['p99_ms']:>6.2f}ms {resultado['requests_por_segundo']:>8.1f} "
+                f"{resultado['consultas_por_request']:>9.1f} {resultado['sql_pct']:>5.1f}% "
+                + (f"{rss:>7.0f}MB" if rss is not None else f"{'-':>9}")
+            )
+
+        if options['perfil'] > 0:
+            nombres = [c for c, _ in CATEGORIAS] + [RESTO]
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                "\nReparto del tiempo propio (cProfile)\n"
+                f"{'escenario':<28} " + ' '.join(f"{c:>11}" for c in nombres)
+            ))
+            for resultado in resultados['escenarios']:
+                reparto = resultado['reparto_pct']
+                self.stdout.write(
+                    f"{resultado['escenario']:<28} " + ' '.join(f"{reparto.get(c, 0.0):>10.1f}%" for c in nombres)
+                )
+        return resultados
+
+    # -----------------------------------------------------------------
+    # 🔹 Datos sintéticos
+    # -----------------------------------------------------------------
+    def _sembrar(self, options, rng):
+        sufijo = uuid.uuid4().hex[:8]
+        empresa = Empresa.objects.create(nombre=f'Benchmark {sufijo}', nit=f'BENCH-{sufijo}')
+        categoria = Categoria.objects.create(nombre='Benchmark', empresa=empresa)
+        SubCategoria.objects.bulk_create([
+            SubCategoria(nombre=f'Subcategoría {i}', categoria=categoria, empresa=empresa)
+            for i in range(options['subcategorias'])
+        ])
+        subcategorias = np.array(SubCategoria.objects.filter(empresa=empresa).order_by('id')
+                                 .values_list('id', flat=True))
+
+        precios = rng.integers(5, 500, size=options['productos'])
+        Producto.objects.bulk_create([
+            Producto(
+                empresa=empresa, nombre=f'Producto {i}', sku=f'BENCH-{sufijo}-{i:06d}',
+                subcategoria_id=int(subcategorias[i % len(subcategorias)]), precio_venta=Decimal(int(precio)),
+            )
+            for i, precio in enumerate(precios)
+        ], batch_size=BATCH_SIZE)
+        productos = np.array(Producto.objects.filter(empresa=empresa).order_by('id')
+                             .values_list('id', flat=True))
+        sucursal = Sucursal.objects.create(nombre='Benchmark', empresa=empresa)
+        usuario = User.objects.create_user(email=f'bench-{sufijo}@benchmark.invalid', empresa=empresa)
+
+        # Popularidad tipo Zipf: pocos productos venden mucho, como en un catálogo real
+        popularidad = 1.0 / np.arange(1, len(productos) + 1) ** 0.8
+        popularidad /= popularidad.sum()
+        segundos = options['semanas'] * 7 * 24 * 3600
+        ahora = timezone.now()
+
+        ventas, detalles = [], []
+        for v in range(options['ventas']):
+            nota = f'B{sufijo}-{v}'
+            items = min(int(rng.integers(1, options['items_por_venta'] + 1)), len(productos))
+            total = 0
+            for posicion in rng.choice(len(productos), size=items, replace=False, p=popularidad):
+                cantidad = int(rng.integers(1, 6))
+                precio = int(precios[posicion])
+                total += cantidad * precio
+                # DetalleVenta.save calcula el subtotal; bulk_create no pasa por save
+                detalles.append((nota, int(productos[posicion]), cantidad, precio))
+            ventas.append(Venta(
+                empresa=empresa, numero_nota=nota, usuario=usuario, sucursal=sucursal,
+                fecha=ahora - timedelta(seconds=int(rng.integers(0, segundos))),
+                total=Decimal(total), canal='POS' if v % 3 else 'WEB', estado='entregado',
+            ))
+        Venta.objects.bulk_create(ventas, batch_size=BATCH_SIZE)
+
+        # No todos los backends devuelven los ids en bulk_create: se buscan por nota
+        venta_ids = dict(Venta.objects.filter(empresa=empresa).values_list('numero_nota', 'id'))
+        DetalleVenta.objects.bulk_create([
+            DetalleVenta(
+                empresa=empresa, venta_id=venta_ids[nota], producto_id=producto_id,
+                cantidad=cantidad, precio_unitario=Decimal(precio), subtotal=Decimal(cantidad * precio),
+            )
+            for nota, producto_id, cantidad, precio in detalles
+        ], batch_size=BATCH_SIZE)
+
+        return {
+            'empresa_id': empresa.id,
+            'productos': productos,
+            'subcategorias': subcategorias,
+            'detalles': len(detalles),
+        }
+
+    def _entrenar(self, empresa_id, arboles):
+        inicio = time.perf_counter()
+        datos = extraer_detalles(DetalleVenta.objects.filter(venta__empresa_id=empresa_id))
+        n_jobs = presupuesto_nucleos(1, 1)
+        for clave in ('m1', 'm2', 'm3'):
+            try:
+                entrenar_modelo(clave, datos, {'n_estimators': arboles}, n_jobs=n_jobs, empresa_id=empresa_id)
+            except DatosInsuficientes as e:
+                raise CommandError(f"No se pudo entrenar {clave} con los datos sintéticos ({e}); "
+                                   f"pruebe con más --ventas o --semanas.")
+        call_command('build_recommendation_index', empresa=empresa_id, stdout=io.StringIO())
+        model_registry.clear()
+        self.stdout.write(f"🧠 Modelos entrenados ({arboles} árboles) en {time.perf_counter() - inicio:.1f}s")
+
+    # -----------------------------------------------------------------
+    # 🔹 Escenarios
+    # -----------------------------------------------------------------
+    def _escenarios(self, datos, cargados, rng):
+        """(nombre, función sin argumentos) por cada camino a medir."""
+        empresa_id = datos['empresa_id']
+        productos, subcategorias = datos['productos'], datos['subcategorias']
+        cliente = APIClient()
+
+        def producto():
+            return int(rng.choice(productos))
+
+        def subcategoria():
+            return int(rng.choice(subcategorias))
+
+        def get(nombre_url, identificador):
+            def llamar():
+                respuesta = cliente.get(reverse(nombre_url, args=[identificador()]), {'empresa': empresa_id})
+                if respuesta.status_code != 200:
+                    raise CommandError(f"{nombre_url} respondió {respuesta.status_code}: {respuesta.content[:200]!r}")
+            return llamar
+
+        escenarios = [
+            ('HTTP PredictSales', get('predict_sales_category', subcategoria)),
+            ('HTTP PredictDemand', get('predict_demand', producto)),
+            ('HTTP RecommendProduct', get('predict_recommend', producto)),
+        ]
+
+        # Lo mismo sin HTTP: pistas desde el feature store + modelo
+        hoy = timezone.now()
+        ventas, demanda, reco = (cargados['sales_category_model'], cargados['demand_product_model'],
+                                 cargados['recommendation_model'])
+        if ventas is not None:
+            escenarios.append(('modelo ventas (m1)', lambda: predecir(
+                ventas.modelo, features.pistas_ventas_subcategoria(ventas, [subcategoria()], hoy), ventas.compilado)))
+        if demanda is not None:
+            escenarios.append(('modelo demanda (m2)', lambda: predecir(
+                demanda.modelo, features.pistas_demanda(demanda, [producto()], hoy), demanda.compilado)))
+        if reco is not None:
+            # El camino de respaldo de RecommendProduct (sin índice): todo el catálogo contra el modelo
+            def recomendar():
+                producto_id = producto()
+                candidatos = productos[productos != producto_id]
+                return puntuar_candidatos(reco.modelo, producto_id, candidatos, reco.compilado)
+            escenarios.append(('modelo recomendación (m3)', recomendar))
+        return escenarios
+
+    # -----------------------------------------------------------------
+    # 🔹 Medición
+    # -----------------------------------------------------------------
+    def _medir(self, nombre, llamar, options):
+        for _ in range(options['calentamiento']):
+            llamar()
+
+        gc.collect()
+        tiempo_sql = _TiempoBD()
+        tiempos = []
+        with connection.execute_wrapper(tiempo_sql):
+            inicio_total = time.perf_counter()
+            for _ in range(options['repeticiones']):
+                inicio = time.perf_counter()
+                llamar()
+                tiempos.append(time.perf_counter() - inicio)
+            total = time.perf_counter() - inicio_total
+
+        resultado = {
+            'escenario': nombre,
+            'repeticiones': len(tiempos),
+            'p50_ms': _percentil(tiempos, 50),
+            'p95_ms': _percentil(tiempos, 95),
+            'p99_ms': _percentil(tiempos, 99),
+            'requests_por_segundo': len(tiempos) / total,
+            'consultas_por_request': tiempo_sql.consultas / len(tiempos),
+            'sql_pct': 100 * tiempo_sql.segundos / total,
+            'rss_pico_mb': _rss_maximo_mb(),
+            'reparto_pct': {},
+        }
+
+        # Pasada aparte: cProfile infla la latencia, así que no se mezcla con la medición
+        if options['perfil'] > 0:
+            perfil = cProfile.Profile()
+            perfil.enable()
+            for _ in range(options['perfil']):
+                llamar()
+            perfil.disable()
+            propio = {}
+            for funcion, (_, _, tiempo_propio, _, _) in pstats.Stats(perfil).stats.items():
+                categoria = _categoria(funcion)
+                propio[categoria] = propio.get(categoria, 0.0) + tiempo_propio
+            suma = sum(propio.values()) or 1.0
+            resultado['reparto_pct'] = {c: 100 * t / suma for c, t in sorted(propio.items())}
+        return resultado
@@ -0,0 +1,75 @@
+# predictions/management/commands/build_recommendation_index.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from products.models import Producto
+from predictions.registry import model_registry
+from predictions.recommendations import (
+    DEFAULT_TOP_K,
+    construir_indice_por_empresa,
+    guardar_indice,
+    ruta_indice,
+)
+
+
+class Command(BaseCommand):
+    help = "🧭 Precalcula el top-K de recomendaciones por producto (correr después de train_models)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--k',
+            type=int,
+            default=DEFAULT_TOP_K,
+            help=f'Cantidad de vecinos a guardar por producto (default: {DEFAULT_TOP_K}).',
+        )
+        parser.add_argument(
+            '--empresa',
+            type=int,
+            help='Construir el índice del modelo dedicado de esta empresa (solo sus productos).',
+        )
+        parser.add_argument(
+            '--max-pares',
+            type=int,
+            default=200_000,
+            help='Máximo de pares a puntuar por llamada al modelo (controla la memoria).',
+        )
+
+    def handle(self, *args, **options):
+        empresa_id = options.get('empresa')
+        cargado = model_registry.get_loaded('recommendation_model', empresa_id, fallback=False)
+        if cargado is None:
+            self.stdout.write(self.style.ERROR(
+                f"❌ No se pudo cargar '{model_registry.path('recommendation_model', empresa_id)}'. "
+                f"¿Corriste train_models?"
+            ))
+            return
+
+        productos = Producto.objects.all()
+        if empresa_id is not None:
+            productos = productos.filter(empresa_id=empresa_id)
+        # El modelo global se entrena con todas las empresas, pero cada
+        # producto solo recibe vecinos de la suya (bloques por empresa)
+        productos_por_empresa = {}
+        for producto_empresa, producto_id in productos.order_by('id').values_list('empresa_id', 'id'):
+            productos_por_empresa.setdefault(producto_empresa, []).append(producto_id)
+        total = sum(len(ids) for ids in productos_por_empresa.values())
+        if total < 2:
+            self.stdout.write(self.style.WARNING("⚠️ Se necesitan al menos 2 productos para construir el índice."))
+            return
+
+        self.stdout.write(
+            f"⏳ Puntuando {total} productos de {len(productos_por_empresa)} empresa(s) (top-{options['k']}, "
+            f"modelo versión {cargado.version or 'sin versión'}"
+            f"{f', empresa {empresa_id}' if empresa_id is not None else ''})..."
+        )
+        inicio = time.perf_counter()
+        ids, vecinos, scores = construir_indice_por_empresa(
+            cargado.modelo, productos_por_empresa, k=options['k'], max_pares=options['max_pares'],
+            compilado=cargado.compilado,
+        )
+        # Se guarda dentro de la versión del modelo que lo generó
+        path = guardar_indice(ids, vecinos, scores, ruta_indice(cargado.directorio))
+        duracion = time.perf_counter() - inicio
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Índice guardado en {path} ({duracion:.1f}s)."))
@@ -0,0 +1,28 @@
+# predictions/management/commands/rebuild_feature_store.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from predictions.cache import prediction_cache
+from predictions.feature_store import reconstruir
+
+
+class Command(BaseCommand):
+    help = "🧮 Recalcula los totales semanales por producto y mensuales por subcategoría (feature store)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--empresa',
+            type=int,
+            help='Recalcular solo esta empresa (por defecto, todas).',
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        semanales, mensuales = reconstruir(options.get('empresa'))
+        # Las predicciones en caché se calcularon con los totales anteriores
+        prediction_cache.invalidate_all()
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Feature store recalculado: {semanales} filas semanales, {mensuales} mensuales "
+            f"({time.perf_counter() - inicio:.1f}s)."
+        ))
@@ -0,0 +1,118 @@
+# predictions/management/commands/run_training_worker.py
+import multiprocessing
+import os
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from predictions import jobs
+from predictions.models import TrainingJob
+from predictions.training import presupuesto_nucleos
+
+
+class Command(BaseCommand):
+    help = "🏭 Worker de entrenamientos: toma los TrainingJob pendientes y los corre en un pool de procesos."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrencia',
+            type=int,
+            default=getattr(settings, 'ML_TRAINING_MAX_CONCURRENT', 2),
+            help='Jobs a correr al mismo tiempo (default: ML_TRAINING_MAX_CONCURRENT).',
+        )
+        parser.add_argument(
+            '--cores',
+            type=int,
+            default=os.cpu_count(),
+            help='Presupuesto total de núcleos a repartir entre los jobs (default: todos).',
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=getattr(settings, 'ML_TRAINING_POLL_SECONDS', 5),
+            help='Segundos entre revisiones de la cola (default: ML_TRAINING_POLL_SECONDS).',
+        )
+        parser.add_argument(
+            '--vencimiento',
+            type=int,
+            default=10,
+            help='Minutos sin latido para dar por muerto un job en curso de otro worker (default: 10).',
+        )
+        parser.add_argument(
+            '--una-vez',
+            action='store_true',
+            help='Vaciar la cola y salir (para cron) en vez de quedarse esperando jobs nuevos.',
+        )
+
+    def handle(self, *args, **options):
+        concurrencia = max(1, options['concurrencia'])
+        n_jobs = presupuesto_nucleos(concurrencia, concurrencia, options['cores'])
+        nombre = f"{socket.gethostname()}:{os.getpid()}"
+        self.stdout.write(self.style.HTTP_INFO(
+            f"🏭 Worker {nombre}: hasta {concurrencia} job(s) a la vez × {n_jobs} núcleo(s)"
+        ))
+
+        vencidos = jobs.marcar_vencidos(options['vencimiento'])
+        if vencidos:
+            self.stdout.write(self.style.WARNING(f"⚠️ Jobs sin worker marcados como fallidos: {vencidos}"))
+
+        en_curso = {}
+        pool = self._pool(concurrencia)
+        try:
+            while True:
+                roto = False
+                for futuro in [f for f in en_curso if f.done()]:
+                    roto |= isinstance(futuro.exception(), BrokenProcessPool)
+                    self._reportar(en_curso.pop(futuro), futuro)
+                if roto and not en_curso:
+                    # Un proceso murió (p. ej. sin memoria): el pool ya no acepta tareas
+                    pool.shutdown(wait=False)
+                    pool = self._pool(concurrencia)
+
+                while len(en_curso) < concurrencia:
+                    job = jobs.tomar_siguiente(nombre)
+                    if job is None:
+                        break
+                    self.stdout.write(
+                        f"▶️ Job #{job.id} ({job.empresa_id or 'global'}: {', '.join(job.modelos)})"
+                    )
+                    en_curso[pool.submit(jobs.ejecutar, job.id, n_jobs)] = job.id
+
+                if options['una_vez'] and not en_curso:
+                    break
+                jobs.latido(en_curso.values())
+                time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING("\n⏹️ Deteniendo el worker..."))
+            for job_id in en_curso.values():
+                jobs.marcar_fallido(job_id, "El worker se detuvo antes de terminar.")
+            pool.shutdown(wait=False, cancel_futures=True)
+            return
+        pool.shutdown()
+
+    def _pool(self, concurrencia):
+        # 'spawn': cada proceso arranca Django y abre su propia conexión a la BD
+        # en vez de heredar la del padre (DJANGO_SETTINGS_MODULE se hereda del entorno)
+        return ProcessPoolExecutor(
+            max_workers=concurrencia,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup,
+        )
+
+    def _reportar(self, job_id, futuro):
+        try:
+            estado = futuro.result()
+        except Exception as e:
+            # El proceso murió (p. ej. sin memoria) antes de poder guardar el error
+            jobs.marcar_fallido(job_id, f"{type(e).__name__}: {e}")
+            self.stdout.write(self.style.ERROR(f"❌ Job #{job_id}: {type(e).__name__}: {e}"))
+            return
+        if estado == TrainingJob.COMPLETADO:
+            self.stdout.write(self.style.SUCCESS(f"✅ Job #{job_id} completado"))
+        else:
+            self.stdout.write(self.style.ERROR(f"❌ Job #{job_id} {estado} (ver TrainingJob.error)"))
@@ -0,0 +1,248 @@
+# predictions/management/commands/train_models.py
+import os
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from predictions.dataset import DEFAULT_CHUNK_SIZE, extraer_detalles
+from predictions.features import tabla_precios
+from predictions.incremental import actualizar_acumulado
+from predictions.recommendations import DEFAULT_TOP_K
+from predictions.training import (
+    MODELOS,
+    OPCIONES_DEFAULT,
+    empresas_para_entrenar,
+    entrenar_modelos,
+    presupuesto_nucleos,
+)
+
+
+def _etiqueta(resultado):
+    if resultado.get('empresa_id') is None:
+        return resultado['clave']
+    return f"{resultado['clave']}@empresa {resultado['empresa_id']}"
+
+
+class Command(BaseCommand):
+    help = "🧠 Entrena y publica los modelos ML (M1 ventas por categoría, M2 demanda, M3 recomendación)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--models',
+            default=','.join(MODELOS),
+            help=f"Modelos a entrenar, separados por coma (default: {','.join(MODELOS)}).",
+        )
+        parser.add_argument(
+            '--jobs',
+            type=int,
+            default=1,
+            help='Modelos a entrenar al mismo tiempo (procesos). Default: 1 (uno tras otro).',
+        )
+        parser.add_argument(
+            '--cores',
+            type=int,
+            default=os.cpu_count(),
+            help='Presupuesto total de núcleos a repartir entre los modelos (default: todos).',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=int(os.environ.get('TRAIN_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)),
+            help='Filas por bloque al leer detalle_venta.',
+        )
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Leer solo los detalles nuevos desde la última corrida y sumarlos a los '
+                 'buckets semanales/mensuales guardados (ml_models/acumulado.pkl).',
+        )
+        parser.add_argument(
+            '--desde-cero',
+            action='store_true',
+            help='Con --incremental: descartar lo acumulado y volver a procesar toda la historia.',
+        )
+        parser.add_argument(
+            '--reco-modo',
+            choices=['clasificador', 'similitud'],
+            default=OPCIONES_DEFAULT['reco_modo'],
+            help="M3: RandomForest con negativos muestreados, o similitud ítem-ítem dispersa.",
+        )
+        parser.add_argument(
+            '--negativos-por-positivo',
+            type=int,
+            default=OPCIONES_DEFAULT['negativos_por_positivo'],
+            help="M3 (clasificador): pares negativos a muestrear por cada par positivo.",
+        )
+        parser.add_argument(
+            '--similitud',
+            choices=['cosine', 'lift'],
+            default=OPCIONES_DEFAULT['similitud'],
+            help="M3 (similitud): métrica ítem-ítem.",
+        )
+        parser.add_argument(
+            '--rezagos',
+            type=int,
+            default=OPCIONES_DEFAULT['rezagos_semanales'],
+            help="M2: semanas anteriores usadas como pistas (rezagos 1..k).",
+        )
+        parser.add_argument(
+            '--rezagos-mensuales',
+            type=int,
+            default=OPCIONES_DEFAULT['rezagos_mensuales'],
+            help="M1: meses anteriores usados como pistas (rezagos 1..k).",
+        )
+        parser.add_argument(
+            '--con-precios',
+            action='store_true',
+            help="M1/M2: usar precio de venta y descuentos activos como pistas (son los de HOY "
+                 "también para la historia: Descuento no guarda fechas).",
+        )
+        parser.add_argument(
+            '--por-empresa',
+            action='store_true',
+            help='Además de los globales, entrenar un modelo dedicado por empresa (ver --min-filas).',
+        )
+        parser.add_argument(
+            '--empresas',
+            help='IDs de empresa separados por coma (implica --por-empresa).',
+        )
+        parser.add_argument(
+            '--min-filas',
+            type=int,
+            default=getattr(settings, 'ML_TRAINING_MIN_FILAS', 1000),
+            help='Detalles de venta mínimos para que una empresa tenga modelo propio '
+                 '(default: ML_TRAINING_MIN_FILAS, 1000).',
+        )
+        parser.add_argument(
+            '--sin-global',
+            action='store_true',
+            help='No entrenar los modelos globales (solo los de empresa).',
+        )
+        parser.add_argument(
+            '--sin-indice',
+            action='store_true',
+            help='No reconstruir el índice top-K de recomendaciones después de entrenar M3.',
+        )
+
+    def handle(self, *args, **options):
+        claves = [c.strip() for c in options['models'].split(',') if c.strip()]
+        desconocidos = [c for c in claves if c not in MODELOS]
+        if desconocidos or not claves:
+            raise CommandError(f"Modelos desconocidos: {desconocidos}. Opciones: {', '.join(MODELOS)}")
+
+        empresas_pedidas = None
+        if options['empresas']:
+            try:
+                empresas_pedidas = [int(e) for e in options['empresas'].split(',') if e.strip()]
+            except ValueError:
+                raise CommandError("--empresas debe ser una lista de IDs separados por coma.")
+        por_empresa = options['por_empresa'] or empresas_pedidas is not None
+        if options['desde_cero'] and not options['incremental']:
+            raise CommandError("--desde-cero solo tiene sentido con --incremental.")
+        if options['sin_global'] and not por_empresa:
+            raise CommandError("--sin-global requiere --por-empresa o --empresas.")
+
+        jobs = max(1, options['jobs'])
+        cores = max(1, options['cores'] or 1)
+        opciones = {
+            'reco_modo': options['reco_modo'],
+            'negativos_por_positivo': options['negativos_por_positivo'],
+            'similitud': options['similitud'],
+            'rezagos_semanales': options['rezagos'],
+            'rezagos_mensuales': options['rezagos_mensuales'],
+            'precios': options['con_precios'],
+        }
+        inicio_total = time.perf_counter()
+
+        # --- 1. Extracción (una sola pasada por la BD, o solo lo nuevo) ---
+        inicio = time.perf_counter()
+        if options['incremental']:
+            self.stdout.write(self.style.HTTP_INFO("📥 Sumando detalles de venta nuevos al acumulado..."))
+            datos, filas_nuevas, marca_anterior = actualizar_acumulado(
+                chunk_size=options['chunk_size'], desde_cero=options['desde_cero']
+            )
+            t_extraccion = time.perf_counter() - inicio
+            self.stdout.write(
+                f"   {filas_nuevas} filas nuevas (id {marca_anterior} → {datos.marca}), "
+                f"{len(datos.semanas)} buckets semanales, {len(datos.meses)} mensuales, "
+                f"{datos.C.nnz} pares en {t_extraccion:.2f}s"
+            )
+        else:
+            self.stdout.write(self.style.HTTP_INFO(
+                f"📥 Leyendo detalles de venta (bloques de {options['chunk_size']})..."
+            ))
+            datos = extraer_detalles(chunk_size=options['chunk_size'])
+            t_extraccion = time.perf_counter() - inicio
+            self.stdout.write(
+                f"   {len(datos)} filas, {datos.memory_usage(index=False).sum() / 1e6:.1f} MB "
+                f"en {t_extraccion:.2f}s"
+            )
+
+        if opciones['precios'] and {'m1', 'm2'} & set(claves):
+            # Una consulta aquí en vez de una por modelo dentro de los workers
+            opciones['tabla_precios'] = tabla_precios()
+
+        empresas = []
+        if por_empresa:
+            empresas = empresas_para_entrenar(datos, options['min_filas'], empresas_pedidas)
+            self.stdout.write(
+                f"🏢 Empresas con modelo propio (≥ {options['min_filas']} filas): "
+                f"{', '.join(map(str, empresas)) or 'ninguna'}"
+            )
+
+        # --- 2. Entrenamiento (en paralelo si --jobs > 1) ---
+        n_tareas = len(claves) * (len(empresas) + (0 if options['sin_global'] else 1))
+        if n_tareas == 0:
+            self.stdout.write(self.style.WARNING("⚠️ No hay modelos para entrenar."))
+            return
+        n_jobs = presupuesto_nucleos(n_tareas, jobs, cores)
+        self.stdout.write(self.style.HTTP_INFO(
+            f"🧠 Entrenando {n_tareas} modelo(s) con {min(jobs, n_tareas)} proceso(s) × {n_jobs} núcleo(s)..."
+        ))
+
+        def al_terminar(r):
+            descripcion = MODELOS[r['clave']][1]
+            if 'error' in r:
+                self.stdout.write(self.style.ERROR(f"   ❌ {_etiqueta(r)} ({descripcion}): {r['error']}"))
+            elif 'omitido' in r:
+                self.stdout.write(self.style.WARNING(f"   ⚠️ {_etiqueta(r)} ({descripcion}): {r['omitido']}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    f"   ✅ {_etiqueta(r)} ({descripcion}) publicado, versión {r['version']} ({r['filas']} filas)"
+                ))
+
+        inicio = time.perf_counter()
+        resultados = entrenar_modelos(
+            datos, claves, opciones, jobs=jobs, cores=cores, al_terminar=al_terminar,
+            empresas=empresas, incluir_global=not options['sin_global'],
+        )
+        t_entrenamiento = time.perf_counter() - inicio
+
+        # --- 3. Índice de recomendaciones para cada versión recién publicada ---
+        t_indice = None
+        m3_publicados = [r for r in resultados if r['clave'] == 'm3' and 'version' in r]
+        if m3_publicados and not options['sin_indice']:
+            inicio = time.perf_counter()
+            for r in m3_publicados:
+                call_command('build_recommendation_index', k=DEFAULT_TOP_K,
+                             empresa=r['empresa_id'], stdout=self.stdout)
+            t_indice = time.perf_counter() - inicio
+
+        # --- 4. Reporte de tiempos (wall-clock) ---
+        self.stdout.write(self.style.HTTP_INFO("\n⏱️  Tiempos por etapa (s):"))
+        self.stdout.write(f"   {'extracción':<28}{t_extraccion:>8.2f}")
+        for r in resultados:
+            tiempos = r.get('tiempos')
+            if not tiempos:
+                continue
+            for etapa, segundos in tiempos.items():
+                self.stdout.write(f"   {_etiqueta(r) + ' · ' + etapa:<28}{segundos:>8.2f}")
+        self.stdout.write(f"   {'entrenamiento (wall)':<28}{t_entrenamiento:>8.2f}")
+        if t_indice is not None:
+            self.stdout.write(f"   {'índice top-K':<28}{t_indice:>8.2f}")
+        self.stdout.write(f"   {'TOTAL':<28}{time.perf_counter() - inicio_total:>8.2f}")
+
+        if any('error' in r for r in resultados):
+            raise CommandError("Uno o más modelos fallaron (ver arriba).")
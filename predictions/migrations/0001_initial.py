@@ -0,0 +1,45 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('products', '0007_alter_categoria_nombre_alter_producto_sku_and_more'),
+        ('tenants', '0002_plan_alter_empresa_plan'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentaMensualSubcategoria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField()),
+                ('cantidad', models.PositiveIntegerField(default=0)),
+                ('empresa', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='ventas_mensuales_subcategoria', to='tenants.empresa')),
+                ('subcategoria', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ventas_mensuales', to='products.subcategoria')),
+            ],
+            options={
+                'db_table': 'venta_mensual_subcategoria',
+                'unique_together': {('subcategoria', 'mes')},
+            },
+        ),
+        migrations.CreateModel(
+            name='VentaSemanalProducto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('semana', models.DateField()),
+                ('cantidad', models.PositiveIntegerField(default=0)),
+                ('empresa', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='ventas_semanales_producto', to='tenants.empresa')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ventas_semanales', to='products.producto')),
+            ],
+            options={
+                'db_table': 'venta_semanal_producto',
+                'unique_together': {('producto', 'semana')},
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictions', '0001_initial'),
+        ('tenants', '0002_plan_alter_empresa_plan'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrainingJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelos', models.JSONField(default=list)),
+                ('opciones', models.JSONField(blank=True, default=dict)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_curso', 'En curso'), ('completado', 'Completado'), ('fallido', 'Fallido')], default='pendiente', max_length=20)),
+                ('etapa', models.CharField(blank=True, default='', max_length=50)),
+                ('progreso', models.PositiveSmallIntegerField(default=0)),
+                ('etapas', models.JSONField(blank=True, default=list)),
+                ('resultados', models.JSONField(blank=True, default=list)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('worker', models.CharField(blank=True, default='', max_length=100)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('iniciado', models.DateTimeField(blank=True, null=True)),
+                ('terminado', models.DateTimeField(blank=True, null=True)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+                ('empresa', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='entrenamientos', to='tenants.empresa')),
+                ('solicitado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='entrenamientos', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'training_job',
+                'ordering': ['-creado'],
+                'indexes': [models.Index(fields=['estado', 'creado'], name='training_job_estado_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('estado__in', ['pendiente', 'en_curso'])), fields=('empresa',), name='training_job_activo_por_empresa')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 20:04
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictions', '0002_training_job'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='trainingjob',
+            constraint=models.UniqueConstraint(django.db.models.functions.comparison.Coalesce('empresa', models.Value(0)), condition=models.Q(('empresa__isnull', True), ('estado__in', ['pendiente', 'en_curso'])), name='training_job_activo_global'),
+        ),
+    ]
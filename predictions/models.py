@@ -1,3 +1,105 @@
+# predictions/models.py
 from django.db import models
+from django.db.models import Value
+from django.db.models.functions import Coalesce
 
-# Create your models here.
+
+# ---------------------------------------------------------------------
+# 🔹 Feature store: totales de ventas ya agregados para las predicciones
+# (se actualizan con la señal `venta_registrada`, ver predictions/feature_store.py)
+# ---------------------------------------------------------------------
+class VentaSemanalProducto(models.Model):
+    empresa = models.ForeignKey(
+        'tenants.Empresa', on_delete=models.CASCADE, null=True, blank=True, related_name='ventas_semanales_producto'
+    )
+    producto = models.ForeignKey('products.Producto', on_delete=models.CASCADE, related_name='ventas_semanales')
+    semana = models.DateField()  # lunes de la semana (UTC)
+    cantidad = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'venta_semanal_producto'
+        unique_together = ('producto', 'semana')
+
+    def __str__(self):
+        return f"{self.producto_id} - semana {self.semana}: {self.cantidad}"
+
+
+class VentaMensualSubcategoria(models.Model):
+    empresa = models.ForeignKey(
+        'tenants.Empresa', on_delete=models.CASCADE, null=True, blank=True, related_name='ventas_mensuales_subcategoria'
+    )
+    subcategoria = models.ForeignKey(
+        'products.SubCategoria', on_delete=models.CASCADE, related_name='ventas_mensuales'
+    )
+    mes = models.DateField()  # primer día del mes (UTC)
+    cantidad = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'venta_mensual_subcategoria'
+        unique_together = ('subcategoria', 'mes')
+
+    def __str__(self):
+        return f"{self.subcategoria_id} - {self.mes:%Y-%m}: {self.cantidad}"
+
+
+# ---------------------------------------------------------------------
+# 🔹 Entrenamientos en segundo plano (ver predictions/jobs.py)
+# ---------------------------------------------------------------------
+class TrainingJob(models.Model):
+    PENDIENTE = 'pendiente'
+    EN_CURSO = 'en_curso'
+    COMPLETADO = 'completado'
+    FALLIDO = 'fallido'
+    ESTADOS = (
+        (PENDIENTE, 'Pendiente'),
+        (EN_CURSO, 'En curso'),
+        (COMPLETADO, 'Completado'),
+        (FALLIDO, 'Fallido'),
+    )
+    ACTIVOS = (PENDIENTE, EN_CURSO)
+
+    # None = modelos globales
+    empresa = models.ForeignKey(
+        'tenants.Empresa', on_delete=models.CASCADE, null=True, blank=True, related_name='entrenamientos'
+    )
+    solicitado_por = models.ForeignKey(
+        'users.User', on_delete=models.SET_NULL, null=True, blank=True, related_name='entrenamientos'
+    )
+    modelos = models.JSONField(default=list)             # ['m1', 'm2', 'm3']
+    opciones = models.JSONField(default=dict, blank=True)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default=PENDIENTE)
+    etapa = models.CharField(max_length=50, blank=True, default='')
+    progreso = models.PositiveSmallIntegerField(default=0)  # 0-100
+    # [{"etapa": "m2.fit", "estado": "completada", "segundos": 12.3}, ...]
+    etapas = models.JSONField(default=list, blank=True)
+    resultados = models.JSONField(default=list, blank=True)
+    error = models.TextField(blank=True, null=True)
+    worker = models.CharField(max_length=100, blank=True, default='')
+    creado = models.DateTimeField(auto_now_add=True)
+    iniciado = models.DateTimeField(null=True, blank=True)
+    terminado = models.DateTimeField(null=True, blank=True)
+    # Latido: el worker lo renueva mientras el job corre
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'training_job'
+        ordering = ['-creado']
+        indexes = [models.Index(fields=['estado', 'creado'], name='training_job_estado_idx')]
+        constraints = [
+            # Un solo job pendiente o en curso por empresa
+            models.UniqueConstraint(
+                fields=['empresa'],
+                condition=models.Q(estado__in=['pendiente', 'en_curso']),
+                name='training_job_activo_por_empresa',
+            ),
+            # ... y uno solo global: empresa NULL no choca en la de arriba, así que
+            # el índice es sobre una expresión que vale lo mismo en todos ellos
+            models.UniqueConstraint(
+                Coalesce('empresa', Value(0)),
+                condition=models.Q(empresa__isnull=True, estado__in=['pendiente', 'en_curso']),
+                name='training_job_activo_global',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Entrenamiento #{self.id} ({self.empresa_id or 'global'}) - {self.estado} {self.progreso}%"
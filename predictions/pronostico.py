@@ -0,0 +1,90 @@
+# predictions/pronostico.py
+"""
+Pronóstico de demanda a varias semanas (modelo 2, recursivo).
+
+El modelo 2 predice la demanda de una semana a partir de sus pistas
+(predictions/features.py): calendario, ventas de las semanas anteriores
+(rezagos, medias móviles) y precios. Para las semanas 2..N no hay ventas
+reales todavía: la ventana de semanas anteriores se corre un lugar y la
+predicción de la semana recién calculada entra como si fuera una venta
+(pronóstico recursivo), igual que se haría a mano.
+
+Cada paso arma UNA matriz con todos los productos del bloque y llama al
+modelo una vez; con N semanas son N llamadas por bloque, no N × productos.
+Los productos se procesan por bloques de BLOQUE_PRODUCTOS para que la
+respuesta pueda salir en streaming sin tener todo el catálogo en memoria.
+"""
+import numpy as np
+
+from . import feature_store
+from .features import (
+    Pistas,
+    calendario as pistas_calendario,
+    columnas_del_modelo,
+    indice_semana,
+    lunes_de_semana,
+    pistas_en_linea,
+    tabla_precios,
+    ventana_semanal,
+)
+from .inference import FILAS_MAXIMAS_COMPILADO, predecir
+
+# Un bloque = una llamada al modelo por semana; con este tamaño se usa el bosque compilado
+BLOQUE_PRODUCTOS = FILAS_MAXIMAS_COMPILADO
+
+
+def calendario(hoy, semanas):
+    """Semanas del horizonte: la 1 es la semana de `hoy`, igual que PredictDemandView."""
+    actual = int(indice_semana(feature_store.inicio_semana(hoy)))
+    indices = np.arange(actual, actual + semanas)
+    pistas = pistas_calendario('semana', indices)
+    filas = []
+    for h, lunes in enumerate(lunes_de_semana(indices).tolist(), start=1):
+        iso = lunes.isocalendar()
+        filas.append({
+            'h': h,
+            'semana': f"{iso.year}-W{iso.week:02d}",
+            'inicio': lunes.isoformat(),
+            'mes': int(pistas['mes'][h - 1]),
+            'semana_del_anio': int(pistas['semana_del_anio'][h - 1]),
+        })
+    return filas
+
+
+def pronosticar(cargado, producto_ids, ventana, indices, pistas=None, precios=None):
+    """
+    Matriz (productos, semanas) de unidades pronosticadas para las semanas
+    `indices` (consecutivas, ver features.indice_semana).
+
+    `ventana` son las ventas reales de las semanas cerradas (la última
+    columna es la semana anterior a la 1). Desde el paso 2 la predicción
+    anterior, redondeada y sin negativos como una venta real, entra a la
+    ventana en lugar de una venta.
+    """
+    pistas = pistas or Pistas.desde_columnas('semana', columnas_del_modelo(cargado))
+    if pistas.precios and precios is None:
+        # El precio no cambia entre pasos: se consulta una vez
+        precios = tabla_precios(producto_ids=producto_ids)
+    ventana = np.array(ventana, dtype=np.int64)
+    resultado = np.empty((len(producto_ids), len(indices)), dtype=np.int64)
+    for paso, indice in enumerate(indices):
+        columnas = pistas_en_linea(pistas, producto_ids, indice, ventana, precios)
+        prediccion = predecir(cargado.modelo, columnas, cargado.compilado)
+        resultado[:, paso] = np.maximum(np.rint(prediccion), 0).astype(np.int64)
+        ventana = np.concatenate([ventana[:, 1:], resultado[:, paso:paso + 1]], axis=1)
+    return resultado
+
+
+def pronosticar_por_bloques(cargado, producto_ids, semanas, hoy=None):
+    """
+    Genera (producto_ids, ventas_semana_anterior, matriz) por bloques de
+    productos: una consulta al feature store y `len(semanas)` llamadas al
+    modelo por bloque.
+    """
+    pistas = Pistas.desde_columnas('semana', columnas_del_modelo(cargado))
+    actual = int(indice_semana(feature_store.inicio_semana(hoy)))
+    indices = range(actual, actual + len(semanas))
+    for inicio in range(0, len(producto_ids), BLOQUE_PRODUCTOS):
+        bloque = producto_ids[inicio:inicio + BLOQUE_PRODUCTOS]
+        ventana = ventana_semanal(bloque, pistas.alcance, hoy)
+        yield bloque, ventana[:, -1], pronosticar(cargado, bloque, ventana, indices, pistas)
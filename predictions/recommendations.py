@@ -0,0 +1,205 @@
+# predictions/recommendations.py
+"""
+Índice precalculado de recomendaciones (top-K vecinos por producto).
+
+El modelo 3 puntúa pares (producto_A, producto_B). Puntuar todo el catálogo en
+cada request es O(productos × árboles), así que lo hacemos UNA vez, offline,
+después de entrenar (`manage.py build_recommendation_index`) y guardamos:
+
+    producto_ids : (P,)   int64   ordenado, para buscar con searchsorted
+    vecinos      : (P, K) int64   IDs recomendados, -1 si no hay suficientes
+    scores       : (P, K) float64 probabilidad de compra conjunta
+
+La vista solo hace una búsqueda binaria y un slice.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+from .artifacts import models_dir
+from .inference import predecir_proba
+
+INDEX_FILENAME = 'recommendation_index.npz'
+DEFAULT_TOP_K = 20
+
+
+def ruta_indice(directorio=None):
+    """
+    El índice vive junto a la versión del modelo con la que se construyó
+    (ml_models/recommendation_model/<version>/), así al publicar otro modelo
+    nunca se mezcla con un índice viejo.
+    """
+    return os.path.join(directorio or models_dir(), INDEX_FILENAME)
+
+
+def top_k_parcial(candidatos, probabilidades, k):
+    """
+    Devuelve los k mejores (id, prob) ordenados de mayor a menor.
+    Usa una selección parcial (np.partition, O(n)) en lugar de ordenar todo
+    el arreglo (O(n log n)).
+    """
+    candidatos = np.asarray(candidatos)
+    probabilidades = np.asarray(probabilidades)
+    k = min(k, len(candidatos))
+    if k <= 0:
+        return candidatos[:0], probabilidades[:0]
+
+    if k < len(candidatos):
+        # Umbral = k-ésima mejor probabilidad; nos quedamos con todo lo que lo
+        # alcanza para que los empates en el borde no se elijan al azar.
+        umbral = np.partition(probabilidades, len(probabilidades) - k)[len(probabilidades) - k]
+        top = np.flatnonzero(probabilidades >= umbral)
+    else:
+        top = np.arange(len(candidatos))
+    # Orden estable: en empate gana el que aparece primero (igual que sorted())
+    top = top[np.lexsort((top, -probabilidades[top]))][:k]
+    return candidatos[top], probabilidades[top]
+
+
+def puntuar_candidatos(model, producto_id, candidatos, compilado=None):
+    """Probabilidad de compra conjunta de `producto_id` con cada candidato."""
+    return predecir_proba(model, {
+        'producto_A': producto_id,
+        'producto_B': np.asarray(candidatos, dtype=np.int64),
+    }, compilado)[:, 1]
+
+
+def construir_indice(model, producto_ids, k=DEFAULT_TOP_K, max_pares=200_000, compilado=None):
+    """
+    Puntúa todos los pares del catálogo por bloques de productos (para no
+    pasar de `max_pares` filas por llamada a predict_proba) y se queda con
+    los k mejores vecinos de cada uno.
+    """
+    if hasattr(model, 'top_k'):
+        # Modelos de similitud (predictions/cooccurrence.py): el top-k sale
+        # directo de las filas de la matriz dispersa, sin puntuar P² pares.
+        return model.top_k(k, producto_ids)
+
+    producto_ids = np.unique(np.asarray(producto_ids, dtype=np.int64))
+    n = len(producto_ids)
+    vecinos = np.full((n, k), -1, dtype=np.int64)
+    scores = np.zeros((n, k), dtype=np.float64)
+    if n < 2:
+        return producto_ids, vecinos, scores
+
+    filas_por_bloque = max(1, max_pares // n)
+    for inicio in range(0, n, filas_por_bloque):
+        bloque = producto_ids[inicio:inicio + filas_por_bloque]
+        proba = predecir_proba(model, {
+            'producto_A': np.repeat(bloque, n),
+            'producto_B': np.tile(producto_ids, len(bloque)),
+        }, compilado)[:, 1].reshape(len(bloque), n)
+
+        for offset, producto_id in enumerate(bloque):
+            fila = inicio + offset
+            mask = producto_ids != producto_id
+            ids_top, proba_top = top_k_parcial(producto_ids[mask], proba[offset][mask], k)
+            vecinos[fila, :len(ids_top)] = ids_top
+            scores[fila, :len(proba_top)] = proba_top
+
+    return producto_ids, vecinos, scores
+
+
+def construir_indice_por_empresa(model, productos_por_empresa, k=DEFAULT_TOP_K, max_pares=200_000, compilado=None):
+    """
+    Como `construir_indice`, pero cada producto solo tiene vecinos de su
+    misma empresa ({empresa_id: [producto_ids]}): el modelo global nunca
+    recomienda productos de otra tienda, y se puntúan Σ Pᵢ² pares en vez de
+    (Σ Pᵢ)² de toda la base.
+    """
+    partes = []
+    for producto_ids in productos_por_empresa.values():
+        ids, vecinos, scores = construir_indice(model, producto_ids, k, max_pares, compilado)
+        # Los modelos de similitud leen la fila completa de la matriz: se
+        # descartan los vecinos de otras empresas y se corre el resto a la izquierda
+        ajenos = (vecinos >= 0) & ~np.isin(vecinos, ids)
+        if ajenos.any():
+            orden = np.argsort(ajenos | (vecinos < 0), axis=1, kind='stable')
+            vecinos = np.where(ajenos, -1, vecinos)
+            scores = np.where(ajenos, 0.0, scores)
+            vecinos = np.take_along_axis(vecinos, orden, axis=1)
+            scores = np.take_along_axis(scores, orden, axis=1)
+        partes.append((ids, vecinos, scores))
+    if not partes:
+        vacio = np.zeros(0, dtype=np.int64)
+        return vacio, np.full((0, k), -1, dtype=np.int64), np.zeros((0, k), dtype=np.float64)
+
+    ids = np.concatenate([p[0] for p in partes])
+    orden = np.argsort(ids, kind='stable')
+    return (
+        ids[orden],
+        np.concatenate([p[1] for p in partes])[orden],
+        np.concatenate([p[2] for p in partes])[orden],
+    )
+
+
+def guardar_indice(producto_ids, vecinos, scores, path=None):
+    path = path or ruta_indice()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Escribimos a un temporal y renombramos: los lectores nunca ven un archivo a medias
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(tmp_path, producto_ids=producto_ids, vecinos=vecinos, scores=scores)
+    os.replace(tmp_path, path)
+    return path
+
+
+class RecommendationIndex:
+    """
+    Índices cargados en memoria, uno por versión de modelo (global o de
+    empresa). Cada uno se recarga solo si su archivo cambió, y se guardan a
+    lo sumo `max_indices` (LRU) para que la memoria no crezca con las empresas.
+    """
+
+    def __init__(self, max_indices=None):
+        self._lock = threading.Lock()
+        self._max_indices = max_indices
+        # path -> (mtime, arrays); la tupla se reemplaza de forma atómica
+        self._cache = OrderedDict()
+
+    @property
+    def max_indices(self):
+        if self._max_indices is not None:
+            return self._max_indices
+        # Uno por modelo de empresa residente + el global
+        return getattr(settings, 'ML_MAX_TENANT_MODELS', 32) + 1
+
+    def _cargar(self, directorio=None):
+        path = ruta_indice(directorio)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        with self._lock:
+            mtime_cargado, data = self._cache.get(path, (None, None))
+            if data is None or mtime != mtime_cargado:
+                with np.load(path) as npz:
+                    data = (npz['producto_ids'], npz['vecinos'], npz['scores'])
+                self._cache[path] = (mtime, data)
+            self._cache.move_to_end(path)
+            while len(self._cache) > max(1, self.max_indices):
+                self._cache.popitem(last=False)
+        return data
+
+    def buscar(self, producto_id, k, directorio=None):
+        """
+        Devuelve (ids, probabilidades) de los k vecinos guardados, o None si
+        el producto no está en el índice (o k pide más de lo que se guardó).
+        """
+        data = self._cargar(directorio)
+        if data is None:
+            return None
+        producto_ids, vecinos, scores = data
+        if k > vecinos.shape[1]:
+            return None
+        pos = np.searchsorted(producto_ids, producto_id)
+        if pos >= len(producto_ids) or producto_ids[pos] != producto_id:
+            return None
+        ids = vecinos[pos, :k]
+        validos = ids >= 0
+        return ids[validos], scores[pos, :k][validos]
+
+
+recommendation_index = RecommendationIndex()
@@ -0,0 +1,310 @@
+# predictions/registry.py
+"""
+Registro de modelos ML con carga perezosa y recarga en caliente.
+
+Antes los modelos se cargaban en `PredictionsConfig.ready()` solo con
+`runserver`, así que bajo gunicorn/uvicorn/daphne todas las predicciones
+respondían 500. Ahora cada modelo se carga la primera vez que se pide,
+desde cualquier servidor, y con un lock por modelo para que dos hilos no
+lo carguen al mismo tiempo.
+
+Versionado (ver predictions/artifacts.py): cada cierto tiempo
+(ML_MODELS_POLL_SECONDS) se revisa el mtime de `ml_models/<nombre>/manifest.json`.
+Si cambió, se carga la versión nueva y se reemplaza la referencia de una vez.
+Los requests en curso siguen usando el `ModeloCargado` que ya tomaron, y
+mientras se carga la versión nueva los demás siguen sirviendo con la anterior.
+Si no hay manifest se usa el archivo plano histórico `ml_models/<nombre>.pkl`.
+
+Los artefactos se abren con `joblib.load(..., mmap_mode=...)`: los arreglos
+NumPy guardados en el pickle quedan mapeados desde el page cache del sistema
+en vez de copiarse al heap de cada worker. (Ojo: los nodos de los árboles de
+sklearn se copian igual al deserializar; el ahorro real está en los arreglos
+planos que guardemos junto al modelo.)
+
+Junto al modelo se carga su bosque compilado (`bosque.pkl`, ver
+predictions/inference.py) en `ModeloCargado.compilado`; si la versión es
+anterior y no lo tiene, se compila al cargar. Es None para los modelos que
+no son RandomForest.
+
+Modelos por empresa: si existe `ml_models/empresas/<id>/<nombre>/manifest.json`
+se usa ese modelo para la empresa; si no, el global. Los modelos por empresa
+se cargan igual de perezosos pero con un tope LRU (ML_MAX_TENANT_MODELS):
+al pasar el tope se descarta el menos usado, así la memoria no crece con la
+cantidad de empresas. Los modelos globales no cuentan para el tope, ni las
+empresas sin modelo propio: ésas se recuerdan aparte (una tupla chica por
+empresa) para no sacar del LRU a los modelos cargados de verdad.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import joblib
+from django.conf import settings
+
+from .artifacts import (
+    MODEL_FILENAME,
+    directorio_empresa,
+    directorio_version,
+    leer_manifest,
+    models_dir,
+    ruta_manifest,
+)
+from .inference import COMPILED_FILENAME, compilar
+
+logger = logging.getLogger(__name__)
+
+# --- Los tres "cerebros" y su archivo plano (formato anterior al versionado) ---
+MODEL_FILES = {
+    'sales_category_model': 'sales_category_model.pkl',   # Cerebro 1
+    'demand_product_model': 'demand_product_model.pkl',   # Cerebro 2
+    'recommendation_model': 'recommendation_model.pkl',   # Cerebro 3
+}
+
+# Lo que recibe la vista: el modelo junto con la versión con la que se cargó
+ModeloCargado = namedtuple(
+    'ModeloCargado', ['nombre', 'version', 'modelo', 'manifest', 'directorio', 'empresa_id', 'compilado'],
+    defaults=[None, None],
+)
+
+# Estado interno por modelo: qué está cargado, de qué archivo y cuándo se revisó
+_Entrada = namedtuple('_Entrada', ['cargado', 'firma', 'revisado'])
+
+
+class ModelRegistry:
+    """
+    Carga cada modelo en el primer uso y lo cambia si se publica otra versión.
+
+    Las claves internas son (nombre, empresa_id); empresa_id=None es el
+    modelo global.
+    """
+
+    def __init__(self, mmap_mode=None, poll_seconds=None, max_tenant_models=None):
+        self._mmap_mode = mmap_mode
+        self._poll_seconds = poll_seconds
+        self._max_tenant_models = max_tenant_models
+        self._entradas = {}              # globales: (nombre, None) -> _Entrada
+        self._empresas = OrderedDict()   # por empresa, en orden de uso (LRU)
+        self._sin_modelo = {}            # empresas sin modelo propio: fuera del LRU
+        self._lru_lock = threading.Lock()
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    @property
+    def mmap_mode(self):
+        if self._mmap_mode is not None:
+            return self._mmap_mode
+        return getattr(settings, 'ML_MODELS_MMAP_MODE', 'r')
+
+    @property
+    def poll_seconds(self):
+        if self._poll_seconds is not None:
+            return self._poll_seconds
+        return getattr(settings, 'ML_MODELS_POLL_SECONDS', 5)
+
+    @property
+    def max_tenant_models(self):
+        if self._max_tenant_models is not None:
+            return self._max_tenant_models
+        return getattr(settings, 'ML_MAX_TENANT_MODELS', 32)
+
+    # -----------------------------------------------------------------
+    # 🔹 Archivos
+    # -----------------------------------------------------------------
+    @staticmethod
+    def _base_dir(empresa_id):
+        return directorio_empresa(empresa_id) if empresa_id is not None else None
+
+    def path(self, name, empresa_id=None):
+        """Ruta del artefacto activo de `name` (versionado o plano)."""
+        base_dir = self._base_dir(empresa_id)
+        manifest = leer_manifest(name, base_dir=base_dir)
+        if manifest is not None:
+            return os.path.join(directorio_version(name, manifest['version'], base_dir), MODEL_FILENAME)
+        return os.path.join(models_dir(), MODEL_FILES[name])
+
+    def _firma(self, name, empresa_id=None):
+        """Identifica el artefacto activo sin abrirlo: (ruta, mtime_ns)."""
+        rutas = [ruta_manifest(name, self._base_dir(empresa_id))]
+        if empresa_id is None:
+            rutas.append(os.path.join(models_dir(), MODEL_FILES[name]))
+        for path in rutas:
+            try:
+                return (path, os.stat(path).st_mtime_ns)
+            except OSError:
+                continue
+        return None
+
+    def _cargar(self, name, empresa_id=None):
+        base_dir = self._base_dir(empresa_id)
+        manifest = leer_manifest(name, base_dir=base_dir)
+        if manifest is not None:
+            directorio = directorio_version(name, manifest['version'], base_dir)
+            path = os.path.join(directorio, MODEL_FILENAME)
+            version = manifest['version']
+        else:
+            directorio = models_dir()
+            path = os.path.join(directorio, MODEL_FILES[name])
+            version = None
+
+        modelo = joblib.load(path, mmap_mode=self.mmap_mode or None)
+        ruta_compilado = os.path.join(directorio, COMPILED_FILENAME)
+        if manifest is not None and os.path.exists(ruta_compilado):
+            compilado = joblib.load(ruta_compilado, mmap_mode=self.mmap_mode or None)
+        else:
+            compilado = compilar(modelo)
+        logger.info("Modelo '%s' (versión %s, empresa %s) cargado desde %s",
+                    name, version or 'sin versión', empresa_id or 'global', path)
+        return ModeloCargado(name, version, modelo, manifest or {}, directorio, empresa_id, compilado)
+
+    # -----------------------------------------------------------------
+    # 🔹 Entradas en memoria (con LRU para las de empresa)
+    # -----------------------------------------------------------------
+    def _lock(self, clave):
+        lock = self._locks.get(clave)
+        if lock is None:
+            with self._locks_lock:
+                lock = self._locks.setdefault(clave, threading.Lock())
+        return lock
+
+    def _leer(self, clave):
+        if clave[1] is None:
+            return self._entradas.get(clave)
+        with self._lru_lock:
+            entrada = self._empresas.get(clave)
+            if entrada is None:
+                return self._sin_modelo.get(clave)
+            self._empresas.move_to_end(clave)
+            return entrada
+
+    def _guardar(self, clave, entrada):
+        if clave[1] is None:
+            self._entradas[clave] = entrada
+            return
+        with self._lru_lock:
+            if entrada.cargado is None:
+                self._sin_modelo[clave] = entrada
+                return
+            self._sin_modelo.pop(clave, None)
+            self._empresas[clave] = entrada
+            self._empresas.move_to_end(clave)
+            while len(self._empresas) > max(1, self.max_tenant_models):
+                descartada, _ = self._empresas.popitem(last=False)
+                self._locks.pop(descartada, None)
+                logger.info("Modelo '%s' de la empresa %s descartado de memoria (LRU)", *descartada)
+
+    # -----------------------------------------------------------------
+    # 🔹 API pública
+    # -----------------------------------------------------------------
+    def get_loaded(self, name, empresa_id=None, fallback=True):
+        """
+        Devuelve el `ModeloCargado` activo de `name`, o None si todavía no
+        existe ningún artefacto (p. ej. nunca se corrió train_models).
+
+        Con `empresa_id` se usa el modelo dedicado de esa empresa y, si no
+        tiene uno (y `fallback` es True), el global.
+        """
+        if empresa_id is not None:
+            cargado = self._get_loaded((name, int(empresa_id)))
+            if cargado is not None or not fallback:
+                return cargado
+        return self._get_loaded((name, None))
+
+    def _get_loaded(self, clave):
+        name, empresa_id = clave
+        entrada = self._leer(clave)
+        ahora = time.monotonic()
+        if entrada is not None and ahora - entrada.revisado < self.poll_seconds:
+            return entrada.cargado
+
+        lock = self._lock(clave)
+        if entrada is not None:
+            # Ya hay un modelo servible: si otro hilo está revisando/cargando,
+            # no lo esperamos y seguimos con el que tenemos.
+            if not lock.acquire(blocking=False):
+                return entrada.cargado
+        else:
+            lock.acquire()
+
+        try:
+            entrada = self._leer(clave)
+            if entrada is not None and ahora - entrada.revisado < self.poll_seconds:
+                return entrada.cargado
+
+            firma = self._firma(name, empresa_id)
+            if firma is None:
+                if entrada is None:
+                    if empresa_id is None:
+                        # El global no cachea el fallo: en cuanto aparezca el archivo, se carga
+                        logger.warning("Modelo '%s' no encontrado en %s", name, models_dir())
+                        return None
+                    # La mayoría de las empresas no tiene modelo propio: se recuerda
+                    # durante `poll_seconds` para no revisar el disco en cada request
+                    self._guardar(clave, _Entrada(None, None, ahora))
+                    return None
+                # Se borró el artefacto: seguimos con lo que hay en memoria
+                self._guardar(clave, entrada._replace(revisado=ahora))
+                return entrada.cargado
+
+            if entrada is not None and entrada.firma == firma:
+                self._guardar(clave, entrada._replace(revisado=ahora))
+                return entrada.cargado
+
+            try:
+                cargado = self._cargar(name, empresa_id)
+            except Exception as e:
+                logger.error("No se pudo cargar el modelo '%s' (empresa %s): %s", name, empresa_id or 'global', e)
+                if entrada is None:
+                    return None
+                self._guardar(clave, entrada._replace(revisado=ahora))
+                return entrada.cargado
+
+            self._guardar(clave, _Entrada(cargado, firma, ahora))
+            return cargado
+        finally:
+            lock.release()
+
+    def get(self, name, empresa_id=None):
+        """Atajo: solo el modelo (o None)."""
+        cargado = self.get_loaded(name, empresa_id)
+        return cargado.modelo if cargado is not None else None
+
+    def preload(self):
+        """Carga todos los modelos globales disponibles (útil con `gunicorn --preload`)."""
+        return {name: self.get_loaded(name) is not None for name in MODEL_FILES}
+
+    def versions(self, empresa_id=None):
+        """Versión cargada en ESTE proceso para cada modelo (global o de una empresa)."""
+        versiones = {}
+        for name in MODEL_FILES:
+            clave = (name, None if empresa_id is None else int(empresa_id))
+            entrada = self._entradas.get(clave) if clave[1] is None else self._empresas.get(clave)
+            versiones[name] = entrada.cargado.version if entrada and entrada.cargado else None
+        return versiones
+
+    def empresas_cargadas(self):
+        """(nombre, empresa_id) de los modelos por empresa en memoria, del más viejo al más usado."""
+        with self._lru_lock:
+            return list(self._empresas)
+
+    def invalidate(self, name=None, empresa_id=None):
+        """Fuerza a revisar el manifest en el próximo `get` (sin esperar el polling)."""
+        empresa_id = None if empresa_id is None else int(empresa_id)
+        with self._lru_lock:
+            for entradas in (self._entradas, self._empresas, self._sin_modelo):
+                for clave, entrada in list(entradas.items()):
+                    if name and clave[0] != name:
+                        continue
+                    if empresa_id is not None and clave[1] != empresa_id:
+                        continue
+                    entradas[clave] = entrada._replace(revisado=float('-inf'))
+
+    def clear(self):
+        with self._lru_lock:
+            self._entradas = {}
+            self._empresas = OrderedDict()
+            self._sin_modelo = {}
+
+
+model_registry = ModelRegistry()
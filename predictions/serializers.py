@@ -0,0 +1,36 @@
+# predictions/serializers.py
+from rest_framework import serializers
+
+from .models import TrainingJob
+from .training import MODELOS
+
+
+class TrainingJobSerializer(serializers.ModelSerializer):
+    empresa_nombre = serializers.CharField(source="empresa.nombre", read_only=True, default=None)
+
+    class Meta:
+        model = TrainingJob
+        fields = [
+            "id", "empresa", "empresa_nombre", "modelos", "opciones", "estado", "etapa", "progreso",
+            "etapas", "resultados", "error", "creado", "iniciado", "terminado", "actualizado",
+        ]
+        read_only_fields = fields
+
+
+class EncolarEntrenamientoSerializer(serializers.Serializer):
+    """Body de POST training/jobs/: qué modelos entrenar y con qué opciones de train_models."""
+    empresa = serializers.IntegerField(required=False, allow_null=True)
+    modelos = serializers.ListField(
+        child=serializers.ChoiceField(choices=list(MODELOS)), required=False, allow_empty=False,
+    )
+    reco_modo = serializers.ChoiceField(choices=["clasificador", "similitud"], required=False)
+    rezagos_semanales = serializers.IntegerField(min_value=1, max_value=52, required=False)
+    rezagos_mensuales = serializers.IntegerField(min_value=1, max_value=24, required=False)
+    precios = serializers.BooleanField(required=False)
+    n_estimators = serializers.IntegerField(min_value=10, max_value=500, required=False)
+
+    OPCIONES = ("reco_modo", "rezagos_semanales", "rezagos_mensuales", "precios", "n_estimators")
+
+    @property
+    def opciones(self):
+        return {k: v for k, v in self.validated_data.items() if k in self.OPCIONES}
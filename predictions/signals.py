@@ -0,0 +1,25 @@
+# predictions/signals.py
+from django.dispatch import receiver
+
+from ventas.signals import venta_registrada, ventas_registradas
+
+from .cache import prediction_cache
+from .feature_store import registrar_ventas
+
+
+@receiver(venta_registrada)
+def actualizar_feature_store(sender, venta, **kwargs):
+    """Suma la venta recién confirmada a los totales y descarta las predicciones afectadas."""
+    _actualizar([venta])
+
+
+@receiver(ventas_registradas)
+def actualizar_feature_store_lote(sender, ventas, **kwargs):
+    """Lo mismo para un lote de ventas sincronizadas de una vez."""
+    _actualizar(ventas)
+
+
+def _actualizar(ventas):
+    producto_ids, subcategoria_ids = registrar_ventas(ventas)
+    prediction_cache.invalidate('producto', producto_ids)
+    prediction_cache.invalidate('subcategoria', subcategoria_ids)
@@ -1,3 +1,387 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from numpy.testing import assert_allclose, assert_array_equal
+from rest_framework.test import APIRequestFactory, force_authenticate
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+
+from products.models import Categoria, Producto, SubCategoria
+from tenants.models import Empresa
+from users.models import Role, User
+from ventas.models import DetalleVenta, Venta
+
+from . import feature_store, views
+from .artifacts import directorio_empresa, publicar_modelo, ruta_manifest
+from .incremental import actualizar_acumulado
+from .inference import compilar, predecir, predecir_proba
+from .jobs import encolar, marcar_vencidos, tomar_siguiente
+from .models import TrainingJob, VentaMensualSubcategoria, VentaSemanalProducto
+from .registry import ModelRegistry, ModeloCargado
+
+
+# ---------------------------------------------------------------------
+# 🔹 Bosque compilado (predictions/inference.py) == sklearn
+# ---------------------------------------------------------------------
+class BosqueCompiladoTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        rng = np.random.default_rng(7)
+        cls.X = pd.DataFrame({
+            'producto_id': rng.integers(1, 50, 400),
+            'mes': rng.integers(1, 13, 400),
+            'ventas_semana_anterior': rng.poisson(4, 400).astype(float),
+        })
+        cls.y = cls.X['ventas_semana_anterior'] * 2 + cls.X['mes'] + rng.normal(0, 1, 400)
+        # Filas nuevas, con valores fuera de lo visto al entrenar
+        cls.X_nuevo = pd.DataFrame({
+            'producto_id': rng.integers(0, 60, 200),
+            'mes': rng.integers(1, 13, 200),
+            'ventas_semana_anterior': rng.poisson(6, 200).astype(float),
+        })
+
+    def test_regresor_igual_a_sklearn(self):
+        model = RandomForestRegressor(n_estimators=15, max_depth=8, random_state=0).fit(self.X, self.y)
+        compilado = compilar(model)
+        assert_allclose(compilado.predict(self.X_nuevo.to_numpy()), model.predict(self.X_nuevo), rtol=0, atol=1e-12)
+        # Por columnas, como lo llaman las vistas (escalares repetidos para todo el lote)
+        columnas = {'producto_id': self.X_nuevo['producto_id'].to_numpy(), 'mes': 3, 'ventas_semana_anterior': 5.0}
+        esperado = model.predict(self.X_nuevo.assign(mes=3, ventas_semana_anterior=5.0))
+        assert_allclose(predecir(model, columnas, compilado), esperado, rtol=0, atol=1e-12)
+
+    def test_clasificador_igual_a_sklearn(self):
+        etiquetas = (self.y > self.y.median()).astype(int)
+        model = RandomForestClassifier(n_estimators=15, random_state=0).fit(self.X, etiquetas)
+        compilado = compilar(model)
+        columnas = {c: self.X_nuevo[c].to_numpy() for c in self.X_nuevo}
+        assert_allclose(predecir_proba(model, columnas, compilado), model.predict_proba(self.X_nuevo), rtol=0, atol=1e-12)
+        assert_array_equal(compilado.predict(self.X_nuevo.to_numpy()), model.predict(self.X_nuevo))
+
+    def test_valores_faltantes(self):
+        X = self.X.copy()
+        X.loc[::7, 'ventas_semana_anterior'] = np.nan
+        model = RandomForestRegressor(n_estimators=10, random_state=0).fit(X, self.y)
+        X_nuevo = self.X_nuevo.copy()
+        X_nuevo.loc[::3, 'ventas_semana_anterior'] = np.nan
+        assert_allclose(compilar(model).predict(X_nuevo.to_numpy()), model.predict(X_nuevo), rtol=0, atol=1e-12)
+
+
+
+# ---------------------------------------------------------------------
+# 🔹 Registro de modelos (predictions/registry.py)
+# ---------------------------------------------------------------------
+class RegistroModelosTests(SimpleTestCase):
+    NOMBRE = 'demand_product_model'
+
+    def setUp(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio)
+        override = self.settings(ML_MODELS_DIR=directorio)
+        override.enable()
+        self.addCleanup(override.disable)
+        # poll_seconds=0: cada get revisa el manifest, como si ya hubiera pasado el intervalo
+        self.registry = ModelRegistry(mmap_mode='', poll_seconds=0, max_tenant_models=2)
+
+    def _publicar(self, empresa_id=None, n_estimators=1):
+        X = pd.DataFrame({'producto_id': [1, 2, 3], 'mes': [1, 2, 3]})
+        model = RandomForestRegressor(n_estimators=n_estimators, random_state=0).fit(X, [1.0, 2.0, 3.0])
+        base_dir = directorio_empresa(empresa_id) if empresa_id is not None else None
+        manifest = publicar_modelo(self.NOMBRE, model, X.columns, X=X, base_dir=base_dir)
+        return manifest['version']
+
+    def test_fallback_al_global(self):
+        self.assertIsNone(self.registry.get_loaded(self.NOMBRE, 7))
+        global_ = self._publicar()
+        cargado = self.registry.get_loaded(self.NOMBRE, 7)
+        self.assertEqual((cargado.version, cargado.empresa_id), (global_, None))
+        self.assertIsNone(self.registry.get_loaded(self.NOMBRE, 7, fallback=False))
+
+        propio = self._publicar(empresa_id=7)
+        cargado = self.registry.get_loaded(self.NOMBRE, 7)
+        self.assertEqual((cargado.version, cargado.empresa_id), (propio, 7))
+        self.assertEqual(self.registry.get_loaded(self.NOMBRE, 8).version, global_)
+
+    def test_empresas_sin_modelo_no_desalojan_a_las_cargadas(self):
+        self._publicar()
+        self._publicar(empresa_id=1)
+        self._publicar(empresa_id=2)
+        self.registry.get_loaded(self.NOMBRE, 1)
+        self.registry.get_loaded(self.NOMBRE, 2)
+        # Muchas empresas sin modelo propio (caen al global) no ocupan el tope
+        for empresa_id in range(100, 120):
+            self.assertIsNone(self.registry.get_loaded(self.NOMBRE, empresa_id).empresa_id)
+        self.assertEqual(self.registry.empresas_cargadas(), [(self.NOMBRE, 1), (self.NOMBRE, 2)])
+
+        # Una tercera empresa con modelo sí desaloja a la menos usada
+        self.registry.get_loaded(self.NOMBRE, 1)
+        self._publicar(empresa_id=3)
+        self.registry.get_loaded(self.NOMBRE, 3)
+        self.assertEqual(self.registry.empresas_cargadas(), [(self.NOMBRE, 1), (self.NOMBRE, 3)])
+
+    def test_recarga_en_caliente(self):
+        self.assertIsNone(self.registry.get_loaded(self.NOMBRE, 5, fallback=False))
+        primera = self._publicar(empresa_id=5)
+        anterior = self.registry.get_loaded(self.NOMBRE, 5)
+        self.assertEqual(anterior.version, primera)
+        self.assertEqual(self.registry.empresas_cargadas(), [(self.NOMBRE, 5)])
+
+        segunda = self._publicar(empresa_id=5, n_estimators=2)
+        # Por si el sistema de archivos no distingue dos escrituras tan seguidas
+        manifest = ruta_manifest(self.NOMBRE, directorio_empresa(5))
+        os.utime(manifest, ns=(os.stat(manifest).st_atime_ns, os.stat(manifest).st_mtime_ns + 10**9))
+        nuevo = self.registry.get_loaded(self.NOMBRE, 5)
+        self.assertEqual(nuevo.version, segunda)
+        self.assertEqual(len(nuevo.modelo.estimators_), 2)
+        # Quien ya tenía el anterior lo sigue usando entero
+        self.assertEqual(len(anterior.modelo.estimators_), 1)
+        self.assertEqual(self.registry.versions(5)[self.NOMBRE], segunda)
+
+
+# ---------------------------------------------------------------------
+# 🔹 Cola de entrenamientos (predictions/jobs.py)
+# ---------------------------------------------------------------------
+class ColaEntrenamientosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nombre="Tienda", nit="100")
+
+    def test_encolar_devuelve_el_activo_de_la_empresa(self):
+        job, creado = encolar(self.empresa.id, ['m3', 'm1'])
+        self.assertTrue(creado)
+        self.assertEqual(job.modelos, ['m1', 'm3'])
+        self.assertEqual(job.etapas[0], {'etapa': 'extraccion', 'estado': 'pendiente'})
+        otro, creado = encolar(self.empresa.id, ['m2'])
+        self.assertFalse(creado)
+        self.assertEqual(otro.pk, job.pk)
+        # Otra empresa y los modelos globales tienen su propio lugar en la cola
+        self.assertTrue(encolar(None, ['m2'])[1])
+        self.assertTrue(encolar(Empresa.objects.create(nombre="Otra", nit="200").id, ['m2'])[1])
+
+    def test_un_solo_job_global_activo(self):
+        job, _ = encolar(None, ['m1'])
+        self.assertEqual(encolar(None, ['m2']), (job, False))
+        # Dos requests a la vez: la restricción única frena al segundo INSERT
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            TrainingJob.objects.create(empresa=None, modelos=['m2'])
+        # Terminado el anterior, se puede encolar otro
+        TrainingJob.objects.filter(pk=job.pk).update(estado=TrainingJob.COMPLETADO)
+        self.assertTrue(encolar(None, ['m2'])[1])
+
+    def test_tomar_siguiente_en_orden(self):
+        primero, _ = encolar(None, ['m1'])
+        segundo, _ = encolar(self.empresa.id, ['m2'])
+        tomado = tomar_siguiente('worker-1')
+        self.assertEqual(tomado.pk, primero.pk)
+        self.assertEqual((tomado.estado, tomado.worker), (TrainingJob.EN_CURSO, 'worker-1'))
+        self.assertIsNotNone(tomado.iniciado)
+        self.assertEqual(tomar_siguiente('worker-2').pk, segundo.pk)
+        self.assertIsNone(tomar_siguiente('worker-1'))
+
+    def test_marcar_vencidos(self):
+        colgado, _ = encolar(None, ['m1'])
+        vivo, _ = encolar(self.empresa.id, ['m1'])
+        tomar_siguiente('w')
+        tomar_siguiente('w')
+        TrainingJob.objects.filter(pk=colgado.pk).update(actualizado=timezone.now() - timedelta(minutes=30))
+
+        self.assertEqual(marcar_vencidos(10), [colgado.pk])
+        colgado.refresh_from_db()
+        vivo.refresh_from_db()
+        self.assertEqual(colgado.estado, TrainingJob.FALLIDO)
+        self.assertIn("latido", colgado.error)
+        self.assertEqual(vivo.estado, TrainingJob.EN_CURSO)
+
+
+# ---------------------------------------------------------------------
+# 🔹 Feature store incremental == rebuild_feature_store
+# ---------------------------------------------------------------------
+class FeatureStoreTests(TestCase):
+    def _filas(self):
+        return (
+            sorted(VentaSemanalProducto.objects.values_list('empresa_id', 'producto_id', 'semana', 'cantidad')),
+            sorted(VentaMensualSubcategoria.objects.values_list('empresa_id', 'subcategoria_id', 'mes', 'cantidad')),
+        )
+
+    def test_incremental_igual_a_reconstruir(self):
+        ventas = []
+        for nit in ('100', '200'):
+            empresa = Empresa.objects.create(nombre=f"Tienda {nit}", nit=nit)
+            usuario = User.objects.create_user(f"admin@{nit}.com", "x", empresa=empresa)
+            categoria = Categoria.objects.create(nombre="Electro", empresa=empresa)
+            subcategoria = SubCategoria.objects.create(nombre="Licuadoras", categoria=categoria, empresa=empresa)
+            productos = [
+                Producto.objects.create(nombre=f"P{i}", precio_venta=Decimal('5'), empresa=empresa,
+                                        subcategoria=subcategoria if i else None)
+                for i in range(3)
+            ]
+            # Domingo y lunes (UTC) de dos semanas, y el cambio de mes
+            for dia, cantidades in [((2025, 3, 30), (1, 2, 0)), ((2025, 3, 31), (0, 3, 4)), ((2025, 4, 1), (2, 2, 2))]:
+                venta = Venta.objects.create(
+                    empresa=empresa, fecha=datetime(*dia, 12, tzinfo=feature_store.UTC),
+                    usuario=usuario, total=Decimal('0'),
+                )
+                DetalleVenta.objects.bulk_create([
+                    DetalleVenta(empresa=empresa, venta=venta, producto=producto, cantidad=cantidad,
+                                 precio_unitario=Decimal('5'), subtotal=cantidad * Decimal('5'))
+                    for producto, cantidad in zip(productos, cantidades) if cantidad
+                ])
+                ventas.append(venta)
+
+        # Una venta sola y después el resto en lote (filas que ya existen y filas nuevas)
+        feature_store.registrar_venta(ventas[0])
+        producto_ids, subcategoria_ids = feature_store.registrar_ventas(ventas[1:])
+        self.assertEqual(len(producto_ids), 6)
+        self.assertEqual(len(subcategoria_ids), 2)
+        incremental = self._filas()
+        self.assertIn((ventas[0].empresa_id, ventas[0].detalles.order_by('id')[1].producto_id,
+                       date(2025, 3, 24), 2), incremental[0])
+
+        call_command('rebuild_feature_store', stdout=StringIO())
+        self.assertEqual(self._filas(), incremental)
+
+
+# ---------------------------------------------------------------------
+# 🔹 Predicción en lote: la empresa sale del usuario
+# ---------------------------------------------------------------------
+class PrediccionLoteEmpresaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nombre="Tienda", nit="100")
+        cls.otra = Empresa.objects.create(nombre="Otra", nit="200")
+        cls.admin = User.objects.create_user(
+            "admin@100.com", "x", empresa=cls.empresa, role=Role.objects.create(name="ADMIN", empresa=cls.empresa),
+        )
+        cls.super_admin = User.objects.create_user(
+            "root@100.com", "x", empresa=cls.empresa,
+            role=Role.objects.create(name="SUPER_ADMIN", empresa=cls.empresa),
+        )
+
+    def _post(self, data, usuario=None):
+        request = APIRequestFactory().post('/api/predict/demand/batch/', data, format='json')
+        if usuario is not None:
+            force_authenticate(request, user=usuario)
+        # Sin modelo: la vista responde 500 apenas sabe qué empresa pedir
+        with mock.patch.object(views.model_registry, 'get_loaded', return_value=None) as get_loaded:
+            response = views.PredictDemandBatchView.as_view()(request)
+        return response, get_loaded
+
+    def test_anonimo_no_puede(self):
+        response, get_loaded = self._post({'empresa': self.empresa.id})
+        self.assertIn(response.status_code, (401, 403))
+        get_loaded.assert_not_called()
+
+    def test_empresa_del_body_se_ignora_para_los_demas(self):
+        response, get_loaded = self._post({'empresa': self.otra.id}, self.admin)
+        self.assertEqual(response.status_code, 500)
+        get_loaded.assert_called_once_with('demand_product_model', self.empresa.id)
+
+    def test_super_admin_elige_la_empresa(self):
+        _, get_loaded = self._post({'empresa': self.otra.id}, self.super_admin)
+        get_loaded.assert_called_once_with('demand_product_model', self.otra.id)
+        _, get_loaded = self._post({}, self.super_admin)
+        get_loaded.assert_called_once_with('demand_product_model', self.empresa.id)
+
+    def test_usuario_sin_empresa(self):
+        sin_empresa = User.objects.create_user("suelto@x.com", "x")
+        response, get_loaded = self._post({}, sin_empresa)
+        self.assertEqual(response.status_code, 403)
+        get_loaded.assert_not_called()
+
+    def test_respuesta_con_el_campo_obsoleto(self):
+        producto = Producto.objects.create(nombre="P", precio_venta=Decimal('5'), empresa=self.empresa)
+        X = pd.DataFrame({'producto_id': [1, 2], 'mes': [1, 2], 'semana_del_anio': [1, 2],
+                          'ventas_semana_anterior': [0.0, 3.0]})
+        model = RandomForestRegressor(n_estimators=2, random_state=0).fit(X, [1.0, 4.0])
+        cargado = ModeloCargado('demand_product_model', 'v1', model, {}, None, None, compilar(model))
+
+        request = APIRequestFactory().post('/api/predict/demand/batch/', {'producto_ids': [producto.id]}, format='json')
+        force_authenticate(request, user=self.admin)
+        with mock.patch.object(views.model_registry, 'get_loaded', return_value=cargado):
+            response = views.PredictDemandBatchView.as_view()(request)
+        self.assertEqual(response.status_code, 200)
+        fila = response.data['predicciones'][0]
+        # Mismo valor (semana calendario anterior) con el nombre nuevo y el viejo
+        self.assertEqual(fila['ventas_semana_anterior'], 0)
+        self.assertEqual(fila['ventas_reales_ultimos_7_dias'], 0)
+
+    def test_pronostico_tambien_pide_usuario(self):
+        request = APIRequestFactory().get('/api/predict/demand/horizon/', {'empresa': self.otra.id})
+        self.assertIn(views.PredictDemandHorizonView.as_view()(request).status_code, (401, 403))
+
+        request = APIRequestFactory().get('/api/predict/demand/horizon/', {'empresa': self.otra.id})
+        force_authenticate(request, user=self.admin)
+        with mock.patch.object(views.model_registry, 'get_loaded', return_value=None) as get_loaded:
+            views.PredictDemandHorizonView.as_view()(request)
+        get_loaded.assert_called_once_with('demand_product_model', self.empresa.id)
+
+
+# ---------------------------------------------------------------------
+# 🔹 Acumulado incremental: commits tardíos dentro de la ventana
+# ---------------------------------------------------------------------
+class AcumuladoIncrementalTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nombre="Tienda", nit="100")
+        cls.usuario = User.objects.create_user("admin@100.com", "x", empresa=cls.empresa)
+        cls.productos = [
+            Producto.objects.create(nombre=f"P{i}", precio_venta=Decimal('5'), empresa=cls.empresa) for i in range(2)
+        ]
+
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio)
+
+    def _detalle(self, id, venta=None, producto=0, cantidad=1):
+        venta = venta or Venta.objects.create(
+            empresa=self.empresa, fecha=datetime(2025, 3, 10, 12, tzinfo=feature_store.UTC),
+            usuario=self.usuario, total=Decimal('0'),
+        )
+        DetalleVenta.objects.create(
+            id=id, empresa=self.empresa, venta=venta, producto=self.productos[producto], cantidad=cantidad,
+            precio_unitario=Decimal('5'), subtotal=cantidad * Decimal('5'),
+        )
+        return venta
+
+    def _comparar_con_desde_cero(self, acumulado):
+        completo, _, _ = actualizar_acumulado(base_dir=tempfile.mkdtemp(dir=self.directorio), desde_cero=True)
+        self.assertEqual(acumulado.semanas.to_dict('records'), completo.semanas.to_dict('records'))
+        self.assertEqual((acumulado.C != completo.C).nnz, 0)
+        self.assertEqual(acumulado.ventas_por_empresa.to_dict(), completo.ventas_por_empresa.to_dict())
+
+    def test_commit_tardio_dentro_de_la_ventana(self):
+        venta = self._detalle(1000)
+        self._detalle(1003)
+        acumulado, filas, _ = actualizar_acumulado(base_dir=self.directorio)
+        self.assertEqual((filas, acumulado.marca), (2, 1003))
+
+        # Ids 1001 y 1002 se asignaron antes pero hicieron commit después de leer
+        self._detalle(1001, venta=venta, producto=1, cantidad=2)
+        self._detalle(1002)
+        acumulado, filas, _ = actualizar_acumulado(base_dir=self.directorio)
+        self.assertEqual((filas, acumulado.marca), (2, 1003))
+        self.assertEqual(int(acumulado.filas_por_empresa.sum()), 4)
+        self._comparar_con_desde_cero(acumulado)
+
+        # Nada nuevo: no se suma dos veces
+        self.assertEqual(actualizar_acumulado(base_dir=self.directorio)[1], 0)
+
+    def test_commit_mas_tardio_que_la_ventana_se_pierde(self):
+        self._detalle(1000)
+        self._detalle(1010)
+        with self.settings(ML_INCREMENTAL_VENTANA_IDS=5):
+            actualizar_acumulado(base_dir=self.directorio)
+            self._detalle(1002)
+            acumulado, filas, _ = actualizar_acumulado(base_dir=self.directorio)
+        self.assertEqual(filas, 0)
+        self.assertEqual(int(acumulado.filas_por_empresa.sum()), 2)
@@ -0,0 +1,350 @@
+# predictions/training.py
+"""
+Entrenamiento de los tres modelos ML (antes todo vivía en train_models.py).
+
+Cada modelo se arma en tres etapas que se cronometran por separado:
+
+    dataset   -> ingeniería de pistas a partir del DataFrame de detalles
+    fit       -> entrenamiento (RandomForest con n_jobs núcleos)
+    publicar  -> artefacto versionado en ml_models/<nombre>/<version>/
+
+`entrenar_modelos` corre los modelos en paralelo en un pool de procesos y
+reparte un presupuesto de núcleos entre ellos (n_jobs + threadpoolctl),
+así un entrenamiento con 3 modelos no lanza 3 × cpu_count hilos.
+
+Modelos por empresa: cada tarea es (clave, empresa_id). Con empresa_id se
+entrena solo con las ventas de esa empresa y se publica en
+ml_models/empresas/<empresa_id>/ (ver `empresas_para_entrenar`).
+
+`datos` puede ser el DataFrame de detalles (historia completa) o un
+`Acumulado` (modo incremental, ver predictions/incremental.py): los
+datasets que salen de uno u otro son los mismos.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from threadpoolctl import threadpool_limits
+
+from .artifacts import directorio_empresa, publicar_modelo
+from .cooccurrence import (
+    ItemSimilarityModel,
+    dataset_clasificador,
+    dataset_clasificador_coocurrencias,
+    pares_positivos,
+)
+from .dataset import SIN_ID
+from .features import Pistas, indice_mes, indice_semana, tabla_entrenamiento
+from .incremental import Acumulado
+
+# clave corta -> (nombre del artefacto, descripción)
+MODELOS = {
+    'm1': ('sales_category_model', 'Ventas por Categoría (mensual)'),
+    'm2': ('demand_product_model', 'Demanda por Producto (semanal)'),
+    'm3': ('recommendation_model', 'Recomendación'),
+}
+
+OPCIONES_DEFAULT = {
+    'reco_modo': 'clasificador',      # 'clasificador' | 'similitud'
+    'negativos_por_positivo': 3,
+    'similitud': 'cosine',            # 'cosine' | 'lift'
+    'n_estimators': 100,
+    # Pistas de los modelos 1 y 2 (predictions/features.py)
+    'rezagos_semanales': 4,
+    'ventanas_semanales': (4, 8),
+    'rezagos_mensuales': 3,
+    'ventanas_mensuales': (3, 6),
+    # Apagado: Descuento no tiene historia, las filas viejas verían los precios de HOY
+    'precios': False,
+    'tabla_precios': None,            # features.tabla_precios(); None = se consulta al armar el dataset
+}
+
+
+class DatosInsuficientes(Exception):
+    """No hay filas suficientes para entrenar el modelo pedido."""
+
+
+# ---------------------------------------------------------------------
+# 🔹 Datasets (ingeniería de pistas)
+# ---------------------------------------------------------------------
+def _pistas(clave, opciones):
+    if clave == 'm1':
+        return Pistas('mes', opciones['rezagos_mensuales'], opciones['ventanas_mensuales'], opciones['precios'])
+    return Pistas('semana', opciones['rezagos_semanales'], opciones['ventanas_semanales'], opciones['precios'])
+
+
+def dataset_m1(datos, opciones=None):
+    """Ventas por SUBCATEGORÍA y MES, con rezagos, medias móviles y precios como pistas."""
+    opciones = {**OPCIONES_DEFAULT, **(opciones or {})}
+    if isinstance(datos, Acumulado):
+        # Ya agrupado por mes: volver a agrupar no lo cambia
+        df_raw_demand = datos.meses[['subcategoria_id', 'cantidad', 'fecha']]
+    else:
+        # Sin los productos que no tienen subcategoría
+        df_raw_demand = datos.loc[
+            datos['subcategoria_id'] != SIN_ID, ['subcategoria_id', 'cantidad', 'fecha']
+        ]
+    if df_raw_demand.empty:
+        raise DatosInsuficientes("No se encontraron datos.")
+
+    # Serie mensual densa por subcategoría + pistas (predictions/features.py)
+    return (*tabla_entrenamiento(
+        df_raw_demand['subcategoria_id'].values,
+        indice_mes(df_raw_demand['fecha'].values),
+        df_raw_demand['cantidad'].values,
+        _pistas('m1', opciones),
+        opciones.get('tabla_precios'),
+    ), None)
+
+
+def dataset_m2(datos, opciones=None):
+    """Ventas por PRODUCTO y SEMANA, con rezagos, medias móviles y precios como pistas."""
+    opciones = {**OPCIONES_DEFAULT, **(opciones or {})}
+    if isinstance(datos, Acumulado):
+        df_raw_demand_prod = datos.semanas[['producto_id', 'cantidad', 'fecha']]
+    else:
+        df_raw_demand_prod = datos[['producto_id', 'cantidad', 'fecha']]
+    if df_raw_demand_prod.empty:
+        raise DatosInsuficientes("No se encontraron datos.")
+
+    # Serie semanal densa por producto + pistas (predictions/features.py)
+    return (*tabla_entrenamiento(
+        df_raw_demand_prod['producto_id'].values,
+        indice_semana(df_raw_demand_prod['fecha'].values),
+        df_raw_demand_prod['cantidad'].values,
+        _pistas('m2', opciones),
+        opciones.get('tabla_precios'),
+    ), None)
+
+
+def dataset_m3(datos, opciones):
+    """
+    Pares (producto_A, producto_B) comprados juntos (1) o no (0), a partir
+    de las co-ocurrencias dispersas (ver predictions/cooccurrence.py).
+    """
+    if isinstance(datos, Acumulado):
+        return _dataset_m3_acumulado(datos, opciones)
+
+    df_raw_reco = datos[['venta_id', 'producto_id']]
+    if df_raw_reco.empty:
+        raise DatosInsuficientes("No se encontraron datos.")
+
+    if opciones['reco_modo'] == 'similitud':
+        # No hay X/y: el "modelo" es la propia matriz de similitud
+        return df_raw_reco, None, None
+
+    producto_a, producto_b, compraron_juntos, peso = dataset_clasificador(
+        df_raw_reco['venta_id'].values,
+        df_raw_reco['producto_id'].values,
+        negativos_por_positivo=opciones['negativos_por_positivo'],
+        rng=42,
+    )
+    if not compraron_juntos.any():
+        raise DatosInsuficientes("No se encontraron pares de productos.")
+
+    X = pd.DataFrame({'producto_A': producto_a, 'producto_B': producto_b})
+    y = pd.Series(compraron_juntos, name='compraron_juntos')
+    return X, y, peso
+
+
+def _dataset_m3_acumulado(acumulado, opciones):
+    if acumulado.C.nnz == 0:
+        raise DatosInsuficientes("No se encontraron pares de productos.")
+
+    if opciones['reco_modo'] == 'similitud':
+        # Para la huella del manifest: los pares con sus veces juntos
+        producto_a, producto_b, veces = pares_positivos(acumulado.C, acumulado.productos)
+        return pd.DataFrame({'producto_A': producto_a, 'producto_B': producto_b, 'veces': veces}), None, None
+
+    producto_a, producto_b, compraron_juntos, peso = dataset_clasificador_coocurrencias(
+        acumulado.C,
+        acumulado.productos,
+        negativos_por_positivo=opciones['negativos_por_positivo'],
+        rng=42,
+    )
+    X = pd.DataFrame({'producto_A': producto_a, 'producto_B': producto_b})
+    y = pd.Series(compraron_juntos, name='compraron_juntos')
+    return X, y, peso
+
+
+def _modelo_similitud(datos, metrica):
+    if isinstance(datos, Acumulado):
+        return ItemSimilarityModel.desde_coocurrencias(
+            datos.productos, datos.C, datos.ventas_por_producto, datos.n_ventas, metrica
+        )
+    return ItemSimilarityModel.entrenar(datos['venta_id'].values, datos['producto_id'].values, metrica=metrica)
+
+
+def filas_por_empresa(datos):
+    """Detalles de venta por empresa (Series empresa_id -> filas)."""
+    if isinstance(datos, Acumulado):
+        return datos.filas_por_empresa
+    return datos['empresa_id'].value_counts()
+
+
+# ---------------------------------------------------------------------
+# 🔹 Entrenamiento de UN modelo
+# ---------------------------------------------------------------------
+def entrenar_modelo(clave, datos, opciones=None, n_jobs=1, base_dir=None, empresa_id=None,
+                    al_empezar=None):
+    """
+    Arma el dataset, entrena y publica el modelo `clave` ('m1', 'm2', 'm3').
+    Con `empresa_id` usa solo las ventas de esa empresa y publica el modelo
+    dedicado. Devuelve un dict con la versión publicada y el tiempo de cada etapa.
+    `al_empezar(etapa)` se llama al comenzar 'dataset', 'fit' y 'publicar'.
+    """
+    opciones = {**OPCIONES_DEFAULT, **(opciones or {})}
+    nombre, _ = MODELOS[clave]
+    tiempos = {}
+    al_empezar = al_empezar or (lambda etapa: None)
+
+    al_empezar('dataset')
+    inicio = time.perf_counter()
+    if empresa_id is not None:
+        if isinstance(datos, Acumulado):
+            datos = datos.de_empresa(empresa_id)
+        else:
+            datos = datos[datos['empresa_id'] == empresa_id]
+        base_dir = directorio_empresa(empresa_id, base_dir)
+    if clave == 'm1':
+        X, y, peso = dataset_m1(datos, opciones)
+    elif clave == 'm2':
+        X, y, peso = dataset_m2(datos, opciones)
+    else:
+        X, y, peso = dataset_m3(datos, opciones)
+    if X.empty:
+        raise DatosInsuficientes("No hay datos finales para entrenar.")
+    tiempos['dataset'] = time.perf_counter() - inicio
+
+    al_empezar('fit')
+    inicio = time.perf_counter()
+    extra = {'empresa_id': empresa_id} if empresa_id is not None else {}
+    # El presupuesto de núcleos también limita BLAS/OpenMP dentro del fit
+    with threadpool_limits(limits=n_jobs):
+        if clave == 'm3' and opciones['reco_modo'] == 'similitud':
+            model = _modelo_similitud(datos, opciones['similitud'])
+            features, target = ['producto_A', 'producto_B'], 'compraron_juntos'
+            extra.update({'modo': 'similitud', 'metrica': opciones['similitud']})
+        else:
+            estimador = RandomForestClassifier if clave == 'm3' else RandomForestRegressor
+            model = estimador(n_estimators=opciones['n_estimators'], random_state=42, n_jobs=n_jobs)
+            model.fit(X, y, sample_weight=peso) # ¡Entrenamos!
+            features, target = list(X.columns), y.name
+            if clave in ('m1', 'm2'):
+                pistas = _pistas(clave, opciones)
+                extra['pistas'] = {'rezagos': pistas.rezagos, 'ventanas': list(pistas.ventanas),
+                                   'precios': pistas.precios}
+            if clave == 'm3':
+                extra.update({'modo': 'clasificador', 'negativos_por_positivo': opciones['negativos_por_positivo']})
+    tiempos['fit'] = time.perf_counter() - inicio
+
+    al_empezar('publicar')
+    inicio = time.perf_counter()
+    manifest = publicar_modelo(nombre, model, features, X=X, target=target,
+                               extra={**extra, 'n_jobs': n_jobs}, base_dir=base_dir)
+    tiempos['publicar'] = time.perf_counter() - inicio
+
+    return {
+        'clave': clave,
+        'nombre': nombre,
+        'empresa_id': empresa_id,
+        'version': manifest['version'],
+        'filas': int(len(X)),
+        'tiempos': tiempos,
+    }
+
+
+# ---------------------------------------------------------------------
+# 🔹 Varios modelos en paralelo
+# ---------------------------------------------------------------------
+_DATOS_COMPARTIDOS = None
+
+
+def _inicializar_worker(datos):
+    # Con 'fork' los datos (DataFrame o Acumulado) se heredan sin copiarlos;
+    # con 'spawn' se envían una vez por worker (no una vez por tarea).
+    global _DATOS_COMPARTIDOS
+    _DATOS_COMPARTIDOS = datos
+
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'smartsales.settings')
+        django.setup()
+
+
+def _entrenar_seguro(tarea, datos, opciones, n_jobs, base_dir):
+    """Como entrenar_modelo, pero un modelo que falla no detiene a los demás."""
+    clave, empresa_id = tarea
+    base = {'clave': clave, 'nombre': MODELOS[clave][0], 'empresa_id': empresa_id}
+    try:
+        return entrenar_modelo(clave, datos, opciones, n_jobs, base_dir, empresa_id)
+    except DatosInsuficientes as e:
+        return {**base, 'omitido': str(e)}
+    except Exception as e:
+        return {**base, 'error': f"{type(e).__name__}: {e}"}
+
+
+def _entrenar_en_worker(tarea, opciones, n_jobs, base_dir):
+    return _entrenar_seguro(tarea, _DATOS_COMPARTIDOS, opciones, n_jobs, base_dir)
+
+
+def presupuesto_nucleos(n_modelos, jobs, cores=None):
+    """Núcleos (n_jobs) para cada modelo cuando corren `jobs` a la vez."""
+    cores = cores or os.cpu_count() or 1
+    concurrentes = max(1, min(jobs, n_modelos))
+    return max(1, cores // concurrentes)
+
+
+def empresas_para_entrenar(datos, min_filas=1, empresas=None):
+    """
+    Empresas con modelo dedicado: las que tienen al menos `min_filas`
+    detalles de venta (las chicas se quedan con el modelo global).
+    Con `empresas` solo se consideran esas.
+    """
+    filas = filas_por_empresa(datos)
+    filas = filas[filas.index != SIN_ID]
+    if empresas is not None:
+        filas = filas[filas.index.isin(list(empresas))]
+    return sorted(int(e) for e in filas[filas >= min_filas].index)
+
+
+def entrenar_modelos(datos, claves, opciones=None, jobs=1, cores=None, base_dir=None,
+                     al_terminar=None, empresas=(), incluir_global=True):
+    """
+    Entrena los modelos `claves` (globales y/o uno por cada empresa de
+    `empresas`) y devuelve sus resultados en orden: primero los globales,
+    luego por empresa. Con jobs > 1 las tareas corren en procesos separados.
+    `al_terminar(resultado)` se llama apenas termina cada modelo.
+    """
+    tareas = [(clave, None) for clave in claves] if incluir_global else []
+    tareas += [(clave, int(empresa_id)) for empresa_id in empresas for clave in claves]
+    n_jobs = presupuesto_nucleos(len(tareas), jobs, cores)
+    resultados = {}
+
+    def _registrar(resultado):
+        resultados[(resultado['clave'], resultado['empresa_id'])] = resultado
+        if al_terminar:
+            al_terminar(resultado)
+
+    if jobs <= 1 or len(tareas) <= 1:
+        for tarea in tareas:
+            _registrar(_entrenar_seguro(tarea, datos, opciones, n_jobs, base_dir))
+        return [resultados[t] for t in tareas]
+
+    # Las conexiones a la BD no se pueden compartir entre procesos
+    from django.db import connections
+    connections.close_all()
+
+    with ProcessPoolExecutor(
+        max_workers=min(jobs, len(tareas)),
+        initializer=_inicializar_worker,
+        initargs=(datos,),
+    ) as pool:
+        futuros = [pool.submit(_entrenar_en_worker, tarea, opciones, n_jobs, base_dir) for tarea in tareas]
+        for futuro in as_completed(futuros):
+            _registrar(futuro.result())
+
+    return [resultados[t] for t in tareas]
@@ -2,7 +2,7 @@
 from django.urls import path
 from . import views
 from rest_framework.routers import DefaultRouter
-from .views import PredictDemandView, RecommendProductView, PredictSalesView
+from .views import PredictDemandView, RecommendProductView, PredictSalesView, PredictDemandBatchView, PredictDemandHorizonView
 
 urlpatterns = [
     # Vamos a crear una vista llamada 'PredictDemandView'
@@ -14,6 +14,18 @@ urlpatterns = [
     path('demand/<int:producto_id>/', 
          views.PredictDemandView.as_view(), 
          name='predict_demand'),
+
+    # --- Demanda en lote (todo el catálogo en una sola llamada) ---
+    # (Ej: POST /api/predict/demand/batch/  {"producto_ids": [1, 2, 3]} o {"empresa": 1})
+    path('demand/batch/', 
+         views.PredictDemandBatchView.as_view(), 
+         name='predict_demand_batch'),
+    
+    # --- Pronóstico de las próximas N semanas (JSON o CSV en streaming) ---
+    # (Ej: GET /api/predict/demand/horizon/?empresa=1&semanas=8&formato=csv)
+    path('demand/horizon/', 
+         views.PredictDemandHorizonView.as_view(), 
+         name='predict_demand_horizon'),
     
     # --- Endpoint 2 (¡EL NUEVO!) ---
     # (Ej: /api/predict/recommend/3/)
@@ -24,4 +36,15 @@ urlpatterns = [
     path('sales/category/<int:subcategoria_id>/', 
          views.PredictSalesView.as_view(), 
          name='predict_sales_category'),
+
+    # --- Entrenamiento en segundo plano (lo corre `manage.py run_training_worker`) ---
+    # (Ej: POST /api/predict/training/jobs/  {"modelos": ["m2"]}  ->  202 + id del job)
+    path('training/jobs/', 
+         views.TrainingJobListView.as_view(), 
+         name='training_jobs'),
+
+    # (Ej: GET /api/predict/training/jobs/7/  ->  estado, etapa y progreso)
+    path('training/jobs/<int:job_id>/', 
+         views.TrainingJobDetailView.as_view(), 
+         name='training_job_detail'),
 ]
\ No newline at end of file
@@ -1,25 +1,69 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-import pandas as pd
-from datetime import datetime, timedelta
-from django.db.models import Sum
-from rest_framework.permissions import AllowAny 
+import csv
+import json
+import numpy as np
+from django.http import StreamingHttpResponse
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from django.apps import apps 
-from .apps import PredictionsConfig # Importamos la "Plantilla"
+from .registry import model_registry
+from .recommendations import recommendation_index, puntuar_candidatos, top_k_parcial
+from . import feature_store, features, pronostico
+from .cache import prediction_cache
+from .inference import predecir
+from .jobs import encolar
+from .training import MODELOS
+from .models import TrainingJob
+from .serializers import EncolarEntrenamientoSerializer, TrainingJobSerializer
 from django.utils import timezone
 from dateutil.relativedelta import relativedelta
+from utils.streaming import Eco
 
 # --- Importamos los modelos de la BD ---
-try:
-    from ventas.models import DetalleVenta
-except ImportError:
-    DetalleVenta = None
 try:
     from products.models import Producto 
 except ImportError:
     Producto = None
 
+def _es_super_admin(user):
+    return user.is_superuser or getattr(getattr(user, 'role', None), 'name', '') == 'SUPER_ADMIN'
+
+
+def _empresa_del_modelo(request, valor=None):
+    """
+    Empresa cuyo modelo dedicado se usa (si no tiene, el registro cae al
+    global): la del usuario. Solo el SUPER_ADMIN puede pedir otra con
+    `valor` explícito o `?empresa=`; para los demás se ignora, igual que en
+    los reportes y la exportación. Sin usuario, None (modelo global).
+    Devuelve (empresa_id, None) o (None, Response 400).
+    """
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return None, None
+    if not _es_super_admin(user):
+        return getattr(user, 'empresa_id', None), None
+    if valor in (None, ''):
+        valor = request.query_params.get('empresa')
+    if valor in (None, ''):
+        return getattr(user, 'empresa_id', None), None
+    try:
+        return int(valor), None
+    except (TypeError, ValueError):
+        return None, Response({"error": "'empresa' debe ser un número entero."},
+                              status=status.HTTP_400_BAD_REQUEST)
+
+# Nombre anterior de `ventas_semana_anterior` en las respuestas de demanda.
+# OJO, cambió de significado: antes era la suma móvil de los últimos 7 días y
+# ahora es la semana calendario anterior (lunes a domingo, UTC), la misma
+# pista con la que se entrena. Se sigue enviando con el mismo valor para no
+# romper a los clientes, pero está obsoleto: usar `ventas_semana_anterior`.
+CAMPO_VENTAS_OBSOLETO = 'ventas_reales_ultimos_7_dias'
+
+def _bucket_demanda(hoy):
+    """Todo lo que cambia la predicción de demanda salvo el producto: semana/mes y la semana del feature store."""
+    return f"{hoy:%G-W%V}-m{hoy.month}:{feature_store.semana_anterior()}"
+
 # ===================================================================
 # --- VISTA 1: PREDICCIÓN DE VENTAS 
 # ===================================================================
@@ -28,39 +72,31 @@ class PredictSalesView(APIView):
     
     # --- ¡CAMBIO AQUÍ! ---
     def get(self, request, subcategoria_id, format=None): 
-        model = PredictionsConfig.sales_category_model
-        if model is None:
+        empresa_id, error = _empresa_del_modelo(request)
+        if error is not None:
+            return error
+        cargado = model_registry.get_loaded('sales_category_model', empresa_id)
+        if cargado is None:
             return Response({"error": "Modelo de Ventas por Categoría no cargado."}, 
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        # --- Pistas: ['subcategoria_id', 'mes', 'ventas_mes_anterior'] ---
         hoy = timezone.now()
         mes_actual = hoy.month
 
-        primer_dia_mes_actual = hoy.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        ultimo_dia_mes_pasado = primer_dia_mes_actual - timedelta(seconds=1) 
-        primer_dia_mes_pasado = ultimo_dia_mes_pasado.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-
-        # --- ¡CAMBIO AQUÍ! ---
-        ventas_pasadas = DetalleVenta.objects.filter(
-            producto__subcategoria_id=subcategoria_id, # <-- ¡Usamos tu cambio!
-            venta__fecha__range=(primer_dia_mes_pasado, ultimo_dia_mes_pasado)
-        ).aggregate(total_vendido=Sum('cantidad'))
-        
-        ventas_mes_anterior = ventas_pasadas.get('total_vendido', 0)
-        if ventas_mes_anterior is None: ventas_mes_anterior = 0
-
-        # --- ¡CAMBIO AQUÍ! ---
-        data_para_predecir = {
-            'subcategoria_id': [subcategoria_id], # <-- ¡Usamos tu cambio!
-            'mes': [mes_actual],
-            'ventas_mes_anterior': [ventas_mes_anterior]
-        }
-        columnas_ordenadas = ['subcategoria_id', 'mes', 'ventas_mes_anterior'] # <-- ¡Usamos tu cambio!
-        df_predict = pd.DataFrame(data_para_predecir, columns=columnas_ordenadas)
+        # La predicción solo cambia con el mes, la versión del modelo o ventas nuevas
+        consulta = prediction_cache.consultar(cargado, 'subcategoria', [subcategoria_id], f"{hoy:%Y-%m}")
+        guardado = consulta.encontrados.get(subcategoria_id)
+        if guardado is not None:
+            prediccion_final, ventas_mes_anterior = guardado
+        else:
+            # Las mismas pistas que en el entrenamiento (predictions/features.py), desde el feature store
+            columnas = features.pistas_ventas_subcategoria(cargado, [subcategoria_id], hoy)
+            ventas_mes_anterior = int(columnas['ventas_mes_anterior'][0])
 
-        prediccion_array = model.predict(df_predict)
-        prediccion_final = round(prediccion_array[0])
+            # Bosque compilado (predictions/inference.py): sin DataFrame ni validación de sklearn
+            prediccion_array = predecir(cargado.modelo, columnas, cargado.compilado)
+            prediccion_final = round(prediccion_array[0])
+            consulta.guardar({subcategoria_id: (prediccion_final, ventas_mes_anterior)})
 
         # --- ¡CAMBIO AQUÍ! ---
         return Response({
@@ -79,34 +115,30 @@ class PredictDemandView(APIView):
     permission_classes = [AllowAny]
     
     def get(self, request, producto_id, format=None):
-        model = PredictionsConfig.demand_product_model
-        if model is None:
+        empresa_id, error = _empresa_del_modelo(request)
+        if error is not None:
+            return error
+        cargado = model_registry.get_loaded('demand_product_model', empresa_id)
+        if cargado is None:
             return Response({"error": "Modelo de Demanda por Producto no cargado."}, 
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        hoy = datetime.now()
+        hoy = timezone.now()
         mes_actual = hoy.month
         semana_actual = hoy.isocalendar().week
-        hace_7_dias = hoy - timedelta(days=7)
-        
-        ventas_pasadas = DetalleVenta.objects.filter(
-            producto_id=producto_id,
-            venta__fecha__gte=hace_7_dias
-        ).aggregate(total_vendido=Sum('cantidad'))
-        ventas_semana_anterior = ventas_pasadas.get('total_vendido', 0)
-        if ventas_semana_anterior is None: ventas_semana_anterior = 0
-
-        data_para_predecir = {
-            'producto_id': [producto_id],
-            'mes': [mes_actual],
-            'semana_del_anio': [semana_actual],
-            'ventas_semana_anterior': [ventas_semana_anterior]
-        }
-        columnas_ordenadas = ['producto_id', 'mes', 'semana_del_anio', 'ventas_semana_anterior']
-        df_predict = pd.DataFrame(data_para_predecir, columns=columnas_ordenadas)
 
-        prediccion_array = model.predict(df_predict)
-        prediccion_final = round(prediccion_array[0])
+        consulta = prediction_cache.consultar(cargado, 'producto', [producto_id], _bucket_demanda(hoy))
+        guardado = consulta.encontrados.get(producto_id)
+        if guardado is not None:
+            prediccion_final, ventas_semana_anterior = guardado
+        else:
+            # Las mismas pistas que en el entrenamiento (predictions/features.py), desde el feature store
+            columnas = features.pistas_demanda(cargado, [producto_id], hoy)
+            ventas_semana_anterior = int(columnas['ventas_semana_anterior'][0])
+
+            prediccion_array = predecir(cargado.modelo, columnas, cargado.compilado)
+            prediccion_final = round(prediccion_array[0])
+            consulta.guardar({producto_id: (prediccion_final, ventas_semana_anterior)})
 
         return Response({
             "producto_id": producto_id,
@@ -114,7 +146,8 @@ class PredictDemandView(APIView):
             "datos_usados_para_predecir": {
                 "mes_actual": mes_actual,             
                 "semana_actual": semana_actual,      
-                "ventas_reales_ultimos_7_dias": ventas_semana_anterior
+                "ventas_semana_anterior": ventas_semana_anterior,
+                CAMPO_VENTAS_OBSOLETO: ventas_semana_anterior,
             }
         }, status=status.HTTP_200_OK)
 
@@ -122,46 +155,392 @@ class PredictDemandView(APIView):
 # --- VISTA 3: RECOMENDACIÓN DE PRODUCTOS 
 # ===================================================================
 class RecommendProductView(APIView):
+    """
+    Recomienda productos que suelen comprarse junto con `producto_id`.
+
+    Primero busca en el índice precalculado (build_recommendation_index);
+    si el producto no está ahí, puntúa el catálogo con el modelo y se queda
+    con el top-k usando una selección parcial.
+
+    Query params:
+      - k: cantidad de recomendaciones (default 3, máximo 50)
+      - empresa: usar el modelo de esa empresa (default: la del usuario)
+    """
     permission_classes = [AllowAny]
+    DEFAULT_K = 3
+    MAX_K = 50
     
     def get(self, request, producto_id, format=None):
-        model = PredictionsConfig.recommendation_model
-        
-        if model is None:
+        try:
+            k = int(request.query_params.get('k', self.DEFAULT_K))
+        except (TypeError, ValueError):
+            return Response({"error": "'k' debe ser un número entero."}, status=status.HTTP_400_BAD_REQUEST)
+        k = max(1, min(k, self.MAX_K))
+        empresa_id, error = _empresa_del_modelo(request)
+        if error is not None:
+            return error
+
+        cargado = model_registry.get_loaded('recommendation_model', empresa_id)
+        if cargado is None:
             return Response({"error": "Modelo de Recomendación no cargado."}, 
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        # --- Camino rápido: búsqueda O(1) en el índice precalculado ---
+        encontrado = recommendation_index.buscar(producto_id, k, cargado.directorio)
+        if encontrado is not None:
+            ids_top, proba_top = encontrado
+            return self._respuesta(producto_id, ids_top, proba_top, origen="indice")
+
+        # --- Respaldo: puntuar contra todo el catálogo ---
+        model = cargado.modelo
         if Producto is None:
             return Response({"error": "No se pudo importar 'Producto'"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         try:
-            otros_productos_ids = list(Producto.objects.exclude(id=producto_id).values_list('id', flat=True))
+            # Solo se recomiendan productos de la misma empresa
+            if empresa_id is None:
+                empresa_id = Producto.objects.filter(id=producto_id).values_list('empresa_id', flat=True).first()
+            otros_productos_ids = list(
+                Producto.objects.filter(empresa_id=empresa_id).exclude(id=producto_id)
+                .order_by('id').values_list('id', flat=True)
+            )
         except Exception as e:
             return Response({"error": f"Error al buscar productos: {e}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         if not otros_productos_ids:
             return Response({"error": "No se encontraron otros productos para recomendar."}, status=status.HTTP_404_NOT_FOUND)
 
-        data_para_predecir = {
-            'producto_A': [producto_id] * len(otros_productos_ids),
-            'producto_B': otros_productos_ids
-        }
-        df_predict = pd.DataFrame(data_para_predecir)
-        
-        probabilidades = model.predict_proba(df_predict)
-        probabilidad_de_compra_juntos = probabilidades[:, 1]
-        
-        resultados = zip(otros_productos_ids, probabilidad_de_compra_juntos)
-        resultados_ordenados = sorted(resultados, key=lambda x: x[1], reverse=True)
-        top_3_recomendaciones_tuplas = resultados_ordenados[:3]
-        
-        top_3_final = []
-        for prod_id, prob in top_3_recomendaciones_tuplas:
-            top_3_final.append({
-                "producto_id_recomendado": prod_id,
+        probabilidad_de_compra_juntos = puntuar_candidatos(model, producto_id, otros_productos_ids, cargado.compilado)
+        ids_top, proba_top = top_k_parcial(otros_productos_ids, probabilidad_de_compra_juntos, k)
+        return self._respuesta(producto_id, ids_top, proba_top, origen="modelo")
+
+    def _respuesta(self, producto_id, ids_top, proba_top, origen):
+        top_final = [
+            {
+                "producto_id_recomendado": int(prod_id),
                 "probabilidad": f"{prob * 100:.2f}%"
-            })
+            }
+            for prod_id, prob in zip(ids_top, proba_top)
+        ]
 
         return Response({
             "producto_consultado": producto_id,
-            "recomendaciones": top_3_final
-        }, status=status.HTTP_200_OK)
\ No newline at end of file
+            "recomendaciones": top_final,
+            "origen": origen,
+        }, status=status.HTTP_200_OK)
+
+# ===================================================================
+# --- VISTA 4: PREDICCIÓN DE DEMANDA EN LOTE (todo el catálogo)
+# ===================================================================
+class PredictDemandBatchView(APIView):
+    """
+    Predice la demanda de la próxima semana para muchos productos a la vez.
+
+    Body (JSON), una de dos formas:
+      - {"producto_ids": [1, 2, 3, ...]}  -> solo esos productos (de la empresa)
+      - {} o {"empresa": 5}               -> todo el catálogo activo de la empresa
+
+    La empresa es la del usuario; solo el SUPER_ADMIN puede pedir otra
+    (`empresa` en el body o `?empresa=`). Si tiene un modelo dedicado se
+    usa ese; si no, el global.
+
+    Las predicciones ya calculadas esta semana salen de la caché; para el
+    resto, las ventas de la semana anterior salen del feature store en UNA
+    consulta y el modelo se llama UNA sola vez sobre la matriz completa.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, format=None):
+        producto_ids = request.data.get('producto_ids')
+
+        empresa_id, error = _empresa_del_modelo(request, request.data.get('empresa'))
+        if error is not None:
+            return error
+        if empresa_id is None and not _es_super_admin(request.user):
+            return Response({"error": "El usuario no pertenece a ninguna empresa."},
+                            status=status.HTTP_403_FORBIDDEN)
+        cargado = model_registry.get_loaded('demand_product_model', empresa_id)
+        if cargado is None:
+            return Response({"error": "Modelo de Demanda por Producto no cargado."},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        if producto_ids:
+            if not isinstance(producto_ids, list):
+                return Response({"error": "'producto_ids' debe ser una lista de IDs."},
+                                status=status.HTTP_400_BAD_REQUEST)
+            try:
+                # Sin duplicados y conservando el orden en que llegaron
+                producto_ids = list(dict.fromkeys(int(pid) for pid in producto_ids))
+            except (TypeError, ValueError):
+                return Response({"error": "'producto_ids' solo puede contener números enteros."},
+                                status=status.HTTP_400_BAD_REQUEST)
+            if empresa_id is not None:
+                # Solo productos de la empresa: las ventas de otra no salen en la respuesta
+                propios = set(
+                    Producto.objects.filter(empresa_id=empresa_id, id__in=producto_ids).values_list('id', flat=True)
+                )
+                producto_ids = [pid for pid in producto_ids if pid in propios]
+            catalogo = False
+        elif empresa_id is not None:
+            producto_ids = list(
+                Producto.objects.filter(empresa_id=empresa_id, esta_activo=True)
+                .order_by('id').values_list('id', flat=True)
+            )
+            catalogo = True
+        else:
+            return Response({"error": "Debe enviar 'producto_ids' o 'empresa'."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        if not producto_ids:
+            return Response({"error": "No se encontraron productos para predecir."},
+                            status=status.HTTP_404_NOT_FOUND)
+
+        hoy = timezone.now()
+        mes_actual = hoy.month
+        semana_actual = hoy.isocalendar().week
+
+        # --- Primero la caché: solo se predicen los productos que falten ---
+        consulta = prediction_cache.consultar(cargado, 'producto', producto_ids, _bucket_demanda(hoy))
+        faltantes = consulta.faltantes()
+        if faltantes:
+            # Con todo el catálogo pendiente se filtra por empresa en vez de mandar la lista de ids
+            empresa_filtro = empresa_id if catalogo and len(faltantes) == len(producto_ids) else None
+
+            # --- Pistas de TODOS los faltantes en una consulta (predictions/features.py) ---
+            columnas = features.pistas_demanda(cargado, faltantes, hoy, empresa_id=empresa_filtro)
+            ids = columnas['producto_id']
+            ventas_semana_anterior = columnas['ventas_semana_anterior']
+
+            predicciones = np.rint(predecir(cargado.modelo, columnas, cargado.compilado)).astype(np.int64)
+            calculados = {
+                pid: (pred, ventas)
+                for pid, pred, ventas in zip(ids.tolist(), predicciones.tolist(), ventas_semana_anterior.tolist())
+            }
+            consulta.guardar(calculados)
+            consulta.encontrados.update(calculados)
+
+        resultados = [
+            {
+                "producto_id": pid,
+                "prediccion_proxima_semana (unidades)": consulta.encontrados[pid][0],
+                "ventas_semana_anterior": consulta.encontrados[pid][1],
+                CAMPO_VENTAS_OBSOLETO: consulta.encontrados[pid][1],
+            }
+            for pid in producto_ids
+        ]
+
+        return Response({
+            "total_productos": len(resultados),
+            "datos_usados_para_predecir": {
+                "mes_actual": mes_actual,
+                "semana_actual": semana_actual,
+            },
+            "predicciones": resultados,
+        }, status=status.HTTP_200_OK)
+
+# ===================================================================
+# --- VISTA 5: PRONÓSTICO DE DEMANDA A VARIAS SEMANAS
+# ===================================================================
+class PredictDemandHorizonView(APIView):
+    """
+    Pronóstico de las próximas N semanas para muchos productos (ver
+    predictions/pronostico.py).
+
+    Query params:
+      - producto_ids: "1,2,3"; sin esto, todo el catálogo activo de la empresa
+      - empresa: empresa del catálogo y de su modelo dedicado; solo para el
+        SUPER_ADMIN (los demás siempre usan la suya)
+      - semanas: horizonte (default 4, máximo 12)
+      - formato: json (default) o csv
+      - stream: 1 para enviar el JSON a medida que se calcula (el CSV siempre va en streaming)
+
+    Los productos se calculan por bloques; en streaming cada bloque se envía
+    apenas está listo y el catálogo completo nunca se arma en memoria.
+    """
+    permission_classes = [IsAuthenticated]
+    DEFAULT_SEMANAS = 4
+    MAX_SEMANAS = 12
+
+    def get(self, request, format=None):
+        try:
+            semanas = int(request.query_params.get('semanas', self.DEFAULT_SEMANAS))
+        except (TypeError, ValueError):
+            return Response({"error": "'semanas' debe ser un número entero."}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= semanas <= self.MAX_SEMANAS:
+            return Response({"error": f"'semanas' debe estar entre 1 y {self.MAX_SEMANAS}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        formato = request.query_params.get('formato', 'json').lower()
+        if formato not in ('json', 'csv'):
+            return Response({"error": "'formato' debe ser 'json' o 'csv'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        empresa_id, error = _empresa_del_modelo(request)
+        if error is not None:
+            return error
+        if empresa_id is None and not _es_super_admin(request.user):
+            return Response({"error": "El usuario no pertenece a ninguna empresa."},
+                            status=status.HTTP_403_FORBIDDEN)
+        cargado = model_registry.get_loaded('demand_product_model', empresa_id)
+        if cargado is None:
+            return Response({"error": "Modelo de Demanda por Producto no cargado."},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        producto_ids = request.query_params.get('producto_ids')
+        if producto_ids:
+            try:
+                producto_ids = list(dict.fromkeys(int(pid) for pid in producto_ids.split(',') if pid.strip()))
+            except ValueError:
+                return Response({"error": "'producto_ids' solo puede contener números enteros."},
+                                status=status.HTTP_400_BAD_REQUEST)
+            if empresa_id is not None:
+                propios = set(
+                    Producto.objects.filter(empresa_id=empresa_id, id__in=producto_ids).values_list('id', flat=True)
+                )
+                producto_ids = [pid for pid in producto_ids if pid in propios]
+        elif empresa_id is not None:
+            producto_ids = list(
+                Producto.objects.filter(empresa_id=empresa_id, esta_activo=True)
+                .order_by('id').values_list('id', flat=True)
+            )
+        else:
+            return Response({"error": "Debe enviar 'producto_ids' o 'empresa'."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not producto_ids:
+            return Response({"error": "No se encontraron productos para predecir."},
+                            status=status.HTTP_404_NOT_FOUND)
+
+        hoy = timezone.now()
+        semanas_horizonte = pronostico.calendario(hoy, semanas)
+        bloques = pronostico.pronosticar_por_bloques(cargado, producto_ids, semanas_horizonte, hoy)
+
+        if formato == 'csv':
+            respuesta = StreamingHttpResponse(self._csv(bloques, semanas_horizonte), content_type='text/csv')
+            respuesta['Content-Disposition'] = f'attachment; filename="pronostico_{semanas}_semanas.csv"'
+            return respuesta
+        cabecera = {
+            "semanas": semanas,
+            "version_modelo": cargado.version,
+            "calendario": semanas_horizonte,
+            "total_productos": len(producto_ids),
+        }
+        if request.query_params.get('stream') in ('1', 'true'):
+            return StreamingHttpResponse(self._json(cabecera, bloques), content_type='application/json')
+        return Response({
+            **cabecera,
+            "predicciones": [fila for bloque in bloques for fila in self._filas(*bloque)],
+        }, status=status.HTTP_200_OK)
+
+    @staticmethod
+    def _filas(producto_ids, ventas, matriz):
+        for pid, ultima, horizonte in zip(producto_ids, ventas.tolist(), matriz.tolist()):
+            yield {
+                "producto_id": pid,
+                "ventas_semana_anterior": ultima,
+                "horizonte": horizonte,
+                "total_unidades": sum(horizonte),
+            }
+
+    def _json(self, cabecera, bloques):
+        yield json.dumps(cabecera)[:-1] + ', "predicciones": ['
+        separador = ''
+        for bloque in bloques:
+            trozo = ','.join(json.dumps(fila) for fila in self._filas(*bloque))
+            if trozo:
+                yield separador + trozo
+                separador = ','
+        yield ']}'
+
+    def _csv(self, bloques, semanas_horizonte):
+        writer = csv.writer(Eco())
+        yield writer.writerow(['producto_id', 'ventas_semana_anterior', 'h', 'semana', 'inicio_semana',
+                               'prediccion_unidades'])
+        for producto_ids, ventas, matriz in bloques:
+            yield ''.join(
+                writer.writerow([pid, ultima, semana['h'], semana['semana'], semana['inicio'], unidades])
+                for pid, ultima, fila in zip(producto_ids, ventas.tolist(), matriz.tolist())
+                for semana, unidades in zip(semanas_horizonte, fila)
+            )
+
+# ===================================================================
+# --- VISTA 6: ENTRENAMIENTO EN SEGUNDO PLANO
+# ===================================================================
+def _empresa_para_entrenar(request, valor=None):
+    """
+    Empresa cuyos modelos se entrenan: la del usuario. El staff puede pedir
+    cualquiera, o ninguna para los modelos globales.
+    Devuelve (empresa_id, None) o (None, Response de error).
+    """
+    user = request.user
+    if user.is_staff:
+        if valor in (None, ''):
+            return None, None
+        try:
+            empresa_id = int(valor)
+        except (TypeError, ValueError):
+            return None, Response({"error": "'empresa' debe ser un número entero."},
+                                  status=status.HTTP_400_BAD_REQUEST)
+    else:
+        empresa_id = getattr(user, 'empresa_id', None)
+        if empresa_id is None:
+            return None, Response({"error": "El usuario no pertenece a ninguna empresa."},
+                                  status=status.HTTP_403_FORBIDDEN)
+        if valor not in (None, '') and str(valor) != str(empresa_id):
+            return None, Response({"error": "Solo puede entrenar los modelos de su empresa."},
+                                  status=status.HTTP_403_FORBIDDEN)
+
+    Empresa = apps.get_model('tenants', 'Empresa')
+    empresa = Empresa.objects.select_related('plan').filter(pk=empresa_id).first()
+    if empresa is None:
+        return None, Response({"error": "Empresa no encontrada."}, status=status.HTTP_404_NOT_FOUND)
+    if empresa.plan is not None and not empresa.plan.prediccion_ventas:
+        return None, Response({"error": "El plan de la empresa no incluye predicciones."},
+                              status=status.HTTP_403_FORBIDDEN)
+    return empresa_id, None
+
+
+class TrainingJobListView(APIView):
+    """
+    POST encola un entrenamiento y responde 202 sin esperarlo: lo corre
+    `manage.py run_training_worker` (predictions/jobs.py). Si la empresa ya
+    tiene uno pendiente o en curso responde 200 con ése.
+    GET lista los últimos entrenamientos de la empresa.
+
+    Body (POST): {"modelos": ["m1", "m2"], "rezagos_semanales": 6}
+      - modelos: default todos
+      - empresa: solo staff (sin empresa = modelos globales)
+    """
+    permission_classes = [IsAuthenticated]
+    LIMITE = 20
+
+    def get(self, request, format=None):
+        empresa_id, error = _empresa_para_entrenar(request, request.query_params.get('empresa'))
+        if error is not None:
+            return error
+        entrenamientos = TrainingJob.objects.filter(empresa_id=empresa_id).select_related('empresa')[:self.LIMITE]
+        return Response(TrainingJobSerializer(entrenamientos, many=True).data, status=status.HTTP_200_OK)
+
+    def post(self, request, format=None):
+        serializer = EncolarEntrenamientoSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        empresa_id, error = _empresa_para_entrenar(request, serializer.validated_data.get('empresa'))
+        if error is not None:
+            return error
+
+        modelos = serializer.validated_data.get('modelos') or list(MODELOS)
+        job, creado = encolar(empresa_id, modelos, serializer.opciones, request.user)
+        return Response(TrainingJobSerializer(job).data,
+                        status=status.HTTP_202_ACCEPTED if creado else status.HTTP_200_OK)
+
+
+class TrainingJobDetailView(APIView):
+    """Estado, etapa y progreso (0-100) de un entrenamiento."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id, format=None):
+        entrenamientos = TrainingJob.objects.select_related('empresa')
+        if not request.user.is_staff:
+            entrenamientos = entrenamientos.filter(empresa_id=getattr(request.user, 'empresa_id', None),
+                                                   empresa__isnull=False)
+        job = entrenamientos.filter(pk=job_id).first()
+        if job is None:
+            return Response({"error": "Entrenamiento no encontrado."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(TrainingJobSerializer(job).data, status=status.HTTP_200_OK)
@@ -1,6 +1,8 @@
 # products/models.py
 from django.db import models
 
+from tenants import secuencias
+
 class Marca(models.Model):
     #Representa al fabricante del producto (Ej: Samsung, LG, Sony).
     empresa = models.ForeignKey('tenants.Empresa', on_delete=models.CASCADE, null=True, blank=True, related_name='marcas')
@@ -99,9 +101,12 @@ class Producto(models.Model):
         Genera automáticamente un SKU único por empresa si no existe.
         """
         if not self.sku:
-            prefix = f"SKU-{self.empresa.id if self.empresa else 'GEN'}"
-            last = Producto.objects.filter(empresa=self.empresa).order_by('id').last()
-            next_num = 1 if not last else last.id + 1
+            prefix = f"SKU-{self.empresa_id or 'GEN'}"
+            # Numerador propio de la empresa (tenants/secuencias.py); la primera vez
+            # sigue después de los SKU numerados con el id del producto
+            next_num = secuencias.siguiente(
+                self.empresa_id, 'sku', inicial=lambda: secuencias.siguiente_id(Producto, self.empresa_id)
+            )
             self.sku = f"{prefix}-{next_num:05d}"
         super().save(*args, **kwargs)
 
@@ -0,0 +1,140 @@
+# reportes/analitica.py
+"""
+Analítica de ventas: monto y unidades por día, semana o mes, abiertos
+opcionalmente por sucursal, subcategoría, marca o canal.
+
+Cada request es UNA consulta agrupada sobre resumen_diario (ver
+rollups.py) con TruncDay / TruncWeek / TruncMonth, y el resultado se
+guarda en el cache de Django (ANALITICA_CACHE_ALIAS) por empresa. Ese
+cache tiene que ser compartido entre workers (redis): con un LocMemCache
+la venta que invalida solo llega a un proceso, así que no se guarda nada
+y cada consulta se calcula (ver utils/cache.py).
+
+Invalidación por generación, como el caché de predicciones: cada empresa
+tiene un contador global y uno por mes. Una entrada guarda las
+generaciones de los meses que cubre su rango; una venta nueva solo cambia
+la del mes (hora de la tienda) en que cayó, así el dashboard que consulta
+cada pocos segundos sigue leyendo del caché los rangos que no tocó.
+
+Clave:  analitica:<empresa>:<periodo>:<por>:<desde>:<hasta>
+Valor:  (generaciones, filas)
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from utils.cache import cache_compartido
+
+from .models import ResumenDiario
+
+PERIODOS = {
+    'dia': TruncDay,
+    'semana': TruncWeek,   # semanas de lunes a domingo
+    'mes': TruncMonth,
+}
+# dimensión -> (campo id, campo nombre o None)
+DIMENSIONES = {
+    'sucursal': ('sucursal_id', 'sucursal__nombre'),
+    'subcategoria': ('producto__subcategoria_id', 'producto__subcategoria__nombre'),
+    'marca': ('producto__marca_id', 'producto__marca__nombre'),
+    'canal': ('canal', None),
+}
+
+
+# ---------------------------------------------------------------------
+# 🔹 Consulta
+# ---------------------------------------------------------------------
+def calcular(empresa_id, desde, hasta, periodo='dia', por=None):
+    """Filas {periodo, [id, nombre,] monto, cantidad} del rango [desde, hasta] (días incluidos)."""
+    campos = ['periodo']
+    if por:
+        campo_id, campo_nombre = DIMENSIONES[por]
+        campos += [campo_id] + ([campo_nombre] if campo_nombre else [])
+    filas = (
+        ResumenDiario.objects.filter(empresa_id=empresa_id, dia__gte=desde, dia__lte=hasta)
+        .annotate(periodo=PERIODOS[periodo]('dia'))
+        .values(*campos)
+        .annotate(monto=Sum('monto'), cantidad=Sum('cantidad'))
+        .order_by(*campos[:2])
+    )
+    resultado = []
+    for fila in filas:
+        item = {'periodo': fila['periodo'].isoformat()}
+        if por:
+            item['id'] = fila[campo_id] or None
+            item['nombre'] = fila[campo_nombre] if campo_nombre else item['id']
+        item['monto'] = fila['monto']
+        item['cantidad'] = fila['cantidad']
+        resultado.append(item)
+    return resultado
+
+
+# ---------------------------------------------------------------------
+# 🔹 Caché por empresa
+# ---------------------------------------------------------------------
+def _cache():
+    """El cache de la analítica, o None si no es compartido entre procesos."""
+    return cache_compartido(getattr(settings, 'ANALITICA_CACHE_ALIAS', 'default'), "analítica de ventas")
+
+
+def _clave_gen(empresa_id, mes=None):
+    return f'analitica:gen:{empresa_id}' + (f':{mes:%Y-%m}' if mes else '')
+
+
+def _meses(desde, hasta):
+    mes = desde.replace(day=1)
+    while mes <= hasta:
+        yield mes
+        mes = (mes.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _generaciones(cache, empresa_id, desde, hasta):
+    """Generación de la empresa y de cada mes del rango; las que faltan (eviction) se crean nuevas."""
+    claves = [_clave_gen(empresa_id)] + [_clave_gen(empresa_id, mes) for mes in _meses(desde, hasta)]
+    leidas = cache.get_many(claves)
+    nuevas = {clave: time.time_ns() for clave in claves if clave not in leidas}
+    if nuevas:
+        cache.set_many(nuevas, timeout=None)
+    return tuple(leidas.get(clave) or nuevas[clave] for clave in claves)
+
+
+def consultar(empresa_id, desde, hasta, periodo='dia', por=None):
+    """Como `calcular`, pero desde el caché si ninguna venta tocó esos meses desde que se guardó."""
+    cache = _cache()
+    if cache is None:
+        return calcular(empresa_id, desde, hasta, periodo, por)
+    clave = f'analitica:{empresa_id}:{periodo}:{por or "-"}:{desde}:{hasta}'
+    # Generaciones leídas ANTES de calcular: una venta que entra mientras
+    # tanto deja el resultado ya vencido, no marcado como nuevo
+    generaciones = _generaciones(cache, empresa_id, desde, hasta)
+    entrada = cache.get(clave)
+    if entrada is not None and entrada[0] == generaciones:
+        return entrada[1]
+    filas = calcular(empresa_id, desde, hasta, periodo, por)
+    cache.set(clave, (generaciones, filas), timeout=getattr(settings, 'ANALITICA_CACHE_TTL', 300))
+    return filas
+
+
+def invalidar(ventas):
+    """Vence lo guardado de los meses en que cayeron estas ventas (hora de la tienda)."""
+    cache = _cache()
+    claves = {_clave_gen(venta.empresa_id, timezone.localdate(venta.fecha).replace(day=1)) for venta in ventas}
+    if cache is not None and claves:
+        gen = time.time_ns()
+        cache.set_many({clave: gen for clave in claves}, timeout=None)
+
+
+def invalidar_empresa(empresa_id=None):
+    """Vence todo lo de la empresa (o de todas): resúmenes recalculados."""
+    from tenants.models import Empresa
+
+    cache = _cache()
+    if cache is None:
+        return
+    ids = [empresa_id] if empresa_id is not None else list(Empresa.objects.values_list('id', flat=True))
+    gen = time.time_ns()
+    cache.set_many({_clave_gen(i): gen for i in ids}, timeout=None)
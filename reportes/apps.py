@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class ReportesConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'reportes'
+
+    def ready(self):
+        # Los resúmenes se actualizan con cada venta confirmada (ver reportes/signals.py)
+        from . import signals  # noqa: F401
@@ -0,0 +1,25 @@
+# reportes/management/commands/rebuild_sales_rollups.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from reportes.rollups import reconstruir
+
+
+class Command(BaseCommand):
+    help = "📊 Recalcula los resúmenes de ventas diarios (sucursal × producto × canal) y mensuales por subcategoría."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--empresa',
+            type=int,
+            help='Recalcular solo esta empresa (por defecto, todas).',
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        diarios, mensuales = reconstruir(options.get('empresa'))
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Resúmenes recalculados: {diarios} filas diarias, {mensuales} mensuales "
+            f"({time.perf_counter() - inicio:.1f}s)."
+        ))
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('products', '0007_alter_categoria_nombre_alter_producto_sku_and_more'),
+        ('sucursales', '0006_departamento_empresa_alter_departamento_nombre_and_more'),
+        ('tenants', '0003_secuencia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('canal', models.CharField(blank=True, default='', max_length=10)),
+                ('cantidad', models.PositiveIntegerField(default=0)),
+                ('monto', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('lineas', models.PositiveIntegerField(default=0)),
+                ('empresa', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_diarios', to='tenants.empresa')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_diarios', to='products.producto')),
+                ('sucursal', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_diarios', to='sucursales.sucursal')),
+            ],
+            options={
+                'db_table': 'resumen_diario',
+                'indexes': [models.Index(fields=['empresa', 'dia'], name='resumen_diario_empresa_dia_idx')],
+                'constraints': [models.UniqueConstraint(fields=('dia', 'sucursal', 'producto', 'canal'), name='resumen_diario_unico'), models.UniqueConstraint(condition=models.Q(('sucursal__isnull', True)), fields=('dia', 'producto', 'canal'), name='resumen_diario_sin_sucursal_unico')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenMensualSubcategoria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField()),
+                ('cantidad', models.PositiveIntegerField(default=0)),
+                ('monto', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('empresa', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_mensuales_subcategoria', to='tenants.empresa')),
+                ('subcategoria', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_mensuales', to='products.subcategoria')),
+            ],
+            options={
+                'db_table': 'resumen_mensual_subcategoria',
+                'indexes': [models.Index(fields=['empresa', 'mes'], name='resumen_mes_empresa_mes_idx')],
+                'unique_together': {('subcategoria', 'mes')},
+            },
+        ),
+    ]
@@ -0,0 +1,67 @@
+# reportes/models.py
+from django.db import models
+
+
+# ---------------------------------------------------------------------
+# 🔹 Resúmenes de ventas para reportes y dashboards
+# (se actualizan con las señales de ventas, ver reportes/rollups.py)
+# ---------------------------------------------------------------------
+class ResumenDiario(models.Model):
+    """Ventas de un producto en un día (hora de Bolivia), sucursal y canal."""
+    empresa = models.ForeignKey(
+        'tenants.Empresa', on_delete=models.CASCADE, null=True, blank=True, related_name='resumenes_diarios'
+    )
+    dia = models.DateField()
+    sucursal = models.ForeignKey(
+        'sucursales.Sucursal', on_delete=models.CASCADE, null=True, blank=True, related_name='resumenes_diarios'
+    )
+    producto = models.ForeignKey('products.Producto', on_delete=models.CASCADE, related_name='resumenes_diarios')
+    canal = models.CharField(max_length=10, blank=True, default='')  # '' = venta sin canal
+    cantidad = models.PositiveIntegerField(default=0)
+    monto = models.DecimalField(max_digits=14, decimal_places=2, default=0)  # suma de subtotales
+    lineas = models.PositiveIntegerField(default=0)  # tickets que incluyeron el producto
+
+    class Meta:
+        db_table = 'resumen_diario'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dia', 'sucursal', 'producto', 'canal'],
+                name='resumen_diario_unico',
+            ),
+            # Ventas viejas sin sucursal: NULL no choca en la restricción de arriba
+            models.UniqueConstraint(
+                fields=['dia', 'producto', 'canal'],
+                condition=models.Q(sucursal__isnull=True),
+                name='resumen_diario_sin_sucursal_unico',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['empresa', 'dia'], name='resumen_diario_empresa_dia_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.dia} {self.sucursal_id}/{self.producto_id}/{self.canal or '-'}: {self.cantidad}"
+
+
+class ResumenMensualSubcategoria(models.Model):
+    """Ventas de una subcategoría en un mes (día 1, hora de Bolivia)."""
+    empresa = models.ForeignKey(
+        'tenants.Empresa', on_delete=models.CASCADE, null=True, blank=True,
+        related_name='resumenes_mensuales_subcategoria'
+    )
+    mes = models.DateField()
+    subcategoria = models.ForeignKey(
+        'products.SubCategoria', on_delete=models.CASCADE, related_name='resumenes_mensuales'
+    )
+    cantidad = models.PositiveIntegerField(default=0)
+    monto = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'resumen_mensual_subcategoria'
+        unique_together = ('subcategoria', 'mes')
+        indexes = [
+            models.Index(fields=['empresa', 'mes'], name='resumen_mes_empresa_mes_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subcategoria_id} - {self.mes:%Y-%m}: {self.cantidad}"
@@ -0,0 +1,162 @@
+# reportes/rollups.py
+"""
+Resúmenes de ventas ya agregados para los reportes.
+
+Los reportes (totales por sucursal, productos más vendidos, ventas por
+canal) sumaban detalle_venta × venta en cada request. Aquí se guardan
+ya agregados:
+
+    ResumenDiario               (día, sucursal, producto, canal) -> cantidad, monto, líneas
+    ResumenMensualSubcategoria  (subcategoría, mes)              -> cantidad, monto
+
+y un reporte de un año lee unos miles de filas en vez de millones de
+detalles. Días y meses se cortan en la hora de la tienda (TIME_ZONE), no
+en UTC: "las ventas de hoy" son las del día de la sucursal.
+
+Solo cuentan las ventas activas y no canceladas (`cuenta`). Se actualizan
+cuando se confirma una venta (señales `venta_registrada` y
+`ventas_registradas`) y cuando una venta guardada cambia de estado, se
+desactiva/reactiva o cambia de día, sucursal o canal (pre/post_save de
+Venta, ver reportes/signals.py): se descuenta como estaba y se suma como
+quedó. Ventas cargadas o cambiadas por otros caminos (seeds, importaciones,
+`QuerySet.update`): `manage.py rebuild_sales_rollups`.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Max, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate, TruncMonth
+from django.utils import timezone
+
+from utils.bulk import BATCH_SIZE, acumular, insertar_por_bloques
+from ventas.models import DetalleVenta
+
+from . import analitica
+from .models import ResumenDiario, ResumenMensualSubcategoria
+
+CLAVE_DIARIA = ('dia', 'sucursal_id', 'producto_id', 'canal')
+CLAVE_MENSUAL = ('mes', 'subcategoria_id')
+CANCELADA = 'cancelado'
+
+
+def cuenta(venta):
+    """Las ventas desactivadas o canceladas no entran en los resúmenes."""
+    return venta.esta_activo and venta.estado != CANCELADA
+
+
+def _dia(fecha):
+    return fecha.date() if hasattr(fecha, 'date') else fecha
+
+
+# ---------------------------------------------------------------------
+# 🔹 Escritura incremental
+# ---------------------------------------------------------------------
+def registrar_ventas(ventas):
+    """
+    Suma las ventas recién confirmadas (con sus detalles) a los resúmenes:
+    una consulta de detalles y las mismas escrituras con 1 o con 100 ventas.
+    """
+    _aplicar(ventas, 1)
+
+
+def descontar_ventas(ventas):
+    """
+    Resta las ventas (tal como estaban: fecha, sucursal, canal) de los
+    resúmenes; las filas que quedan sin líneas se borran, como si nunca
+    hubieran existido.
+    """
+    _aplicar(ventas, -1)
+
+
+def _aplicar(ventas, signo):
+    ventas = {v.id: v for v in ventas if cuenta(v)}
+    if not ventas:
+        return
+    por_producto = (
+        DetalleVenta.objects.filter(venta_id__in=list(ventas))
+        .values('venta_id', 'producto_id', 'producto__subcategoria_id')
+        .annotate(cantidad=Sum('cantidad'), monto=Sum('subtotal'))
+        .order_by()
+    )
+    diarios = defaultdict(lambda: {'cantidad': 0, 'monto': Decimal(0), 'lineas': 0})
+    mensuales = defaultdict(lambda: {'cantidad': 0, 'monto': Decimal(0)})
+    for fila in por_producto:
+        venta = ventas[fila['venta_id']]
+        dia = timezone.localdate(venta.fecha)
+        diario = diarios[venta.empresa_id, dia, venta.sucursal_id, fila['producto_id'], venta.canal or '']
+        diario['cantidad'] += signo * fila['cantidad']
+        diario['monto'] += signo * fila['monto']
+        diario['lineas'] += signo
+        if fila['producto__subcategoria_id']:
+            mensual = mensuales[venta.empresa_id, dia.replace(day=1), fila['producto__subcategoria_id']]
+            mensual['cantidad'] += signo * fila['cantidad']
+            mensual['monto'] += signo * fila['monto']
+
+    with transaction.atomic():
+        acumular(ResumenDiario, CLAVE_DIARIA, diarios)
+        acumular(ResumenMensualSubcategoria, CLAVE_MENSUAL, mensuales)
+        if signo < 0:
+            # Las cantidades nunca son 0 (ver ventas/services.py): sin cantidad, la fila ya no tiene ventas
+            empresas = {venta.empresa_id for venta in ventas.values()}
+            ResumenDiario.objects.filter(
+                empresa_id__in=empresas, dia__in={clave[1] for clave in diarios}, cantidad__lte=0,
+            ).delete()
+            ResumenMensualSubcategoria.objects.filter(
+                empresa_id__in=empresas, mes__in={clave[1] for clave in mensuales}, cantidad__lte=0,
+            ).delete()
+
+
+# ---------------------------------------------------------------------
+# 🔹 Reconstrucción completa
+# ---------------------------------------------------------------------
+def reconstruir(empresa_id=None):
+    """
+    Recalcula los resúmenes desde detalle_venta (todo, o una empresa) y
+    vence la analítica guardada. Devuelve (filas_diarias, filas_mensuales).
+    """
+    zona = timezone.get_current_timezone()
+    # Las mismas ventas que suma `registrar_ventas` (ver `cuenta`)
+    detalles = DetalleVenta.objects.filter(venta__esta_activo=True).exclude(venta__estado=CANCELADA).order_by()
+    diarios = ResumenDiario.objects.all()
+    mensuales = ResumenMensualSubcategoria.objects.all()
+    if empresa_id is not None:
+        detalles = detalles.filter(venta__empresa_id=empresa_id)
+        diarios = diarios.filter(empresa_id=empresa_id)
+        mensuales = mensuales.filter(empresa_id=empresa_id)
+
+    por_dia = (
+        detalles.annotate(dia=TruncDate('venta__fecha', tzinfo=zona), canal=Coalesce('venta__canal', Value('')))
+        .values('dia', 'venta__sucursal_id', 'producto_id', 'canal')
+        .annotate(
+            total=Sum('cantidad'), monto=Sum('subtotal'), lineas=Count('id'), empresa_id=Max('venta__empresa_id'),
+        )
+    )
+    por_mes = (
+        detalles.filter(producto__subcategoria__isnull=False)
+        .annotate(mes=TruncMonth('venta__fecha', tzinfo=zona))
+        .values('producto__subcategoria_id', 'mes')
+        .annotate(total=Sum('cantidad'), monto=Sum('subtotal'), empresa_id=Max('venta__empresa_id'))
+    )
+
+    with transaction.atomic():
+        diarios.delete()
+        mensuales.delete()
+        insertar_por_bloques(ResumenDiario, (
+            ResumenDiario(
+                empresa_id=f['empresa_id'], dia=_dia(f['dia']), sucursal_id=f['venta__sucursal_id'],
+                producto_id=f['producto_id'], canal=f['canal'],
+                cantidad=f['total'], monto=f['monto'], lineas=f['lineas'],
+            )
+            for f in por_dia.iterator(chunk_size=BATCH_SIZE)
+        ))
+        insertar_por_bloques(ResumenMensualSubcategoria, (
+            ResumenMensualSubcategoria(
+                empresa_id=f['empresa_id'], subcategoria_id=f['producto__subcategoria_id'],
+                mes=_dia(timezone.localtime(f['mes'], zona)) if timezone.is_aware(f['mes']) else _dia(f['mes']),
+                cantidad=f['total'], monto=f['monto'],
+            )
+            for f in por_mes.iterator(chunk_size=BATCH_SIZE)
+        ))
+    analitica.invalidar_empresa(empresa_id)
+    return diarios.count(), mensuales.count()
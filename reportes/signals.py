@@ -0,0 +1,62 @@
+# reportes/signals.py
+from django.db import transaction
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+
+from ventas.models import Venta
+from ventas.signals import venta_registrada, ventas_registradas
+
+from . import analitica
+from .rollups import descontar_ventas, registrar_ventas
+
+# Lo que decide si una venta cuenta y en qué fila de los resúmenes cae
+CAMPOS_RESUMEN = ('empresa_id', 'fecha', 'sucursal_id', 'canal', 'estado', 'esta_activo')
+_NOMBRES = {campo.removesuffix('_id') for campo in CAMPOS_RESUMEN} | set(CAMPOS_RESUMEN)
+
+
+@receiver(venta_registrada)
+def actualizar_resumenes(sender, venta, **kwargs):
+    """Suma la venta recién confirmada a los resúmenes y vence la analítica de su mes."""
+    registrar_ventas([venta])
+    analitica.invalidar([venta])
+
+
+@receiver(ventas_registradas)
+def actualizar_resumenes_lote(sender, ventas, **kwargs):
+    """Lo mismo para un lote de ventas sincronizadas de una vez."""
+    registrar_ventas(ventas)
+    analitica.invalidar(ventas)
+
+
+@receiver(pre_save, sender=Venta)
+def recordar_venta_guardada(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Cómo estaba la venta en la BD antes de guardarla (solo si ya existía)."""
+    instance._resumen_anterior = None
+    if raw or instance.pk is None:
+        return
+    if update_fields is not None and not _NOMBRES & set(update_fields):
+        return
+    instance._resumen_anterior = Venta.objects.filter(pk=instance.pk).values(*CAMPOS_RESUMEN).first()
+
+
+@receiver(post_save, sender=Venta)
+def corregir_resumenes(sender, instance, created, **kwargs):
+    """
+    Venta desactivada/reactivada, cancelada o movida de día, sucursal o
+    canal: al confirmar se descuenta como estaba, se suma como quedó y se
+    vence la analítica de los dos meses.
+    """
+    anterior, instance._resumen_anterior = getattr(instance, '_resumen_anterior', None), None
+    if created or anterior is None:
+        return
+    actual = {campo: getattr(instance, campo) for campo in CAMPOS_RESUMEN}
+    if actual == anterior:
+        return
+    antes, despues = Venta(pk=instance.pk, **anterior), Venta(pk=instance.pk, **actual)
+
+    def aplicar():
+        descontar_ventas([antes])
+        registrar_ventas([despues])
+        analitica.invalidar([antes, despues])
+
+    transaction.on_commit(aplicar)
@@ -0,0 +1,241 @@
+import shutil
+import tempfile
+from datetime import date, datetime
+from decimal import Decimal
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
+from zoneinfo import ZoneInfo
+
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from products.models import Categoria, Producto, SubCategoria
+from sucursales.models import StockSucursal, Sucursal
+from tenants.models import Empresa
+from users.models import Module, Permission, Role, User
+from ventas import services
+from ventas.models import Venta
+from ventas.views import VentaViewSet
+
+from . import analitica, views
+from .models import ResumenDiario, ResumenMensualSubcategoria
+
+LA_PAZ = ZoneInfo("America/La_Paz")
+
+
+class DatosDeReportes(TestCase):
+    """Dos empresas con sucursales, productos (con y sin subcategoría) y stock."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tiendas = []
+        for nit in ("100", "200"):
+            empresa = Empresa.objects.create(nombre=f"Tienda {nit}", nit=nit)
+            rol = Role.objects.create(name="ADMIN", empresa=empresa)
+            categoria = Categoria.objects.create(nombre="Electro", empresa=empresa)
+            subcategoria = SubCategoria.objects.create(nombre="Licuadoras", categoria=categoria, empresa=empresa)
+            tienda = SimpleNamespace(
+                empresa=empresa,
+                id=empresa.id,
+                usuario=User.objects.create_user(f"admin@{nit}.com", "x", empresa=empresa, role=rol),
+                sucursales=[Sucursal.objects.create(nombre=f"Sucursal {i}", empresa=empresa) for i in range(2)],
+                # El primero sin subcategoría: no entra en el resumen mensual
+                productos=[
+                    Producto.objects.create(
+                        nombre=f"Producto {i}", precio_venta=Decimal("12.50"), empresa=empresa,
+                        subcategoria=subcategoria if i else None,
+                    )
+                    for i in range(3)
+                ],
+            )
+            for sucursal in tienda.sucursales:
+                for producto in tienda.productos:
+                    StockSucursal.objects.create(empresa=empresa, producto=producto, sucursal=sucursal, stock=100)
+            cls.tiendas.append(tienda)
+
+    def _resumenes(self):
+        return (
+            sorted(ResumenDiario.objects.values_list(
+                "empresa_id", "dia", "sucursal_id", "producto_id", "canal", "cantidad", "monto", "lineas",
+            )),
+            sorted(ResumenMensualSubcategoria.objects.values_list(
+                "empresa_id", "subcategoria_id", "mes", "cantidad", "monto",
+            )),
+        )
+
+    def _registrar(self, tienda, sucursal, fecha, canal, *cantidades):
+        detalles = [
+            {"producto": producto.pk, "cantidad": cantidad}
+            for producto, cantidad in zip(tienda.productos, cantidades) if cantidad
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            services.registrar_venta(tienda.empresa, tienda.usuario, sucursal, detalles, canal=canal, fecha=fecha)
+
+
+# ---------------------------------------------------------------------
+# 🔹 Resúmenes incrementales (señales) == rebuild_sales_rollups
+# ---------------------------------------------------------------------
+class ResumenesIncrementalesTests(DatosDeReportes):
+
+    def test_incremental_igual_a_reconstruir(self):
+        uno, dos = self.tiendas
+        # 23:30 en La Paz ya es otro día (y otro mes) en UTC
+        fin_de_mes = datetime(2025, 3, 31, 23, 30, tzinfo=LA_PAZ)
+        self._registrar(uno, uno.sucursales[0], fin_de_mes, "POS", 1, 2, 3)
+        self._registrar(uno, uno.sucursales[0], fin_de_mes.replace(hour=10), "POS", 0, 1)
+        self._registrar(uno, uno.sucursales[1], fin_de_mes, "WEB", 2, 0, 1)
+        self._registrar(uno, uno.sucursales[0], datetime(2025, 4, 1, 0, 15, tzinfo=LA_PAZ), "POS", 1, 1, 1)
+        self._registrar(dos, dos.sucursales[0], fin_de_mes, "POS", 4, 4)
+
+        # Un lote sincronizado por el POS entra por la otra señal
+        with self.captureOnCommitCallbacks(execute=True):
+            resultados = services.sincronizar_ventas(uno.empresa, uno.usuario, [
+                {
+                    "clave": f"pos-{i}", "sucursal": uno.sucursales[1].pk, "fecha": fecha,
+                    "detalles": [{"producto": uno.productos[i % 3].pk, "cantidad": i + 1}],
+                }
+                for i, fecha in enumerate(["2025-03-31T22:00:00-04:00", "2025-03-31T23:59:00-04:00",
+                                           "2025-04-01T00:01:00-04:00", "2025-03-31T23:00:00-04:00"])
+            ])
+        self.assertEqual({r["estado"] for r in resultados}, {services.CREADA})
+
+        incremental = self._resumenes()
+        self.assertTrue(incremental[0] and incremental[1])
+        self.assertIn(
+            (uno.id, date(2025, 3, 31), uno.sucursales[0].id, uno.productos[1].id, "POS", 3,
+             Decimal("37.50"), 2),
+            incremental[0],
+        )
+
+        call_command("rebuild_sales_rollups", stdout=StringIO())
+        self.assertEqual(self._resumenes(), incremental)
+
+        # También reconstruyendo una sola empresa
+        call_command("rebuild_sales_rollups", empresa=dos.id, stdout=StringIO())
+        self.assertEqual(self._resumenes(), incremental)
+
+
+    def test_desactivar_cancelar_y_mover_ventas_descuenta(self):
+        uno, dos = self.tiendas
+        marzo = datetime(2025, 3, 10, 12, tzinfo=LA_PAZ)
+        for dia in (10, 11, 12, 13):
+            self._registrar(uno, uno.sucursales[0], marzo.replace(day=dia), "POS", 1, 2, 3)
+        self._registrar(dos, dos.sucursales[0], marzo, "POS", 4, 4)
+        desactivada, cancelada, movida, intacta = Venta.objects.filter(empresa=uno.empresa).order_by("fecha")
+
+        # Desactivar desde la API (SoftDeleteViewSet.desactivar)
+        request = APIRequestFactory().post("/")
+        force_authenticate(request, user=uno.usuario)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = VentaViewSet.as_view({"post": "desactivar"})(request, pk=desactivada.pk)
+        self.assertEqual(response.status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cancelada.estado = "cancelado"
+            cancelada.save()
+            movida.fecha = datetime(2025, 4, 2, 9, tzinfo=LA_PAZ)
+            movida.canal = "WEB"
+            movida.save(update_fields=["fecha", "canal"])
+        self.assertNotIn((uno.id, date(2025, 3, 10)), {fila[:2] for fila in self._resumenes()[0]})
+
+        incremental = self._resumenes()
+        call_command("rebuild_sales_rollups", stdout=StringIO())
+        self.assertEqual(self._resumenes(), incremental)
+
+        # Reactivar la vuelve a sumar; guardar sin cambios no toca nada
+        with self.captureOnCommitCallbacks(execute=True):
+            desactivada.refresh_from_db()
+            desactivada.esta_activo = True
+            desactivada.save()
+            intacta.save()
+        self.assertIn((uno.id, date(2025, 3, 10)), {fila[:2] for fila in self._resumenes()[0]})
+        incremental = self._resumenes()
+        call_command("rebuild_sales_rollups", stdout=StringIO())
+        self.assertEqual(self._resumenes(), incremental)
+
+    def test_venta_cancelada_al_sincronizar_no_suma(self):
+        uno = self.tiendas[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            services.sincronizar_ventas(uno.empresa, uno.usuario, [{
+                "clave": "pos-1", "sucursal": uno.sucursales[0].pk, "estado": "cancelado",
+                "detalles": [{"producto": uno.productos[1].pk, "cantidad": 1}],
+            }])
+        self.assertEqual(self._resumenes(), ([], []))
+
+
+# ---------------------------------------------------------------------
+# 🔹 Caché de la analítica: solo con un cache compartido
+# ---------------------------------------------------------------------
+class AnaliticaCacheTests(DatosDeReportes):
+    MARZO = (date(2025, 3, 1), date(2025, 3, 31))
+
+    def setUp(self):
+        self.tienda = self.tiendas[0]
+        self._registrar(self.tienda, self.tienda.sucursales[0], datetime(2025, 3, 10, 12, tzinfo=LA_PAZ), "POS", 1)
+
+    def _consultar(self):
+        with mock.patch.object(analitica, "calcular", wraps=analitica.calcular) as calcular:
+            filas = analitica.consultar(self.tienda.id, *self.MARZO, periodo="mes")
+        return filas, calcular.call_count
+
+    def test_cache_compartido_guarda_y_vence_por_mes(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio)
+        cache = {"default": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": directorio}}
+        with self.settings(CACHES=cache):
+            self.assertEqual(self._consultar(), ([{"periodo": "2025-03-01", "monto": Decimal("12.50"), "cantidad": 1}], 1))
+            self.assertEqual(self._consultar()[1], 0)
+
+            # Una venta de abril no vence el rango de marzo
+            self._registrar(self.tienda, self.tienda.sucursales[0], datetime(2025, 4, 2, 12, tzinfo=LA_PAZ), "POS", 1)
+            self.assertEqual(self._consultar()[1], 0)
+
+            self._registrar(self.tienda, self.tienda.sucursales[1], datetime(2025, 3, 20, 12, tzinfo=LA_PAZ), "WEB", 2)
+            filas, calculos = self._consultar()
+            self.assertEqual((filas[0]["cantidad"], calculos), (3, 1))
+
+            # Cancelar una venta de marzo vence marzo y la descuenta
+            venta = Venta.objects.get(empresa=self.tienda.empresa, canal="WEB")
+            venta.estado = "cancelado"
+            with self.captureOnCommitCallbacks(execute=True):
+                venta.save()
+            filas, calculos = self._consultar()
+            self.assertEqual((filas[0]["cantidad"], calculos), (1, 1))
+
+            # Resúmenes recalculados: se vence todo lo de la empresa
+            call_command("rebuild_sales_rollups", empresa=self.tienda.id, stdout=StringIO())
+            self.assertEqual(self._consultar()[1], 1)
+
+    def test_cache_por_proceso_no_guarda_nada(self):
+        with self.settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}):
+            self.assertIsNone(analitica._cache())
+            self.assertEqual(self._consultar()[1], 1)
+            self.assertEqual(self._consultar()[1], 1)
+            self._registrar(self.tienda, self.tienda.sucursales[0], datetime(2025, 3, 20, 12, tzinfo=LA_PAZ), "POS", 1)
+            self.assertEqual(self._consultar()[0][0]["cantidad"], 2)
+            # Ni resultados ni generaciones en el LocMemCache
+            self.assertIsNone(caches["default"].get(analitica._clave_gen(self.tienda.id, date(2025, 3, 1))))
+
+
+# ---------------------------------------------------------------------
+# 🔹 Permisos: módulo "Reporte"
+# ---------------------------------------------------------------------
+class ReportesPermisosTests(DatosDeReportes):
+
+    def _get(self, usuario):
+        request = APIRequestFactory().get("/", {"desde": "2025-03-01", "hasta": "2025-03-31"})
+        force_authenticate(request, user=usuario)
+        return views.TotalesPorSucursalView.as_view()(request)
+
+    def test_rol_sin_permiso_no_ve_reportes(self):
+        tienda = self.tiendas[0]
+        rol = Role.objects.create(name="CAJERO", empresa=tienda.empresa)
+        cajero = User.objects.create_user("caja@100.com", "x", empresa=tienda.empresa, role=rol)
+        self.assertEqual(self._get(cajero).status_code, 403)
+
+        Permission.objects.create(role=rol, module=Module.objects.create(name="Reporte"), can_view=True)
+        self.assertEqual(self._get(cajero).status_code, 200)
+        self.assertEqual(self._get(tienda.usuario).status_code, 200)
@@ -0,0 +1,15 @@
+# reportes/urls.py
+from django.urls import path
+
+from . import views
+
+urlpatterns = [
+    # (Ej: /api/reportes/sucursales/?desde=2025-01-01&hasta=2025-01-31)
+    path('sucursales/', views.TotalesPorSucursalView.as_view(), name='reporte_sucursales'),
+    # (Ej: /api/reportes/top-productos/?limite=5&orden=cantidad)
+    path('top-productos/', views.TopProductosView.as_view(), name='reporte_top_productos'),
+    path('canales/', views.MixCanalesView.as_view(), name='reporte_canales'),
+    path('subcategorias/', views.SubcategoriasMensualView.as_view(), name='reporte_subcategorias'),
+    # (Ej: /api/reportes/analitica/?periodo=semana&por=marca&desde=2025-01-01&hasta=2025-03-31)
+    path('analitica/', views.AnaliticaVentasView.as_view(), name='reporte_analitica'),
+]
@@ -0,0 +1,213 @@
+# reportes/views.py
+from datetime import timedelta
+
+from django.db.models import Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from utils.permissions import ModulePermission
+
+from . import analitica
+from .models import ResumenDiario, ResumenMensualSubcategoria
+
+
+class _ReporteView(APIView):
+    """
+    Base de los reportes: leen solo las tablas de resúmenes (reportes/rollups.py),
+    nunca detalle_venta.
+
+    Query params comunes:
+      - desde, hasta: fechas AAAA-MM-DD, ambas incluidas
+      - empresa: solo SUPER_ADMIN (default: la del usuario)
+    """
+    permission_classes = [ModulePermission]
+    module_name = "Reporte"
+    modelo = ResumenDiario
+    campo_fecha = 'dia'
+
+    def get(self, request, *args, **kwargs):
+        empresa_id, desde, hasta, error = self.parametros(request)
+        if error is not None:
+            return error
+        if self.campo_fecha == 'mes':
+            # Meses completos: el resumen mensual se guarda en el día 1
+            desde = desde.replace(day=1)
+        resumenes = self.modelo.objects.filter(**{
+            'empresa_id': empresa_id,
+            f'{self.campo_fecha}__gte': desde,
+            f'{self.campo_fecha}__lte': hasta,
+        })
+        return self.reporte(resumenes, request.query_params)
+
+    def parametros(self, request):
+        """(empresa_id, desde, hasta, None) o (None, None, None, Response de error)."""
+        params = request.query_params
+        desde, hasta = parse_date(params.get('desde') or '1900-01-01'), parse_date(params.get('hasta') or '9999-12-31')
+        if desde is None or hasta is None:
+            return None, None, None, Response({"detail": "'desde' y 'hasta' deben tener el formato AAAA-MM-DD."},
+                                              status=status.HTTP_400_BAD_REQUEST)
+
+        user = request.user
+        if user.is_superuser or getattr(user.role, "name", "") == "SUPER_ADMIN":
+            empresa_id = params.get('empresa') or getattr(user, 'empresa_id', None)
+        else:
+            empresa_id = getattr(user, 'empresa_id', None)
+        if not empresa_id:
+            return None, None, None, Response({"detail": "Empresa no encontrada."}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            empresa_id = int(empresa_id)
+        except (TypeError, ValueError):
+            return None, None, None, Response({"detail": "'empresa' debe ser un número entero."},
+                                              status=status.HTTP_400_BAD_REQUEST)
+        return empresa_id, desde, hasta, None
+
+    def reporte(self, resumenes, params):
+        raise NotImplementedError
+
+
+# ===================================================================
+# --- Totales por sucursal
+# ===================================================================
+class TotalesPorSucursalView(_ReporteView):
+    def reporte(self, resumenes, params):
+        filas = (
+            resumenes.values('sucursal_id', 'sucursal__nombre')
+            .annotate(cantidad=Sum('cantidad'), monto=Sum('monto'))
+            .order_by('-monto')
+        )
+        return Response([
+            {
+                "sucursal_id": fila['sucursal_id'],
+                "sucursal": fila['sucursal__nombre'] or "Sin sucursal",
+                "cantidad": fila['cantidad'],
+                "monto": fila['monto'],
+            }
+            for fila in filas
+        ])
+
+
+# ===================================================================
+# --- Productos más vendidos
+# ===================================================================
+class TopProductosView(_ReporteView):
+    """Extra: ?limite=N (default 10, máximo 100) y ?orden=monto|cantidad."""
+    LIMITE = 10
+    LIMITE_MAXIMO = 100
+
+    def reporte(self, resumenes, params):
+        try:
+            limite = min(int(params.get('limite', self.LIMITE)), self.LIMITE_MAXIMO)
+        except ValueError:
+            return Response({"detail": "'limite' debe ser un número entero."}, status=status.HTTP_400_BAD_REQUEST)
+        orden = params.get('orden', 'monto')
+        if orden not in ('monto', 'cantidad'):
+            return Response({"detail": "'orden' debe ser 'monto' o 'cantidad'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        filas = (
+            resumenes.values('producto_id', 'producto__nombre', 'producto__sku')
+            .annotate(cantidad=Sum('cantidad'), monto=Sum('monto'), lineas=Sum('lineas'))
+            .order_by(f'-{orden}', 'producto_id')[:max(limite, 0)]
+        )
+        return Response([
+            {
+                "producto_id": fila['producto_id'],
+                "producto": fila['producto__nombre'],
+                "sku": fila['producto__sku'],
+                "cantidad": fila['cantidad'],
+                "monto": fila['monto'],
+                "ventas": fila['lineas'],
+            }
+            for fila in filas
+        ])
+
+
+# ===================================================================
+# --- Ventas por canal (POS / WEB)
+# ===================================================================
+class MixCanalesView(_ReporteView):
+    def reporte(self, resumenes, params):
+        filas = list(
+            resumenes.values('canal').annotate(cantidad=Sum('cantidad'), monto=Sum('monto')).order_by('canal')
+        )
+        total = sum(fila['monto'] for fila in filas)
+        return Response([
+            {
+                "canal": fila['canal'] or None,
+                "cantidad": fila['cantidad'],
+                "monto": fila['monto'],
+                "porcentaje": round(float(fila['monto'] / total * 100), 2) if total else 0.0,
+            }
+            for fila in filas
+        ])
+
+
+# ===================================================================
+# --- Ventas mensuales por subcategoría
+# ===================================================================
+class SubcategoriasMensualView(_ReporteView):
+    modelo = ResumenMensualSubcategoria
+    campo_fecha = 'mes'
+
+    def reporte(self, resumenes, params):
+        filas = resumenes.values(
+            'mes', 'subcategoria_id', 'subcategoria__nombre', 'cantidad', 'monto'
+        ).order_by('mes', 'subcategoria_id')
+        return Response([
+            {
+                "mes": f"{fila['mes']:%Y-%m}",
+                "subcategoria_id": fila['subcategoria_id'],
+                "subcategoria": fila['subcategoria__nombre'],
+                "cantidad": fila['cantidad'],
+                "monto": fila['monto'],
+            }
+            for fila in filas
+        ])
+
+
+# ===================================================================
+# --- Analítica: monto y unidades por día / semana / mes
+# ===================================================================
+class AnaliticaVentasView(_ReporteView):
+    """
+    Una consulta agrupada sobre los resúmenes diarios, cacheada por empresa
+    hasta que entra una venta en alguno de los meses del rango
+    (ver reportes/analitica.py).
+
+    Query params, además de desde/hasta/empresa:
+      - periodo: dia (default), semana o mes
+      - por: sucursal, subcategoria, marca o canal (opcional)
+    Sin desde/hasta: los últimos DIAS_POR_DEFECTO días. Rango máximo: MAX_DIAS.
+    """
+    DIAS_POR_DEFECTO = 30
+    MAX_DIAS = 3 * 366
+
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        periodo, por = params.get('periodo', 'dia'), params.get('por') or None
+        if periodo not in analitica.PERIODOS:
+            return Response({"detail": "'periodo' debe ser 'dia', 'semana' o 'mes'."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if por is not None and por not in analitica.DIMENSIONES:
+            return Response({"detail": "'por' debe ser 'sucursal', 'subcategoria', 'marca' o 'canal'."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        empresa_id, desde, hasta, error = self.parametros(request)
+        if error is not None:
+            return error
+        if not params.get('hasta'):
+            hasta = timezone.localdate()
+        if not params.get('desde'):
+            desde = hasta - timedelta(days=self.DIAS_POR_DEFECTO - 1)
+        if desde > hasta or (hasta - desde).days >= self.MAX_DIAS:
+            return Response({"detail": f"El rango debe ir de 'desde' a 'hasta' y tener hasta {self.MAX_DIAS} días."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            "periodo": periodo,
+            "por": por,
+            "desde": desde,
+            "hasta": hasta,
+            "resultados": analitica.consultar(empresa_id, desde, hasta, periodo, por),
+        })
@@ -45,6 +45,8 @@ class EnvioSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Envio
+        # direccion_detalle usa str(direccion), que lee departamento y su empresa
+        select_related = ["empresa", "venta", "cliente", "agencia", "direccion_entrega__departamento__empresa"]
         fields = [
             "id",
             "empresa",
@@ -52,7 +52,10 @@ INSTALLED_APPS = [
     "cart",
     "notifications",
     "bitacora",
+    "idempotencia",
     "tenants",
+    "predictions",
+    "reportes",
     #'sales',
     #'reports',
     #'ai',
@@ -176,4 +179,73 @@ SWAGGER_SETTINGS = {
     },
 }
 
-STRIPE_SECRET_KEY = config('STRIPE_SECRET_KEY')
\ No newline at end of file
+STRIPE_SECRET_KEY = config('STRIPE_SECRET_KEY')
+
+# MODELOS ML (predictions)
+# Se cargan de forma perezosa en el primer request (predictions/registry.py)
+# y se publican versionados en ML_MODELS_DIR/<nombre>/<version>/.
+ML_MODELS_DIR = BASE_DIR / "ml_models"
+ML_MODELS_MMAP_MODE = config("ML_MODELS_MMAP_MODE", default="r")
+ML_PRELOAD_MODELS = config("ML_PRELOAD_MODELS", default=False, cast=bool)
+# Cada cuántos segundos se revisa si se publicó otra versión de un modelo
+ML_MODELS_POLL_SECONDS = config("ML_MODELS_POLL_SECONDS", default=5, cast=int)
+# Modelos dedicados por empresa (ml_models/empresas/<id>/) que se mantienen en
+# memoria a la vez por proceso; el menos usado se descarta (LRU).
+ML_MAX_TENANT_MODELS = config("ML_MAX_TENANT_MODELS", default=32, cast=int)
+# Cache compartido entre workers (redis). Las cachés que se invalidan por
+# generación (predicciones, analítica) lo necesitan: sin REDIS_URL queda un
+# LocMemCache por proceso y esas cachés se desactivan (utils/cache.py).
+REDIS_URL = config("REDIS_URL", default="")
+if REDIS_URL:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": REDIS_URL}}
+else:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+# Caché de predicciones (predictions/cache.py): "django" usa CACHES[ML_PREDICTION_CACHE_ALIAS]
+# (compartido), "local" un diccionario en memoria por proceso (un solo worker), "none" la desactiva.
+ML_PREDICTION_CACHE = config("ML_PREDICTION_CACHE", default="django")
+ML_PREDICTION_CACHE_ALIAS = config("ML_PREDICTION_CACHE_ALIAS", default="default")
+ML_PREDICTION_CACHE_TTL = config("ML_PREDICTION_CACHE_TTL", default=3600, cast=int)
+ML_PREDICTION_CACHE_MAX_ENTRIES = config("ML_PREDICTION_CACHE_MAX_ENTRIES", default=10000, cast=int)
+# Entrenamientos pedidos por API (predictions/jobs.py, `manage.py run_training_worker`):
+# cuántos corren a la vez, cada cuánto se revisa la cola y las filas mínimas
+# para que una empresa tenga modelo propio.
+ML_TRAINING_MAX_CONCURRENT = config("ML_TRAINING_MAX_CONCURRENT", default=2, cast=int)
+ML_TRAINING_POLL_SECONDS = config("ML_TRAINING_POLL_SECONDS", default=5, cast=int)
+ML_TRAINING_MIN_FILAS = config("ML_TRAINING_MIN_FILAS", default=1000, cast=int)
+# train_models --incremental: cuántos ids hacia atrás de la marca se vuelven a mirar
+# para sumar detalles cuya transacción hizo commit después de leer (predictions/incremental.py).
+ML_INCREMENTAL_VENTANA_IDS = config("ML_INCREMENTAL_VENTANA_IDS", default=50000, cast=int)
+
+# NUMERACIÓN POR EMPRESA (tenants/secuencias.py: numero_nota, sku)
+# Números que cada proceso reserva de una vez; 1 = sin bloques (sin huecos
+# al reiniciar, pero una escritura en la tabla por cada venta).
+SECUENCIA_BLOQUE = config("SECUENCIA_BLOQUE", default=20, cast=int)
+
+# SINCRONIZACIÓN DEL POS SIN CONEXIÓN (POST /api/ventas/sincronizar/)
+# Ventas por transacción y máximo de ventas por request
+VENTAS_SYNC_LOTE = config("VENTAS_SYNC_LOTE", default=100, cast=int)
+VENTAS_SYNC_MAX = config("VENTAS_SYNC_MAX", default=1000, cast=int)
+
+# TIEMPO MÁXIMO DE UN REQUEST: el --timeout de gunicorn (o del servidor que
+# se use) con el que se despliega; al pasarlo el worker se corta. Tiene que
+# cubrir la llamada más lenta a un servicio externo (Stripe reintenta hasta 80 s).
+REQUEST_TIMEOUT_SEGUNDOS = config("REQUEST_TIMEOUT_SEGUNDOS", default=120, cast=int)
+
+# IDEMPOTENCY-KEY (utils/idempotency.py): horas que se guarda la respuesta de
+# cada clave. Una solicitud 'en_curso' se da por perdida recién cuando ya no
+# puede seguir corriendo: REQUEST_TIMEOUT_SEGUNDOS + IDEMPOTENCY_MARGEN_SEGUNDOS.
+# Las vencidas se borran con `manage.py purge_idempotency_keys` (cron).
+IDEMPOTENCY_TTL_HORAS = config("IDEMPOTENCY_TTL_HORAS", default=24, cast=int)
+IDEMPOTENCY_MARGEN_SEGUNDOS = config("IDEMPOTENCY_MARGEN_SEGUNDOS", default=30, cast=int)
+
+# PAGINACIÓN POR CURSOR (utils/pagination.py): ventas, detalles de venta, bitácora
+API_PAGE_SIZE = config("API_PAGE_SIZE", default=50, cast=int)
+API_MAX_PAGE_SIZE = config("API_MAX_PAGE_SIZE", default=500, cast=int)
+
+# ANALÍTICA DE VENTAS (GET /api/reportes/analitica/, reportes/analitica.py):
+# cache donde se guardan los resultados por empresa y segundos que viven
+# (además se vencen solos cuando entra una venta en el mes consultado).
+# Tiene que ser un cache compartido (ver REDIS_URL): con LocMemCache la
+# analítica se calcula en cada request, sin caché.
+ANALITICA_CACHE_ALIAS = config("ANALITICA_CACHE_ALIAS", default="default")
+ANALITICA_CACHE_TTL = config("ANALITICA_CACHE_TTL", default=300, cast=int)
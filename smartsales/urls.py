@@ -56,6 +56,7 @@ urlpatterns = [
     path("api/", include('cart.urls')),
     path("api/", include('notifications.urls')),
     path("api/predict/", include('predictions.urls')),
+    path("api/reportes/", include('reportes.urls')),
     # swagger / redoc
     path(r'swagger(<format>\.json|\.yaml)', schema_view.without_ui(cache_timeout=0), name='schema-json'),
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
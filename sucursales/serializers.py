@@ -71,6 +71,7 @@ class StockSucursalSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = StockSucursal
+        select_related = ["producto", "sucursal", "empresa"]
         fields = [
             "id",
             "producto",
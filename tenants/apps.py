@@ -5,3 +5,7 @@ from django.apps import AppConfig
 class TenantsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tenants'
+
+    def ready(self):
+        # Cierre de la conexión propia de los numeradores (ver tenants/signals.py)
+        from . import signals  # noqa: F401
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0002_plan_alter_empresa_plan'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Secuencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=100, unique=True)),
+                ('empresa_id', models.BigIntegerField(blank=True, null=True)),
+                ('nombre', models.CharField(max_length=50)),
+                ('valor', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Secuencia',
+                'verbose_name_plural': 'Secuencias',
+                'db_table': 'secuencia',
+            },
+        ),
+    ]
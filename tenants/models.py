@@ -40,3 +40,25 @@ class Plan(models.Model):
     def __str__(self):
         return f"{self.nombre} (${self.precio_mensual}/mes)" 
     
+
+
+class Secuencia(models.Model):
+    """
+    Último número entregado de un numerador por empresa (numero_nota,
+    sku, ...). Se reserva por bloques, ver tenants/secuencias.py.
+    """
+    # "<empresa_id o global>:<nombre>": única también para los numeradores sin empresa
+    clave = models.CharField(max_length=100, unique=True)
+    # Sin FK a propósito: el bloque se reserva desde otra conexión, que todavía
+    # no ve una empresa recién creada en una transacción sin confirmar
+    empresa_id = models.BigIntegerField(null=True, blank=True)
+    nombre = models.CharField(max_length=50)
+    valor = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'secuencia'
+        verbose_name = 'Secuencia'
+        verbose_name_plural = 'Secuencias'
+
+    def __str__(self):
+        return f"{self.clave} = {self.valor}"
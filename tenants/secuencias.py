@@ -0,0 +1,193 @@
+# tenants/secuencias.py
+"""
+Numeradores por empresa (numero_nota de las ventas, sku de los productos).
+
+Antes cada insert buscaba `...order_by('id').last()` y sumaba 1 a su id:
+una consulta extra por venta, números que saltaban con las ventas de las
+otras empresas y, con varias cajas a la vez, dos ventas con el mismo
+número (violación de la restricción única).
+
+Cada (empresa, nombre) tiene una fila en `secuencia` con el último número
+reservado. `siguiente` reserva SECUENCIA_BLOQUE números de una vez
+(UPDATE valor = valor + n ... RETURNING) y los entrega desde memoria: la
+tabla se toca una vez cada n ventas y las cajas no se esperan entre sí.
+Los números no se repiten y crecen dentro de cada proceso, pero puede
+haber huecos (lo que le quedaba del bloque a un proceso que reinicia).
+
+En PostgreSQL el bloque se reserva con una conexión propia en autocommit
+(una por hilo: Django no deja usar una conexión desde otro hilo): si la
+venta que pidió el número hace rollback el bloque ya quedó reservado, y
+ningún otro proceso lo vuelve a entregar. Esa conexión sigue las mismas
+reglas que las de Django: al terminar cada request (tenants/signals.py) se
+cierra si está rota o pasó CONN_MAX_AGE; los hilos que no atienden
+requests (workers, comandos) llaman a `cerrar_conexion_propia()` al final.
+
+El lock es por (empresa, nombre): mientras un hilo reserva un bloque (una
+ida y vuelta a la base) solo esperan los que piden ese mismo numerador.
+En las demás bases,
+dentro de una transacción se reserva de a uno en la misma transacción (se
+revierte junto con ella).
+"""
+import os
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections, transaction
+from django.db.models import F, Max
+
+from .models import Secuencia
+
+_lock = threading.Lock()        # protege `_locks` y `reset()`
+_locks = {}                     # clave -> Lock del numerador
+_bloques = {}                   # clave -> [siguiente, tope]
+_conexiones = threading.local()  # .propia = (pid, DatabaseWrapper en autocommit), solo PostgreSQL
+
+
+def tamano_bloque():
+    return max(1, getattr(settings, 'SECUENCIA_BLOQUE', 20))
+
+
+def clave_de(empresa_id, nombre):
+    return f"{empresa_id if empresa_id is not None else 'global'}:{nombre}"
+
+
+def siguiente(empresa_id, nombre, inicial=None):
+    """
+    Próximo número de `nombre` para la empresa. `inicial()` da el primer
+    número cuando el numerador todavía no existe (p. ej. para seguir
+    después de los que ya se entregaron con el esquema anterior); default 1.
+    """
+    return reservar(empresa_id, nombre, 1, inicial)[0]
+
+
+def reservar(empresa_id, nombre, cantidad, inicial=None):
+    """
+    `cantidad` números de una vez (lo que queda del bloque en memoria más,
+    si no alcanza, una sola reserva para el resto): para numerar un lote de
+    ventas sin una escritura por venta.
+    """
+    clave = clave_de(empresa_id, nombre)
+    with _lock_de(clave):
+        numeros = []
+        bloque = _bloques.get(clave)
+        if bloque is not None and bloque[0] <= bloque[1]:
+            tomados = min(cantidad, bloque[1] - bloque[0] + 1)
+            numeros = list(range(bloque[0], bloque[0] + tomados))
+            bloque[0] += tomados
+        faltan = cantidad - len(numeros)
+        if not faltan:
+            return numeros
+
+        propia = _conexion_propia()
+        if propia is None and connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # El bloque se revertiría con la transacción de quien lo pidió: solo lo justo y sin guardarlo
+            tope = _reservar_orm(clave, empresa_id, nombre, faltan, inicial)
+            return numeros + list(range(tope - faltan + 1, tope + 1))
+
+        n = max(faltan, tamano_bloque())
+        if propia is not None:
+            tope = _reservar_sql(propia, clave, empresa_id, nombre, n, inicial)
+        else:
+            tope = _reservar_orm(clave, empresa_id, nombre, n, inicial)
+        primero = tope - n + 1
+        _bloques[clave] = [primero + faltan, tope]
+        return numeros + list(range(primero, primero + faltan))
+
+
+def siguiente_id(modelo, empresa_id):
+    """
+    Primer número seguro para los numeradores que antes usaban el id de la
+    fila (`last.id + 1`): uno más que el mayor id de la empresa.
+    """
+    ultimo = modelo.objects.filter(empresa_id=empresa_id).aggregate(ultimo=Max('id'))['ultimo']
+    return (ultimo or 0) + 1
+
+
+def reset():
+    """Olvida los bloques en memoria (tests); los números sin usar quedan como huecos."""
+    with _lock:
+        _bloques.clear()
+
+
+def cerrar_conexion_propia(obsoleta=False):
+    """
+    Cierra la conexión propia de este hilo. Con `obsoleta=True` solo si está
+    rota o pasó CONN_MAX_AGE (lo que hace Django con las suyas al final de
+    cada request).
+    """
+    propia = getattr(_conexiones, 'propia', None)
+    if propia is None or propia[0] != os.getpid():
+        return
+    if obsoleta:
+        propia[1].close_if_unusable_or_obsolete()
+    else:
+        propia[1].close()
+
+
+# ---------------------------------------------------------------------
+# 🔹 Reserva de bloques
+# ---------------------------------------------------------------------
+def _lock_de(clave):
+    lock = _locks.get(clave)
+    if lock is None:
+        with _lock:
+            lock = _locks.setdefault(clave, threading.Lock())
+    return lock
+
+
+def _base(inicial):
+    return (inicial() if inicial is not None else 1) - 1
+
+
+def _usa_conexion_propia(principal):
+    return principal.vendor == 'postgresql'
+
+
+def _conexion_propia():
+    """Conexión aparte (autocommit) a la misma base; una por hilo de cada proceso."""
+    principal = connections[DEFAULT_DB_ALIAS]
+    if not _usa_conexion_propia(principal):
+        return None
+    propia = getattr(_conexiones, 'propia', None)
+    if propia is None or propia[0] != os.getpid():
+        # Después de un fork la conexión del padre no se reutiliza
+        propia = _conexiones.propia = (os.getpid(), type(principal)(dict(principal.settings_dict), principal.alias))
+    return propia[1]
+
+
+def _reservar_sql(conexion, clave, empresa_id, nombre, n, inicial):
+    tabla = conexion.ops.quote_name(Secuencia._meta.db_table)
+    sumar = f"UPDATE {tabla} SET valor = valor + %s WHERE clave = %s RETURNING valor"
+    conexion.close_if_unusable_or_obsolete()
+    try:
+        with conexion.cursor() as cursor:
+            cursor.execute(sumar, [n, clave])
+            fila = cursor.fetchone()
+            if fila is None:
+                cursor.execute(
+                    f"INSERT INTO {tabla} (clave, empresa_id, nombre, valor) VALUES (%s, %s, %s, %s) "
+                    f"ON CONFLICT (clave) DO NOTHING",
+                    [clave, empresa_id, nombre, _base(inicial)],
+                )
+                cursor.execute(sumar, [n, clave])
+                fila = cursor.fetchone()
+    except Exception:
+        # La próxima llamada de este hilo abre una conexión nueva
+        conexion.close()
+        raise
+    return fila[0]
+
+
+def _reservar_orm(clave, empresa_id, nombre, n, inicial):
+    with transaction.atomic():
+        # El UPDATE bloquea la fila hasta el final de la transacción: nadie lee el mismo valor
+        if not Secuencia.objects.filter(clave=clave).update(valor=F('valor') + n):
+            try:
+                with transaction.atomic():
+                    return Secuencia.objects.create(
+                        clave=clave, empresa_id=empresa_id, nombre=nombre, valor=_base(inicial) + n,
+                    ).valor
+            except IntegrityError:
+                # Otro proceso creó el numerador al mismo tiempo
+                Secuencia.objects.filter(clave=clave).update(valor=F('valor') + n)
+        return Secuencia.objects.filter(clave=clave).values_list('valor', flat=True).get()
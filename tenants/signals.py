@@ -0,0 +1,11 @@
+# tenants/signals.py
+from django.core.signals import request_finished
+from django.dispatch import receiver
+
+from .secuencias import cerrar_conexion_propia
+
+
+@receiver(request_finished)
+def cerrar_conexion_de_secuencias(sender, **kwargs):
+    """Como `close_old_connections` de Django, para la conexión propia de los numeradores."""
+    cerrar_conexion_propia(obsoleta=True)
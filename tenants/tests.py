@@ -1,3 +1,95 @@
-from django.test import TestCase
+import threading
+from unittest import mock
 
-# Create your tests here.
+from django.core.signals import request_finished
+from django.db import connections
+from django.test import SimpleTestCase, TransactionTestCase
+
+from . import secuencias
+from .models import Secuencia
+
+
+class SecuenciaEntreHilosTests(TransactionTestCase):
+    """Varias cajas (hilos de un mismo proceso) numerando a la vez."""
+
+    def setUp(self):
+        secuencias.reset()
+
+    def test_dos_hilos_reservan_sin_repetir(self):
+        numeros, errores, conexiones = [], [], set()
+
+        def caja():
+            try:
+                for _ in range(30):
+                    numeros.extend(secuencias.reservar(None, 'nota', 3))
+                conexiones.add(id(secuencias._conexion_propia()))
+            except Exception as e:
+                errores.append(e)
+            finally:
+                secuencias.cerrar_conexion_propia()
+                connections.close_all()
+
+        # La conexión propia (autocommit) es la de PostgreSQL; aquí se usa la misma ruta con la base de los tests
+        with mock.patch.object(secuencias, '_usa_conexion_propia', return_value=True):
+            hilos = [threading.Thread(target=caja) for _ in range(2)]
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+
+        self.assertEqual(errores, [])
+        self.assertEqual(len(numeros), 180)
+        self.assertEqual(len(set(numeros)), 180)
+        # Cada hilo con su propia conexión (Django no deja compartirlas entre hilos)
+        self.assertEqual(len(conexiones), 2)
+        self.assertGreaterEqual(Secuencia.objects.get(clave='global:nota').valor, max(numeros))
+
+    def test_fin_del_request_cierra_la_conexion_propia(self):
+        resultado = {}
+
+        def request():
+            try:
+                secuencias.reservar(None, 'nota', 1)
+                propia = secuencias._conexion_propia()
+                resultado['abierta'] = propia.connection is not None
+                # CONN_MAX_AGE=0: obsoleta apenas termina el request (la base en memoria
+                # de los tests ignora close(), por eso se mira la llamada)
+                propia.close_at = 0
+                with mock.patch.object(propia, 'close', wraps=propia.close) as close:
+                    request_finished.send(sender=None)
+                resultado['cerrada'] = close.called
+            finally:
+                secuencias.cerrar_conexion_propia()
+                connections.close_all()
+
+        with mock.patch.object(secuencias, '_usa_conexion_propia', return_value=True):
+            hilo = threading.Thread(target=request)
+            hilo.start()
+            hilo.join()
+        self.assertEqual(resultado, {'abierta': True, 'cerrada': True})
+
+
+class SecuenciaLockPorNumeradorTests(SimpleTestCase):
+    """Una reserva lenta de un numerador no frena a los demás."""
+
+    def setUp(self):
+        secuencias.reset()
+
+    def test_otro_numerador_no_espera(self):
+        en_la_base, seguir = threading.Event(), threading.Event()
+
+        def reservar_orm(clave, empresa_id, nombre, n, inicial):
+            if nombre == 'lento':
+                en_la_base.set()
+                seguir.wait(5)
+            return n
+
+        with mock.patch.object(secuencias, '_reservar_orm', side_effect=reservar_orm):
+            lento = threading.Thread(target=secuencias.reservar, args=(1, 'lento', 1))
+            lento.start()
+            self.assertTrue(en_la_base.wait(5))
+            # Mientras el primero sigue en la base, otro numerador reserva sin esperarlo
+            self.assertEqual(secuencias.reservar(1, 'rapido', 2), [1, 2])
+            self.assertTrue(lento.is_alive())
+            seguir.set()
+            lento.join()
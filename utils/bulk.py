@@ -0,0 +1,77 @@
+# utils/bulk.py
+"""
+Escrituras por lote para las tablas ya agregadas (resúmenes de reportes,
+feature store de predicciones): sumar a muchas filas con consultas fijas
+y reconstruirlas sin armar la lista completa en memoria.
+"""
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Value, When
+
+BATCH_SIZE = 2000
+
+
+def acumular(modelo, campos, sumas):
+    """
+    Suma `sumas` ({(empresa_id, *clave): {columna: n}}, clave en el orden de
+    `campos`) a las filas de `modelo` con consultas fijas: un SELECT de las
+    que ya existen, un UPDATE con CASE para ésas y un bulk_create para las
+    nuevas. `campos` tiene que ser una clave única de `modelo`.
+    """
+    if not sumas:
+        return
+    por_clave = {clave[1:]: (clave[0], valores) for clave, valores in sumas.items()}
+    # IN por cada campo (sin los que traen NULL: ventas viejas sin sucursal) y
+    # el cruce exacto en Python; el superconjunto es chico (mismos días y productos)
+    filtro = {}
+    for i, campo in enumerate(campos):
+        valores = {clave[i] for clave in por_clave}
+        if None not in valores:
+            filtro[f'{campo}__in'] = valores
+    existentes = {
+        tuple(fila[:-1]): fila[-1]
+        for fila in modelo.objects.filter(**filtro).values_list(*campos, 'pk')
+        if tuple(fila[:-1]) in por_clave
+    }
+    if existentes:
+        columnas = next(iter(sumas.values())).keys()
+        modelo.objects.filter(pk__in=existentes.values()).update(**{
+            columna: F(columna) + Case(
+                *[When(pk=pk, then=Value(por_clave[clave][1][columna])) for clave, pk in existentes.items()],
+                output_field=modelo._meta.get_field(columna),
+            )
+            for columna in columnas
+        })
+    nuevas = [clave for clave in por_clave if clave not in existentes]
+    if not nuevas:
+        return
+    try:
+        with transaction.atomic():
+            modelo.objects.bulk_create([
+                modelo(empresa_id=por_clave[clave][0], **dict(zip(campos, clave)), **por_clave[clave][1])
+                for clave in nuevas
+            ])
+    except IntegrityError:
+        # Otro request creó alguna entre la lectura y el INSERT: fila por fila
+        for clave in nuevas:
+            empresa_id, valores = por_clave[clave]
+            filtro = dict(zip(campos, clave))
+            if modelo.objects.filter(**filtro).update(**{c: F(c) + v for c, v in valores.items()}):
+                continue
+            try:
+                with transaction.atomic():
+                    modelo.objects.create(empresa_id=empresa_id, **filtro, **valores)
+            except IntegrityError:
+                modelo.objects.filter(**filtro).update(**{c: F(c) + v for c, v in valores.items()})
+
+
+def insertar_por_bloques(modelo, objetos, tamano=BATCH_SIZE):
+    """bulk_create de un iterable (generador) de a `tamano` objetos."""
+    # bulk_create arma la lista completa: se le pasan bloques para acotar la memoria
+    objetos = iter(objetos)
+    while True:
+        bloque = list(islice(objetos, tamano))
+        if not bloque:
+            break
+        modelo.objects.bulk_create(bloque)
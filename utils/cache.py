@@ -0,0 +1,32 @@
+# utils/cache.py
+"""
+Caches que se invalidan con contadores de generación (predicciones,
+analítica de ventas): la venta que invalida llega a UN worker, así que el
+contador tiene que vivir en un cache que vean todos los procesos (redis,
+memcached, base de datos, archivos). Un LocMemCache es por proceso: los
+demás workers seguirían sirviendo resultados viejos hasta el TTL, por eso
+con él esas cachés se desactivan (y se avisa una vez en el log).
+"""
+import logging
+
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+logger = logging.getLogger(__name__)
+
+_avisados = set()
+
+
+def cache_compartido(alias, uso=""):
+    """El cache `alias` de settings.CACHES si es compartido entre procesos; si no, None."""
+    cache = caches[alias]
+    if isinstance(cache, (LocMemCache, DummyCache)):
+        if alias not in _avisados:
+            _avisados.add(alias)
+            logger.warning(
+                "CACHES['%s'] es %s (por proceso): %s sin caché. Configure REDIS_URL u otro cache compartido.",
+                alias, type(cache).__name__, uso or "se trabaja",
+            )
+        return None
+    return cache
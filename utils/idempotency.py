@@ -0,0 +1,160 @@
+# utils/idempotency.py
+"""
+Cabecera Idempotency-Key para los POST que el cliente reintenta cuando la
+red se corta (registrar una venta, crear el PaymentIntent de Stripe).
+
+    @idempotente
+    def post(self, request, ...): ...
+
+La primera vez que llega una clave se inserta una SolicitudIdempotente
+'en_curso' (la restricción única hace de candado entre procesos), se corre
+la vista y se guarda su respuesta. Un reintento con la misma clave:
+
+    - si ya terminó, recibe la respuesta guardada sin tocar nada más
+      (cabecera Idempotent-Replayed: true);
+    - si todavía está en curso, 409 enseguida (un INSERT y un SELECT) con
+      Retry-After;
+    - si trae otro cuerpo, 409 también: la clave no se puede reutilizar.
+
+Una clave 'en_curso' solo se libera pasado `abandono()` (el timeout de los
+requests más un margen), cuando la primera ya no puede estar corriendo.
+
+Las respuestas 5xx y 409 no se guardan (el cliente puede reintentar). Sin
+la cabecera la vista se comporta igual que siempre. Las claves vencen a
+las IDEMPOTENCY_TTL_HORAS; `manage.py purge_idempotency_keys` borra las
+vencidas.
+"""
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from idempotencia.models import SolicitudIdempotente
+
+CABECERA = "Idempotency-Key"
+LARGO_MAXIMO = 100
+
+
+def ttl():
+    return timedelta(hours=getattr(settings, "IDEMPOTENCY_TTL_HORAS", 24))
+
+
+def abandono():
+    """
+    Una solicitud 'en_curso' más vieja que esto se da por perdida (el proceso
+    murió). Es el tiempo máximo de un request más un margen: antes de eso la
+    primera puede seguir corriendo (p. ej. esperando a Stripe) y volver a
+    correr la vista cobraría dos veces.
+    """
+    return timedelta(seconds=getattr(settings, "REQUEST_TIMEOUT_SEGUNDOS", 120)
+                     + getattr(settings, "IDEMPOTENCY_MARGEN_SEGUNDOS", 30))
+
+
+def clave_de(request):
+    """Clave guardada: la del cliente, por usuario y endpoint (None si no la mandó)."""
+    valor = request.headers.get(CABECERA)
+    if not valor:
+        return None
+    usuario_id = request.user.pk if request.user.is_authenticated else "anon"
+    return f"{usuario_id}:{request.method} {request.path}:{valor}"
+
+
+def huella_de(request):
+    cuerpo = json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(cuerpo.encode()).hexdigest()
+
+
+def _guardable(response):
+    return response.status_code < 500 and response.status_code != status.HTTP_409_CONFLICT
+
+
+def idempotente(vista):
+    """Decorador para métodos de vistas DRF (APIView / @action)."""
+
+    @functools.wraps(vista)
+    def envoltura(self, request, *args, **kwargs):
+        valor = request.headers.get(CABECERA)
+        if not valor:
+            return vista(self, request, *args, **kwargs)
+        if len(valor) > LARGO_MAXIMO:
+            return Response(
+                {"detail": f"{CABECERA} no puede tener más de {LARGO_MAXIMO} caracteres."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        clave, huella = clave_de(request), huella_de(request)
+        registro, anterior = _reservar(request, clave, huella)
+        if anterior is not None:
+            return _repetida(anterior, huella)
+
+        try:
+            response = vista(self, request, *args, **kwargs)
+        except Exception:
+            registro.delete()
+            raise
+        if not _guardable(response):
+            registro.delete()
+            return response
+        SolicitudIdempotente.objects.filter(pk=registro.pk).update(
+            estado=SolicitudIdempotente.COMPLETADA,
+            status_code=response.status_code,
+            respuesta=getattr(response, "data", None),
+        )
+        return response
+
+    return envoltura
+
+
+def _reservar(request, clave, huella):
+    """
+    (registro nuevo, None) si la clave es nueva; (None, registro existente)
+    si ya se usó. Una clave vencida, o en curso hace más de `abandono()`,
+    se borra y cuenta como nueva.
+    """
+    while True:
+        try:
+            with transaction.atomic():
+                registro = SolicitudIdempotente.objects.create(
+                    clave=clave,
+                    usuario=request.user if request.user.is_authenticated else None,
+                    huella=huella,
+                    expira=timezone.now() + ttl(),
+                )
+            return registro, None
+        except IntegrityError:
+            anterior = SolicitudIdempotente.objects.filter(clave=clave).first()
+            if anterior is None:
+                continue  # se borró entre el INSERT y el SELECT
+            ahora = timezone.now()
+            perdida = anterior.estado == SolicitudIdempotente.EN_CURSO and anterior.creada < ahora - abandono()
+            if anterior.expira > ahora and not perdida:
+                return None, anterior
+            SolicitudIdempotente.objects.filter(pk=anterior.pk, estado=anterior.estado).delete()
+
+
+def _repetida(anterior, huella):
+    if anterior.huella != huella:
+        return Response(
+            {"detail": f"Este {CABECERA} ya se usó con otro cuerpo; genere una clave nueva."},
+            status=status.HTTP_409_CONFLICT,
+        )
+    if anterior.estado == SolicitudIdempotente.EN_CURSO:
+        return Response(
+            {"detail": f"La solicitud con este {CABECERA} todavía se está procesando."},
+            status=status.HTTP_409_CONFLICT,
+            headers={"Retry-After": "1"},
+        )
+    return Response(anterior.respuesta, status=anterior.status_code, headers={"Idempotent-Replayed": "true"})
+
+
+def purgar(antes_de=None):
+    """Borra las claves vencidas; devuelve cuántas."""
+    borradas, _ = SolicitudIdempotente.objects.filter(expira__lte=antes_de or timezone.now()).delete()
+    return borradas
@@ -0,0 +1,33 @@
+# utils/pagination.py
+"""
+Paginación por cursor (keyset) para los listados grandes: ventas, detalles
+de venta y bitácora.
+
+Con OFFSET la base igual recorre y descarta todas las filas anteriores a
+la página pedida: la página 1000 tarda mucho más que la primera. Aquí el
+cursor guarda la posición de la última fila (p. ej. su fecha) y la página
+siguiente es `WHERE fecha < <posición> ORDER BY fecha DESC LIMIT n`, que
+con el índice (empresa_id, fecha, id) cuesta lo mismo en cualquier página.
+
+Respuesta: {"next": url o null, "previous": url o null, "results": [...]}.
+Tamaño de página: ?page_size=N (hasta API_MAX_PAGE_SIZE, default API_PAGE_SIZE).
+"""
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class FechaCursorPagination(CursorPagination):
+    """Más recientes primero; `id` fija el orden entre filas con la misma fecha."""
+
+    ordering = ("-fecha", "-id")
+    page_size_query_param = "page_size"
+
+    def __init__(self):
+        self.page_size = getattr(settings, "API_PAGE_SIZE", 50)
+        self.max_page_size = getattr(settings, "API_MAX_PAGE_SIZE", 500)
+
+
+class IdCursorPagination(FechaCursorPagination):
+    """Para tablas sin fecha propia (detalle_venta): en orden de inserción."""
+
+    ordering = ("id",)
@@ -17,6 +17,16 @@ class ModulePermission(permissions.BasePermission):
         'destroy': 'delete'
     }
 
+    # APIView (sin acciones de ViewSet): el permiso sale del método HTTP
+    method_map = {
+        'GET': 'view',
+        'HEAD': 'view',
+        'POST': 'create',
+        'PUT': 'update',
+        'PATCH': 'update',
+        'DELETE': 'delete'
+    }
+
     def has_permission(self, request, view):
         print("[DEBUG] Entrando a ModulePermission.has_permission()")
         try:
@@ -25,7 +35,10 @@ class ModulePermission(permissions.BasePermission):
 
             module_name = getattr(view, 'module_name', None)
             action = getattr(view, 'action', None)
-            required_permission = self.action_map.get(action)
+            if hasattr(view, 'action'):
+                required_permission = self.action_map.get(action)
+            else:
+                required_permission = self.method_map.get(request.method)
             print(f"[DEBUG USER] Authenticated={user.is_authenticated}, Email={getattr(user, 'email', None)}")
             print(f"[DEBUG ROLE] Role={getattr(user.role, 'name', None)}")
             print(f"[DEBUG MODULE] module_name={module_name}, action={action}, required_permission={required_permission}")
@@ -0,0 +1,13 @@
+# utils/streaming.py
+"""Ayudas para las respuestas que se envían por trozos (StreamingHttpResponse)."""
+
+
+class Eco:
+    """
+    'Archivo' para csv.writer que devuelve la línea en vez de guardarla:
+    `csv.writer(Eco()).writerow(fila)` es el texto de esa fila, listo para
+    entregarlo como un trozo más de la respuesta.
+    """
+
+    def write(self, valor):
+        return valor
@@ -1,4 +1,5 @@
 # utils/viewsets.py
+from django.db.models import Prefetch
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
@@ -6,6 +7,49 @@ from utils.permissions import ModulePermission
 from utils.logging_utils import log_action
 
 
+def _expandir(relaciones, prefijo=""):
+    """
+    Aplana la lista de `Meta.select_related` de un serializer: cada entrada
+    es un nombre ("empresa") o un par (relación, SerializerAnidado), que
+    suma también las relaciones que declara el anidado ("pago__metodo").
+    """
+    nombres = []
+    for relacion in relaciones:
+        if isinstance(relacion, tuple):
+            nombre, anidado = relacion
+            nombres.append(prefijo + nombre)
+            meta = getattr(anidado, "Meta", None)
+            nombres += _expandir(getattr(meta, "select_related", ()), f"{prefijo}{nombre}__")
+        else:
+            nombres.append(prefijo + relacion)
+    return nombres
+
+
+def con_relaciones(queryset, serializer_class):
+    """
+    Agrega al queryset los select_related / prefetch_related que el
+    serializer declara en su Meta, para que serializar una página no haga
+    una consulta por fila:
+
+        class Meta:
+            select_related = ["empresa", ("pago", PagoSerializer)]
+            prefetch_related = [("detalles", DetalleVentaSerializer)]
+
+    Un prefetch declarado con su serializer anidado trae a su vez las
+    relaciones de ése (una consulta por relación, no por fila).
+    """
+    meta = getattr(serializer_class, "Meta", None)
+    select = _expandir(getattr(meta, "select_related", ()))
+    if select:
+        queryset = queryset.select_related(*select)
+    for relacion in getattr(meta, "prefetch_related", ()):
+        if isinstance(relacion, tuple):
+            nombre, anidado = relacion
+            relacion = Prefetch(nombre, queryset=con_relaciones(anidado.Meta.model.objects.all(), anidado))
+        queryset = queryset.prefetch_related(relacion)
+    return queryset
+
+
 class SoftDeleteViewSet(viewsets.ModelViewSet):
     permission_classes = [ModulePermission]
 
@@ -37,7 +81,8 @@ class SoftDeleteViewSet(viewsets.ModelViewSet):
         if hasattr(self.queryset.model, "esta_activo"):
             queryset = queryset.filter(esta_activo=True)
 
-        return queryset
+        # 🔸 Relaciones que lee el serializer (Meta.select_related / prefetch_related)
+        return con_relaciones(queryset, self.get_serializer_class())
 
     def perform_create(self, serializer):
         user = self.request.user
@@ -0,0 +1,127 @@
+# ventas/exportar.py
+"""
+Exportación de ventas y detalles de venta (contabilidad) en CSV o NDJSON.
+
+No pasa por los serializers ni arma la lista en memoria: lee tuplas con
+`values_list(...).iterator()` (en PostgreSQL, un cursor del lado del
+servidor que trae CHUNK filas por vez) y va entregando el archivo por
+trozos de FILAS_POR_TROZO filas, opcionalmente comprimido con gzip. La
+memoria es la misma para un día o para un año de ventas.
+"""
+import csv
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from utils.streaming import Eco
+
+from .models import DetalleVenta, Venta
+
+CHUNK = 2000
+FILAS_POR_TROZO = 500
+FORMATOS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+}
+
+# columna en el archivo -> campo para values_list
+COLUMNAS = {
+    "ventas": [
+        ("id", "id"),
+        ("numero_nota", "numero_nota"),
+        ("fecha", "fecha"),
+        ("sucursal_id", "sucursal_id"),
+        ("sucursal", "sucursal__nombre"),
+        ("usuario", "usuario__email"),
+        ("canal", "canal"),
+        ("estado", "estado"),
+        ("total", "total"),
+        ("metodo_pago", "pago__metodo__nombre"),
+        ("estado_pago", "pago__estado"),
+        ("monto_pago", "pago__monto"),
+    ],
+    "detalles": [
+        ("id", "id"),
+        ("venta_id", "venta_id"),
+        ("numero_nota", "venta__numero_nota"),
+        ("fecha", "venta__fecha"),
+        ("producto_id", "producto_id"),
+        ("sku", "producto__sku"),
+        ("producto", "producto__nombre"),
+        ("cantidad", "cantidad"),
+        ("precio_unitario", "precio_unitario"),
+        ("subtotal", "subtotal"),
+    ],
+}
+
+
+def filas(tipo, empresa_id, desde=None, hasta=None):
+    """Tuplas de `tipo` ('ventas' o 'detalles') de la empresa, con la fecha de venta en [desde, hasta)."""
+    campos = [campo for _, campo in COLUMNAS[tipo]]
+    if tipo == "ventas":
+        # Orden del índice (empresa_id, fecha, id)
+        queryset = Venta.objects.filter(empresa_id=empresa_id, esta_activo=True).order_by("fecha", "id")
+        fecha = "fecha"
+    else:
+        # Orden del índice (empresa_id, id): los detalles se insertan junto con su venta.
+        # La empresa también en la venta: un detalle nunca sale con la venta de otra empresa
+        queryset = DetalleVenta.objects.filter(
+            empresa_id=empresa_id, venta__empresa_id=empresa_id, venta__esta_activo=True
+        ).order_by("id")
+        fecha = "venta__fecha"
+    if desde is not None:
+        queryset = queryset.filter(**{f"{fecha}__gte": desde})
+    if hasta is not None:
+        queryset = queryset.filter(**{f"{fecha}__lt": hasta})
+    return queryset.values_list(*campos).iterator(chunk_size=CHUNK)
+
+
+def _trozos(iterable):
+    trozo = []
+    for fila in iterable:
+        trozo.append(fila)
+        if len(trozo) == FILAS_POR_TROZO:
+            yield trozo
+            trozo = []
+    if trozo:
+        yield trozo
+
+
+def _csv(tipo, tuplas):
+    writer = csv.writer(Eco())
+    yield writer.writerow([columna for columna, _ in COLUMNAS[tipo]])
+    for trozo in _trozos(tuplas):
+        yield "".join(
+            writer.writerow(["" if valor is None else _texto(valor) for valor in fila]) for fila in trozo
+        )
+
+
+def _texto(valor):
+    # Fechas en ISO 8601 completo (UTC, con microsegundos), igual en CSV y NDJSON
+    return valor.isoformat() if hasattr(valor, "isoformat") else valor
+
+
+def _ndjson(tipo, tuplas):
+    columnas = [columna for columna, _ in COLUMNAS[tipo]]
+    for trozo in _trozos(tuplas):
+        yield "".join(
+            json.dumps(dict(zip(columnas, map(_texto, fila))), cls=DjangoJSONEncoder, ensure_ascii=False) + "\n"
+            for fila in trozo
+        )
+
+
+def _gzip(trozos):
+    # wbits=31: formato gzip (cabecera + CRC), el que abre cualquier descompresor
+    compresor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for trozo in trozos:
+        datos = compresor.compress(trozo.encode("utf-8"))
+        if datos:
+            yield datos
+    yield compresor.flush()
+
+
+def contenido(tipo, formato, tuplas, comprimir=False):
+    """Generador con el archivo por trozos (bytes si `comprimir`, si no str)."""
+    trozos = _csv(tipo, tuplas) if formato == "csv" else _ndjson(tipo, tuplas)
+    return _gzip(trozos) if comprimir else trozos
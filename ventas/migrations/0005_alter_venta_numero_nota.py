@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0004_alter_pago_options_alter_venta_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='venta',
+            name='numero_nota',
+            field=models.CharField(max_length=20),
+        ),
+    ]
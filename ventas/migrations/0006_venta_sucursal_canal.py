@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-18 20:01
+#
+# Venta.sucursal, Venta.canal y el AlterField de fecha ya estaban en el modelo
+# pero ninguna migración los creaba: los resúmenes, la exportación y la
+# sincronización del POS dependen de estas columnas.
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sucursales', '0006_departamento_empresa_alter_departamento_nombre_and_more'),
+        ('ventas', '0005_alter_venta_numero_nota'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='venta',
+            name='canal',
+            field=models.CharField(blank=True, choices=[('POS', 'Punto de Venta'), ('WEB', 'Tienda en Línea'), ('OTRO', 'Otro')], default='POS', max_length=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='venta',
+            name='sucursal',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='ventas', to='sucursales.sucursal'),
+        ),
+        migrations.AlterField(
+            model_name='venta',
+            name='fecha',
+            field=models.DateTimeField(),
+        ),
+    ]
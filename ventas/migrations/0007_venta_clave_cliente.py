@@ -0,0 +1,22 @@
+# Generated by Django 5.2.5 on 2026-10-18 20:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0006_venta_sucursal_canal'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='venta',
+            name='clave_cliente',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='venta',
+            constraint=models.UniqueConstraint(condition=models.Q(('clave_cliente__isnull', False)), fields=('empresa', 'clave_cliente'), name='venta_clave_cliente_unica'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.5 on 2026-10-18 21:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0007_venta_clave_cliente'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='detalleventa',
+            index=models.Index(fields=['empresa', 'id'], name='detalle_venta_empresa_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(fields=['empresa', 'fecha', 'id'], name='venta_empresa_fecha_id_idx'),
+        ),
+    ]
@@ -1,6 +1,8 @@
 # ventas/models.py
 from django.db import models
 
+from tenants import secuencias
+
 class Metodo_pago(models.Model):
     empresa = models.ForeignKey(
         'tenants.Empresa', on_delete=models.CASCADE, null=True, blank=True, related_name='metodos_pago'
@@ -45,7 +47,7 @@ class Venta(models.Model):
     empresa = models.ForeignKey(
         'tenants.Empresa', on_delete=models.CASCADE, null=True, blank=True, related_name='ventas'
     )
-    numero_nota = models.CharField(max_length=20, unique = True)
+    numero_nota = models.CharField(max_length=20)  # único por empresa (Meta.unique_together)
 
     usuario = models.ForeignKey('users.User',on_delete=models.CASCADE, related_name='ventas')
     sucursal = models.ForeignKey(
@@ -78,20 +80,37 @@ class Venta(models.Model):
         ('cancelado','Cancelado')
     ], default='pendiente')
     esta_activo = models.BooleanField(default=True)
+    # Clave que genera el POS para las ventas hechas sin conexión: al sincronizar
+    # dos veces el mismo lote, la venta ya aplicada no se vuelve a registrar
+    clave_cliente = models.CharField(max_length=64, null=True, blank=True)
 
     class Meta:
         db_table = 'venta'
         ordering = ['-fecha']
         unique_together = ('empresa', 'numero_nota')
+        indexes = [
+            # Listado paginado por cursor (utils/pagination.py): WHERE empresa_id = ... ORDER BY fecha, id
+            models.Index(fields=['empresa', 'fecha', 'id'], name='venta_empresa_fecha_id_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['empresa', 'clave_cliente'],
+                condition=models.Q(clave_cliente__isnull=False),
+                name='venta_clave_cliente_unica',
+            ),
+        ]
 
     def __str__(self):
         return f"Venta #{self.id} - {self.usuario.email} - {self.total} - {self.estado}"
     
     def save(self, *args, **kwargs):
         if self.numero_nota == 'TEMP-NOTA' or not self.numero_nota:
-            last = Venta.objects.filter(empresa=self.empresa).order_by('id').last()
-            next_num = 1 if not last else last.id + 1
-            self.numero_nota = f"NV-{next_num:05d}"  # ejemplo: NV-00001
+            # Numerador propio de la empresa, reservado por bloques (tenants/secuencias.py).
+            # La primera vez sigue después de las notas numeradas con el id de la venta.
+            numero = secuencias.siguiente(
+                self.empresa_id, 'numero_nota', inicial=lambda: secuencias.siguiente_id(Venta, self.empresa_id)
+            )
+            self.numero_nota = f"NV-{numero:05d}"  # ejemplo: NV-00001
         super().save(*args, **kwargs)
 
 class DetalleVenta(models.Model):
@@ -107,6 +126,9 @@ class DetalleVenta(models.Model):
     class Meta:
         db_table = 'detalle_venta'
         unique_together = ('empresa', 'venta', 'producto')
+        indexes = [
+            models.Index(fields=['empresa', 'id'], name='detalle_venta_empresa_id_idx'),
+        ]
     
     def save(self, *args, **kwargs):
         self.subtotal = self.cantidad * self.precio_unitario
@@ -40,6 +40,7 @@ class PagoSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Pago
+        select_related = ["metodo", "empresa"]
         fields = [
             "id",
             "metodo",
@@ -70,6 +71,7 @@ class DetalleVentaSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = DetalleVenta
+        select_related = ["producto", "empresa"]
         fields = [
             "id",
             "venta",
@@ -106,6 +108,9 @@ class VentaSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Venta
+        # Relaciones que lee cada fila (ver utils.viewsets.con_relaciones)
+        select_related = ["usuario", "empresa", ("pago", PagoSerializer)]
+        prefetch_related = [("detalles", DetalleVentaSerializer)]
         fields = [
             "id",
             "numero_nota",
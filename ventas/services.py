@@ -0,0 +1,439 @@
+# ventas/services.py
+"""
+Registro de ventas (POS / web) como una sola operación de conjunto.
+
+`registrar_venta` valida todas las líneas antes de escribir nada y hace la
+misma cantidad de consultas con 1 o con 50 productos en el ticket:
+
+    1 SELECT de los productos del ticket (existen y son de la empresa)
+    1 SELECT ... FOR UPDATE del stock de esos productos en la sucursal
+    1 INSERT de la venta (+ la reserva del numero_nota, ver tenants/secuencias.py)
+    1 INSERT (bulk_create) de todos los detalles
+    1 UPDATE del stock: stock = stock - CASE ..., solo en las filas donde
+      todavía alcanza (si alguna no alcanza, no se vende nada)
+
+Todo corre dentro de `transaction.atomic`: si algo falla a la mitad no
+queda una venta con detalles a medias ni stock ya descontado.
+
+`sincronizar_ventas` hace lo mismo para las ventas que un POS acumuló sin
+conexión: por lotes de VENTAS_SYNC_LOTE, una transacción y las mismas
+consultas por lote en vez de por venta.
+"""
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, PositiveBigIntegerField, Q, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from products.models import Producto
+from sucursales.models import StockSucursal, Sucursal
+from tenants import secuencias
+
+from .models import DetalleVenta, Metodo_pago, Pago, Venta
+from .signals import venta_registrada, ventas_registradas
+
+
+class VentaRechazada(Exception):
+    """La venta no se registró (nada quedó escrito). `status` es el código HTTP sugerido."""
+
+    def __init__(self, detail, status=400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status = status
+
+
+def _lineas(detalles):
+    """[(producto_id, cantidad, precio_unitario o None)] validadas, en el orden del ticket."""
+    lineas, vistos = [], set()
+    for det in detalles:
+        try:
+            producto_id = int(det.get("producto"))
+            cantidad = int(det.get("cantidad"))
+        except (TypeError, ValueError, AttributeError):
+            raise VentaRechazada("Cada detalle debe tener 'producto' y 'cantidad' enteros.")
+        if cantidad <= 0:
+            raise VentaRechazada(f"La cantidad del producto ID {producto_id} debe ser mayor que 0.")
+        if producto_id in vistos:
+            raise VentaRechazada(f"El producto ID {producto_id} aparece más de una vez en la venta.")
+        vistos.add(producto_id)
+
+        precio = det.get("precio_unitario")
+        if precio not in (None, ""):
+            try:
+                precio = Decimal(str(precio))
+            except InvalidOperation:
+                raise VentaRechazada(f"Precio inválido para el producto ID {producto_id}.")
+            if precio < 0:
+                raise VentaRechazada(f"El precio del producto ID {producto_id} no puede ser negativo.")
+        else:
+            precio = None
+        lineas.append((producto_id, cantidad, precio))
+    return lineas
+
+
+def _descontar_stock(cantidades):
+    """
+    Resta {stock_sucursal_id: cantidad} con un solo UPDATE, condicionado a
+    que el stock alcance en cada fila.
+    """
+    alcanza = Q()
+    for pk, cantidad in cantidades.items():
+        alcanza |= Q(pk=pk, stock__gte=cantidad)
+    descontadas = StockSucursal.objects.filter(alcanza).update(
+        stock=F("stock") - Case(
+            *[When(pk=pk, then=Value(cantidad)) for pk, cantidad in cantidades.items()],
+            output_field=PositiveBigIntegerField(),
+        )
+    )
+    if descontadas != len(cantidades):
+        # Otra venta tomó el stock entre la lectura y el UPDATE (bases sin FOR UPDATE)
+        raise VentaRechazada("El stock cambió mientras se registraba la venta; intente de nuevo.", status=409)
+
+
+def registrar_venta(empresa, usuario, sucursal, detalles, canal="POS", pago=None, total=None,
+                    estado="pendiente", fecha=None, numero_nota=None):
+    """
+    Crea la venta con sus `detalles` ([{"producto", "cantidad", "precio_unitario"}])
+    y descuenta el stock de `sucursal`. Sin precio se usa el precio de venta
+    del producto; sin `total`, la suma de los subtotales.
+
+    Lanza VentaRechazada si el ticket está vacío, un producto no existe o es
+    de otra empresa, no tiene stock en la sucursal o no le alcanza.
+    """
+    if not detalles:
+        raise VentaRechazada("Debe incluir al menos un producto.")
+    lineas = _lineas(detalles)
+    producto_ids = [producto_id for producto_id, _, _ in lineas]
+
+    with transaction.atomic():
+        productos = {
+            p.id: p
+            for p in Producto.objects.filter(empresa=empresa, id__in=producto_ids).only("id", "nombre", "precio_venta")
+        }
+        faltantes = [pid for pid in producto_ids if pid not in productos]
+        if faltantes:
+            raise VentaRechazada(
+                f"Producto ID {faltantes[0]} no encontrado o pertenece a otra empresa.", status=404
+            )
+
+        # Solo se bloquean las filas de stock (no los productos): dos ventas del mismo
+        # producto en distintas sucursales no se esperan entre sí
+        stock = {
+            s.producto_id: s
+            for s in StockSucursal.objects.select_for_update()
+            .filter(empresa=empresa, sucursal=sucursal, producto_id__in=producto_ids)
+        }
+        for producto_id, cantidad, _ in lineas:
+            producto = productos[producto_id]
+            fila = stock.get(producto_id)
+            if fila is None:
+                raise VentaRechazada(
+                    f"Producto {producto.nombre} no tiene stock registrado en la sucursal {sucursal.nombre}"
+                )
+            if fila.stock < cantidad:
+                raise VentaRechazada(
+                    f"Stock insuficiente para {producto.nombre}. Stock disponible: {fila.stock}, solicitado: {cantidad}"
+                )
+
+        items = []
+        for producto_id, cantidad, precio in lineas:
+            precio = productos[producto_id].precio_venta if precio is None else precio
+            items.append((producto_id, cantidad, precio, cantidad * precio))
+
+        venta = Venta.objects.create(
+            empresa=empresa,
+            usuario=usuario,
+            sucursal=sucursal,
+            canal=canal,
+            pago=pago,
+            fecha=fecha or timezone.now(),
+            numero_nota=numero_nota or "TEMP-NOTA",
+            total=total if total not in (None, "") else sum(subtotal for *_, subtotal in items),
+            estado=estado,
+        )
+        # bulk_create no pasa por DetalleVenta.save: el subtotal va calculado
+        DetalleVenta.objects.bulk_create([
+            DetalleVenta(
+                empresa=empresa, venta=venta, producto_id=producto_id,
+                cantidad=cantidad, precio_unitario=precio, subtotal=subtotal,
+            )
+            for producto_id, cantidad, precio, subtotal in items
+        ])
+
+        # Todas las líneas en un solo UPDATE (si alguna ya no alcanza, no se vende nada)
+        _descontar_stock({stock[producto_id].pk: cantidad for producto_id, cantidad, _ in lineas})
+
+        # Avisar (feature store de predicciones, etc.) solo cuando la venta ya está confirmada.
+        # send_robust: si un receptor falla se registra en el log, la venta no se ve afectada.
+        transaction.on_commit(lambda: venta_registrada.send_robust(sender=Venta, venta=venta))
+
+    return venta
+
+
+# ---------------------------------------------------------------------
+# 🔹 Sincronización del POS sin conexión
+# ---------------------------------------------------------------------
+CREADA, DUPLICADA, RECHAZADA = "creada", "duplicada", "rechazada"
+ESTADOS_VENTA = {estado for estado, _ in Venta._meta.get_field("estado").choices}
+ESTADOS_PAGO = {estado for estado, _ in Pago._meta.get_field("estado").choices}
+CANALES_VENTA = {canal for canal, _ in Venta.CANALES_VENTA}
+
+
+def tamano_lote():
+    """Ventas por transacción al sincronizar."""
+    return max(1, getattr(settings, "VENTAS_SYNC_LOTE", 100))
+
+
+def _decimal(valor, campo):
+    if valor in (None, ""):
+        return None
+    try:
+        return Decimal(str(valor))
+    except InvalidOperation:
+        raise VentaRechazada(f"'{campo}' inválido.")
+
+
+def _venta_offline(datos):
+    """Valida una venta del lote (sin consultas) y la deja lista para `_aplicar_lote`."""
+    if not isinstance(datos, dict):
+        raise VentaRechazada("Cada venta debe ser un objeto.")
+    clave = datos.get("clave")
+    if not isinstance(clave, str) or not clave.strip() or len(clave) > 64:
+        raise VentaRechazada("Cada venta necesita una 'clave' (texto de hasta 64 caracteres) generada por el POS.")
+    try:
+        sucursal_id = int(datos.get("sucursal"))
+    except (TypeError, ValueError):
+        raise VentaRechazada("'sucursal' debe ser un ID.")
+    if not datos.get("detalles"):
+        raise VentaRechazada("Debe incluir al menos un producto.")
+
+    fecha = datos.get("fecha")
+    if fecha:
+        # La hora en que se hizo la venta en la caja, no la de la sincronización
+        fecha = parse_datetime(str(fecha))
+        if fecha is None:
+            raise VentaRechazada("'fecha' debe estar en formato ISO 8601.")
+        if timezone.is_naive(fecha):
+            fecha = timezone.make_aware(fecha)
+    estado = datos.get("estado", "pendiente")
+    if estado not in ESTADOS_VENTA:
+        raise VentaRechazada(f"Estado de venta inválido: {estado}.")
+    canal = datos.get("canal") or "POS"
+    if canal not in CANALES_VENTA:
+        raise VentaRechazada(f"Canal de venta inválido: {canal}.")
+
+    pago = datos.get("pago")
+    if pago:
+        if not isinstance(pago, dict):
+            raise VentaRechazada("'pago' debe ser un objeto.")
+        monto = _decimal(pago.get("monto"), "pago.monto")
+        if monto is None:
+            raise VentaRechazada("El pago necesita un 'monto'.")
+        if pago.get("estado", "pendiente") not in ESTADOS_PAGO:
+            raise VentaRechazada(f"Estado de pago inválido: {pago.get('estado')}.")
+        metodo_id = pago.get("metodo")
+        if metodo_id not in (None, ""):
+            try:
+                metodo_id = int(metodo_id)
+            except (TypeError, ValueError):
+                raise VentaRechazada("'pago.metodo' debe ser un ID.")
+        pago = {
+            "metodo_id": metodo_id or None,
+            "monto": monto,
+            "estado": pago.get("estado", "pendiente"),
+            "referencia": pago.get("referencia"),
+        }
+
+    return {
+        "clave": clave,
+        "sucursal_id": sucursal_id,
+        "lineas": _lineas(datos["detalles"]),
+        "canal": canal,
+        "fecha": fecha or timezone.now(),
+        "estado": estado,
+        "total": _decimal(datos.get("total"), "total"),
+        "pago": pago or None,
+    }
+
+
+def sincronizar_ventas(empresa, usuario, ventas):
+    """
+    Registra las ventas que un POS hizo sin conexión. Cada venta trae una
+    `clave` generada en la caja; si ya se aplicó (una sincronización anterior
+    que se cortó a la mitad) no se vuelve a registrar.
+
+    Las ventas se aplican por lotes de VENTAS_SYNC_LOTE, cada lote en una
+    transacción. Una venta rechazada (sin stock, producto inexistente...) no
+    frena a las demás. Devuelve el resultado de cada venta, en el orden
+    recibido: {"clave", "estado": creada|duplicada|rechazada, "venta_id",
+    "numero_nota"} o {"clave", "estado", "detail"}.
+    """
+    resultados = [None] * len(ventas)
+    validas, vistas = [], set()
+    for posicion, datos in enumerate(ventas):
+        clave = datos.get("clave") if isinstance(datos, dict) else None
+        try:
+            venta = _venta_offline(datos)
+        except VentaRechazada as e:
+            resultados[posicion] = {"clave": clave, "estado": RECHAZADA, "detail": e.detail}
+            continue
+        if venta["clave"] in vistas:
+            resultados[posicion] = {"clave": clave, "estado": DUPLICADA, "detail": "Clave repetida en el lote."}
+            continue
+        vistas.add(venta["clave"])
+        validas.append((posicion, venta))
+
+    # Sucursales y métodos de pago del POS: una consulta para todo el lote
+    sucursales = {
+        s.id: s for s in Sucursal.objects.filter(empresa=empresa, id__in={v["sucursal_id"] for _, v in validas})
+    }
+    metodos = set(
+        Metodo_pago.objects.filter(
+            empresa=empresa, id__in={v["pago"]["metodo_id"] for _, v in validas if v["pago"] and v["pago"]["metodo_id"]}
+        ).values_list("id", flat=True)
+    )
+
+    n = tamano_lote()
+    for inicio in range(0, len(validas), n):
+        lote = validas[inicio:inicio + n]
+        for posicion, resultado in _sincronizar_lote(empresa, usuario, lote, sucursales, metodos):
+            resultados[posicion] = resultado
+    return resultados
+
+
+def _sincronizar_lote(empresa, usuario, lote, sucursales, metodos):
+    for intento in range(2):
+        try:
+            with transaction.atomic():
+                return _aplicar_lote(empresa, usuario, lote, sucursales, metodos)
+        except IntegrityError:
+            # Otra sincronización del mismo POS aplicó alguna de estas claves al mismo
+            # tiempo: se recalcula el lote (esas ventas salen como duplicadas)
+            detail = "Otra sincronización aplicó estas ventas al mismo tiempo; reintente."
+        except VentaRechazada as e:
+            # El stock cambió entre la lectura y el UPDATE: no se aplicó nada del lote
+            detail = e.detail
+    return [(posicion, {"clave": v["clave"], "estado": RECHAZADA, "detail": detail}) for posicion, v in lote]
+
+
+def _aplicar_lote(empresa, usuario, lote, sucursales, metodos):
+    """Un lote dentro de su transacción: las mismas consultas con 1 o con 100 ventas."""
+    aplicadas = {
+        clave: (venta_id, numero_nota)
+        for clave, venta_id, numero_nota in Venta.objects.filter(
+            empresa=empresa, clave_cliente__in=[v["clave"] for _, v in lote]
+        ).values_list("clave_cliente", "id", "numero_nota")
+    }
+    resultados, nuevas = [], []
+    for posicion, venta in lote:
+        if venta["clave"] in aplicadas:
+            venta_id, numero_nota = aplicadas[venta["clave"]]
+            resultados.append((posicion, {
+                "clave": venta["clave"], "estado": DUPLICADA, "venta_id": venta_id, "numero_nota": numero_nota,
+            }))
+        else:
+            nuevas.append((posicion, venta))
+    if not nuevas:
+        return resultados
+
+    producto_ids = {producto_id for _, v in nuevas for producto_id, _, _ in v["lineas"]}
+    productos = {
+        p.id: p
+        for p in Producto.objects.filter(empresa=empresa, id__in=producto_ids).only("id", "nombre", "precio_venta")
+    }
+    stock = {
+        (s.sucursal_id, s.producto_id): s
+        for s in StockSucursal.objects.select_for_update().filter(
+            empresa=empresa, sucursal_id__in={v["sucursal_id"] for _, v in nuevas}, producto_id__in=producto_ids,
+        )
+    }
+
+    # Las ventas se validan en orden contra el stock que van dejando las anteriores
+    disponible = {clave: fila.stock for clave, fila in stock.items()}
+    aceptadas = []
+    for posicion, venta in nuevas:
+        try:
+            items = _validar_offline(venta, productos, sucursales, metodos, disponible)
+        except VentaRechazada as e:
+            resultados.append((posicion, {"clave": venta["clave"], "estado": RECHAZADA, "detail": e.detail}))
+            continue
+        aceptadas.append((posicion, venta, items))
+    if not aceptadas:
+        return resultados
+
+    numeros = secuencias.reservar(
+        empresa.id, "numero_nota", len(aceptadas), inicial=lambda: secuencias.siguiente_id(Venta, empresa.id)
+    )
+    pagos = Pago.objects.bulk_create([
+        Pago(empresa=empresa, **venta["pago"]) for _, venta, _ in aceptadas if venta["pago"]
+    ])
+    pagos = iter(pagos)
+    ventas = Venta.objects.bulk_create([
+        Venta(
+            empresa=empresa,
+            usuario=usuario,
+            sucursal=sucursales[venta["sucursal_id"]],
+            canal=venta["canal"],
+            pago=next(pagos) if venta["pago"] else None,
+            fecha=venta["fecha"],
+            numero_nota=f"NV-{numero:05d}",
+            total=venta["total"] if venta["total"] is not None else sum(subtotal for *_, subtotal in items),
+            estado=venta["estado"],
+            clave_cliente=venta["clave"],
+        )
+        for (_, venta, items), numero in zip(aceptadas, numeros)
+    ])
+    DetalleVenta.objects.bulk_create([
+        DetalleVenta(
+            empresa=empresa, venta=creada, producto_id=producto_id,
+            cantidad=cantidad, precio_unitario=precio, subtotal=subtotal,
+        )
+        for creada, (_, _, items) in zip(ventas, aceptadas)
+        for producto_id, cantidad, precio, subtotal in items
+    ])
+
+    cantidades = defaultdict(int)
+    for _, venta, items in aceptadas:
+        for producto_id, cantidad, _, _ in items:
+            cantidades[stock[venta["sucursal_id"], producto_id].pk] += cantidad
+    _descontar_stock(cantidades)
+
+    transaction.on_commit(lambda: ventas_registradas.send_robust(sender=Venta, ventas=ventas))
+    for creada, (posicion, venta, _) in zip(ventas, aceptadas):
+        resultados.append((posicion, {
+            "clave": venta["clave"], "estado": CREADA, "venta_id": creada.id, "numero_nota": creada.numero_nota,
+        }))
+    return resultados
+
+
+def _validar_offline(venta, productos, sucursales, metodos, disponible):
+    """Revisa una venta contra lo ya leído y, si entra, descuenta su stock de `disponible`."""
+    sucursal = sucursales.get(venta["sucursal_id"])
+    if sucursal is None:
+        raise VentaRechazada("Sucursal no encontrada o no pertenece a la empresa.")
+    if venta["pago"] and venta["pago"]["metodo_id"] and venta["pago"]["metodo_id"] not in metodos:
+        raise VentaRechazada("Método de pago no encontrado o pertenece a otra empresa.")
+
+    items = []
+    for producto_id, cantidad, precio in venta["lineas"]:
+        producto = productos.get(producto_id)
+        if producto is None:
+            raise VentaRechazada(f"Producto ID {producto_id} no encontrado o pertenece a otra empresa.")
+        queda = disponible.get((sucursal.id, producto_id))
+        if queda is None:
+            raise VentaRechazada(
+                f"Producto {producto.nombre} no tiene stock registrado en la sucursal {sucursal.nombre}"
+            )
+        if queda < cantidad:
+            raise VentaRechazada(
+                f"Stock insuficiente para {producto.nombre}. Stock disponible: {queda}, solicitado: {cantidad}"
+            )
+        precio = producto.precio_venta if precio is None else precio
+        items.append((producto_id, cantidad, precio, cantidad * precio))
+
+    for producto_id, cantidad, _, _ in items:
+        disponible[sucursal.id, producto_id] -= cantidad
+    return items
@@ -0,0 +1,11 @@
+# ventas/signals.py
+from django.dispatch import Signal
+
+# Se envía cuando una venta (con sus detalles) ya quedó confirmada en la BD,
+# desde `transaction.on_commit`. Argumentos: venta.
+# Receptores: predictions (feature store).
+venta_registrada = Signal()
+
+# Igual, para un lote de ventas confirmadas juntas (sincronización del POS
+# sin conexión, ver ventas/services.py). Argumentos: ventas.
+ventas_registradas = Signal()
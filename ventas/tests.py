@@ -1,3 +1,459 @@
+import csv
+import gzip
+import io
+import json
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from products.models import Producto
+from shipping.models import Agencia, Envio
+from shipping.views import EnvioViewSet
+from sucursales.models import Departamento, Direccion, StockSucursal, Sucursal
+from sucursales.views import StockSucursalViewSet
+from tenants.models import Empresa, Plan
+from users.models import Module, Permission, Role, User
+
+from . import exportar, services
+from .models import DetalleVenta, Metodo_pago, Pago, Venta
+from .views import DetalleVentaViewSet, ExportarVentasView, VentaViewSet
+
+
+class DatosDeVentas(TestCase):
+    """Empresa con productos, pagos, envíos y stock para probar los listados."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nombre="Tienda", nit="100")
+        rol = Role.objects.create(name="ADMIN", empresa=cls.empresa)
+        cls.usuario = User.objects.create_user("admin@tienda.com", "x", empresa=cls.empresa, role=rol)
+        departamento = Departamento.objects.create(nombre="La Paz", empresa=cls.empresa)
+        cls.direccion = Direccion.objects.create(
+            pais="Bolivia", ciudad="La Paz", zona="Centro", calle="Ayacucho", numero="1",
+            departamento=departamento, empresa=cls.empresa,
+        )
+        cls.sucursal = Sucursal.objects.create(nombre="Central", empresa=cls.empresa)
+        cls.metodo = Metodo_pago.objects.create(nombre="Efectivo", empresa=cls.empresa)
+        cls.agencia = Agencia.objects.create(nombre="Rápido", contacto="Ana", empresa=cls.empresa)
+        cls.productos = [
+            Producto.objects.create(nombre=f"Producto {i}", precio_venta=Decimal("10"), empresa=cls.empresa)
+            for i in range(3)
+        ]
+
+    def _crear_ventas(self, cantidad):
+        for _ in range(cantidad):
+            pago = Pago.objects.create(metodo=self.metodo, monto=Decimal("30"), empresa=self.empresa)
+            venta = Venta.objects.create(
+                empresa=self.empresa, usuario=self.usuario, sucursal=self.sucursal, pago=pago,
+                fecha=timezone.now(), total=Decimal("30"),
+            )
+            for producto in self.productos:
+                DetalleVenta.objects.create(
+                    empresa=self.empresa, venta=venta, producto=producto, cantidad=1, precio_unitario=Decimal("10"),
+                )
+            Envio.objects.create(
+                empresa=self.empresa, venta=venta, cliente=self.usuario,
+                direccion_entrega=self.direccion, agencia=self.agencia,
+            )
+            sucursal = Sucursal.objects.create(nombre=f"Sucursal {venta.pk}", empresa=self.empresa)
+            for producto in self.productos:
+                StockSucursal.objects.create(empresa=self.empresa, producto=producto, sucursal=sucursal, stock=5)
+
+    def _listar(self, viewset, url="/"):
+        request = APIRequestFactory().get(url)
+        force_authenticate(request, user=self.usuario)
+        response = viewset.as_view({"get": "list"})(request)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def _post(self, accion, data, **extra):
+        request = APIRequestFactory().post("/", data, format="json", **extra)
+        force_authenticate(request, user=self.usuario)
+        return VentaViewSet.as_view({"post": accion})(request)
+
+    def _filas(self, response):
+        # Ventas y detalles vienen paginados por cursor: {"next", "previous", "results"}
+        return response.data["results"] if isinstance(response.data, dict) else response.data
+
+
+# ---------------------------------------------------------------------
+# 🔹 Listados sin N+1: las consultas no crecen con las filas de la página
+# ---------------------------------------------------------------------
+class ListadoSinNMasUnoTests(DatosDeVentas):
+    def test_consultas_constantes_por_pagina(self):
+        viewsets = [VentaViewSet, DetalleVentaViewSet, EnvioViewSet, StockSucursalViewSet]
+        self._crear_ventas(2)
+        consultas = {}
+        for viewset in viewsets:
+            # Usuario recién leído en cada vuelta: su rol no debe venir cacheado de la anterior
+            self.usuario = User.objects.get(pk=self.usuario.pk)
+            with CaptureQueriesContext(connection) as capturadas:
+                self._listar(viewset)
+            consultas[viewset] = len(capturadas)
+
+        self._crear_ventas(10)
+        for viewset in viewsets:
+            with self.subTest(viewset=viewset.__name__):
+                self.usuario = User.objects.get(pk=self.usuario.pk)
+                with self.assertNumQueries(consultas[viewset]):
+                    response = self._listar(viewset)
+                self.assertGreater(len(self._filas(response)), 10)
+
+    def test_venta_trae_detalles_y_pago(self):
+        self._crear_ventas(1)
+        venta = self._filas(self._listar(VentaViewSet))[0]
+        self.assertEqual(len(venta["detalles"]), 3)
+        self.assertEqual(venta["detalles"][0]["producto_nombre"], "Producto 0")
+        self.assertEqual(venta["pago_detalle"]["metodo_nombre"], "Efectivo")
+        self.assertEqual(venta["usuario_email"], "admin@tienda.com")
+
+
+# ---------------------------------------------------------------------
+# 🔹 Paginación por cursor
+# ---------------------------------------------------------------------
+class PaginacionCursorTests(DatosDeVentas):
+    def test_recorre_todas_las_ventas_una_vez(self):
+        self._crear_ventas(7)
+        vistas, url, consultas = [], "/?page_size=3", set()
+        while url:
+            self.usuario = User.objects.get(pk=self.usuario.pk)
+            with CaptureQueriesContext(connection) as capturadas:
+                response = self._listar(VentaViewSet, url)
+            consultas.add(len(capturadas))
+            vistas += [venta["id"] for venta in response.data["results"]]
+            url = response.data["next"]
+
+        esperadas = list(Venta.objects.order_by("-fecha", "-id").values_list("id", flat=True))
+        self.assertEqual(vistas, esperadas)
+        # La última página (1 venta) cuesta lo mismo que las anteriores
+        self.assertEqual(len(consultas), 1)
+
+
+# ---------------------------------------------------------------------
+# 🔹 registrar_venta: todo o nada
+# ---------------------------------------------------------------------
+class RegistrarVentaTests(DatosDeVentas):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for producto in cls.productos:
+            StockSucursal.objects.create(empresa=cls.empresa, producto=producto, sucursal=cls.sucursal, stock=5)
+
+    def _venta(self, *cantidades):
+        return {
+            "sucursal": self.sucursal.pk,
+            "pago": {"metodo": self.metodo.pk, "monto": "30"},
+            "detalles": [
+                {"producto": producto.pk, "cantidad": cantidad}
+                for producto, cantidad in zip(self.productos, cantidades)
+            ],
+        }
+
+    def _stock(self):
+        return list(
+            StockSucursal.objects.filter(sucursal=self.sucursal).order_by("producto_id").values_list("stock", flat=True)
+        )
+
+    def _sin_cambios(self):
+        self.assertFalse(Venta.objects.exists())
+        self.assertFalse(DetalleVenta.objects.exists())
+        self.assertFalse(Pago.objects.exists())
+        self.assertEqual(self._stock(), [5, 5, 5])
+
+    def test_registra_venta_pago_y_stock(self):
+        with self.captureOnCommitCallbacks(execute=False) as avisos:
+            response = self._post("registrar_venta", self._venta(1, 2, 3))
+        self.assertEqual(response.status_code, 201, response.data)
+        venta = Venta.objects.get()
+        self.assertEqual(venta.total, Decimal("60"))
+        self.assertEqual(venta.pago.metodo, self.metodo)
+        self.assertEqual(venta.detalles.count(), 3)
+        self.assertEqual(self._stock(), [4, 3, 2])
+        self.assertEqual(len(avisos), 1)
+
+    def test_reintento_con_idempotency_key_no_registra_otra(self):
+        primera = self._post("registrar_venta", self._venta(1, 2), HTTP_IDEMPOTENCY_KEY="caja-1-0001")
+        segunda = self._post("registrar_venta", self._venta(1, 2), HTTP_IDEMPOTENCY_KEY="caja-1-0001")
+        self.assertEqual(primera.status_code, 201)
+        self.assertEqual((segunda.status_code, segunda.data["id"]), (201, primera.data["id"]))
+        self.assertEqual(segunda["Idempotent-Replayed"], "true")
+        self.assertEqual(Venta.objects.count(), 1)
+        self.assertEqual(self._stock(), [4, 3, 5])
+
+    def test_linea_sin_stock_no_deja_nada(self):
+        with self.captureOnCommitCallbacks(execute=False) as avisos:
+            response = self._post("registrar_venta", self._venta(1, 2, 6))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Stock insuficiente", response.data["detail"])
+        self._sin_cambios()
+        self.assertEqual(avisos, [])
+
+    def test_producto_de_otra_empresa_no_deja_nada(self):
+        otra = Empresa.objects.create(nombre="Otra", nit="200")
+        ajeno = Producto.objects.create(nombre="Ajeno", precio_venta=Decimal("5"), empresa=otra)
+        data = self._venta(1, 1)
+        data["detalles"].append({"producto": ajeno.pk, "cantidad": 1})
+        response = self._post("registrar_venta", data)
+        self.assertEqual(response.status_code, 404)
+        self._sin_cambios()
+
+    def test_stock_descontado_por_otra_venta_a_la_mitad(self):
+        """
+        Otra venta descuenta el stock entre la lectura y el UPDATE (en bases
+        sin FOR UPDATE): el UPDATE condicional no alcanza en esa fila y se
+        deshace todo lo ya escrito (venta, detalles y pago).
+        """
+        bulk_create = DetalleVenta.objects.bulk_create
+
+        def con_venta_concurrente(*args, **kwargs):
+            creados = bulk_create(*args, **kwargs)
+            StockSucursal.objects.filter(sucursal=self.sucursal, producto=self.productos[2]).update(stock=1)
+            return creados
+
+        with mock.patch.object(DetalleVenta.objects, "bulk_create", side_effect=con_venta_concurrente):
+            response = self._post("registrar_venta", self._venta(1, 1, 3))
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Venta.objects.exists())
+        self.assertFalse(DetalleVenta.objects.exists())
+        self.assertFalse(Pago.objects.exists())
+        # Las líneas que sí alcanzaban tampoco quedaron descontadas (el UPDATE
+        # de la "otra" venta corre en esta misma transacción y también se deshace)
+        self.assertEqual(self._stock()[:2], [5, 5])
+
+    def test_consultas_constantes_por_linea(self):
+        # La primera venta reserva el bloque de numero_nota (tenants/secuencias.py)
+        services.registrar_venta(self.empresa, self.usuario, self.sucursal, self._venta(1)["detalles"])
+        with CaptureQueriesContext(connection) as una:
+            services.registrar_venta(self.empresa, self.usuario, self.sucursal, self._venta(1)["detalles"])
+        with CaptureQueriesContext(connection) as tres:
+            services.registrar_venta(self.empresa, self.usuario, self.sucursal, self._venta(1, 1, 1)["detalles"])
+        self.assertEqual(len(una), len(tres))
+
+
+# ---------------------------------------------------------------------
+# 🔹 sincronizar: ventas del POS sin conexión
+# ---------------------------------------------------------------------
+class SincronizarVentasTests(DatosDeVentas):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for producto in cls.productos:
+            StockSucursal.objects.create(empresa=cls.empresa, producto=producto, sucursal=cls.sucursal, stock=5)
+
+    def _venta(self, clave, *cantidades, producto_ids=None):
+        producto_ids = producto_ids or [producto.pk for producto in self.productos]
+        return {
+            "clave": clave,
+            "sucursal": self.sucursal.pk,
+            "fecha": "2025-03-01T10:00:00",
+            "pago": {"metodo": self.metodo.pk, "monto": "10"},
+            "detalles": [
+                {"producto": producto_id, "cantidad": cantidad}
+                for producto_id, cantidad in zip(producto_ids, cantidades)
+                if cantidad
+            ],
+        }
+
+    def _sincronizar(self, *ventas):
+        response = self._post("sincronizar", {"ventas": list(ventas)})
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def _stock(self):
+        return list(
+            StockSucursal.objects.filter(sucursal=self.sucursal).order_by("producto_id").values_list("stock", flat=True)
+        )
+
+    def _estados(self, data):
+        return [(r["clave"], r["estado"]) for r in data["resultados"]]
+
+    def test_reenviar_el_lote_no_duplica(self):
+        primero = self._sincronizar(self._venta("pos-1", 1), self._venta("pos-2", 0, 2))
+        self.assertEqual(primero["resumen"], {"creada": 2, "duplicada": 0, "rechazada": 0})
+        self.assertEqual(self._stock(), [4, 3, 5])
+
+        # El POS no recibió la respuesta y reenvía todo, con una venta nueva al final
+        segundo = self._sincronizar(
+            self._venta("pos-1", 1), self._venta("pos-2", 0, 2), self._venta("pos-3", 1),
+        )
+        self.assertEqual(
+            self._estados(segundo), [("pos-1", "duplicada"), ("pos-2", "duplicada"), ("pos-3", "creada")]
+        )
+        # Las ya aplicadas devuelven la venta que se creó la primera vez
+        for antes, despues in zip(primero["resultados"], segundo["resultados"]):
+            self.assertEqual(
+                (antes["venta_id"], antes["numero_nota"]), (despues["venta_id"], despues["numero_nota"])
+            )
+        self.assertEqual(Venta.objects.count(), 3)
+        self.assertEqual(Pago.objects.count(), 3)
+        self.assertEqual(self._stock(), [3, 3, 5])
+        self.assertEqual(
+            Venta.objects.get(clave_cliente="pos-1").fecha.date().isoformat(), "2025-03-01"
+        )
+
+    def test_clave_repetida_en_el_mismo_lote(self):
+        data = self._sincronizar(self._venta("pos-1", 1), self._venta("pos-1", 1))
+        self.assertEqual(self._estados(data), [("pos-1", "creada"), ("pos-1", "duplicada")])
+        self.assertEqual(self._stock(), [4, 5, 5])
+
+    def test_rechazadas_no_frenan_al_resto_del_lote(self):
+        otra = Empresa.objects.create(nombre="Otra", nit="200")
+        ajeno = Producto.objects.create(nombre="Ajeno", precio_venta=Decimal("5"), empresa=otra)
+        data = self._sincronizar(
+            self._venta("pos-1", 4),
+            # El stock se valida contra lo que dejaron las anteriores del lote: quedaba 1
+            self._venta("pos-2", 2),
+            self._venta("pos-3", 1, producto_ids=[ajeno.pk]),
+            {"sucursal": self.sucursal.pk, "detalles": [{"producto": self.productos[1].pk, "cantidad": 1}]},
+            self._venta("pos-5", 1, 1),
+        )
+        self.assertEqual(self._estados(data), [
+            ("pos-1", "creada"), ("pos-2", "rechazada"), ("pos-3", "rechazada"), (None, "rechazada"), ("pos-5", "creada"),
+        ])
+        self.assertIn("Stock insuficiente", data["resultados"][1]["detail"])
+        self.assertIn("no encontrado", data["resultados"][2]["detail"])
+        self.assertIn("clave", data["resultados"][3]["detail"])
+        self.assertEqual(set(Venta.objects.values_list("clave_cliente", flat=True)), {"pos-1", "pos-5"})
+        self.assertEqual(DetalleVenta.objects.count(), 3)
+        self.assertEqual(self._stock(), [0, 4, 5])
+
+        # Reenviar las rechazadas una vez corregidas: entran sin tocar las ya aplicadas
+        data = self._sincronizar(self._venta("pos-1", 4), self._venta("pos-2", 0, 2))
+        self.assertEqual(self._estados(data), [("pos-1", "duplicada"), ("pos-2", "creada")])
+        self.assertEqual(self._stock(), [0, 2, 5])
+
+    def test_canal_invalido_rechaza_solo_esa_venta(self):
+        data = self._sincronizar(
+            {**self._venta("pos-1", 1), "canal": "TELEFONO"},
+            {**self._venta("pos-2", 1), "canal": "WEB"},
+        )
+        self.assertEqual(self._estados(data), [("pos-1", "rechazada"), ("pos-2", "creada")])
+        self.assertIn("Canal de venta inválido", data["resultados"][0]["detail"])
+        self.assertEqual(Venta.objects.get().canal, "WEB")
+
+    def test_lote_que_falla_al_descontar_se_deshace_entero(self):
+        """
+        Con lotes de 2, el stock de una venta del primer lote cambia entre la
+        lectura y el UPDATE (en los dos intentos): ese lote entero queda
+        rechazado y el siguiente se aplica igual.
+        """
+        bulk_create = DetalleVenta.objects.bulk_create
+
+        def con_venta_concurrente(objetos, *args, **kwargs):
+            creados = bulk_create(objetos, *args, **kwargs)
+            if any(detalle.venta.clave_cliente == "pos-2" for detalle in creados):
+                StockSucursal.objects.filter(sucursal=self.sucursal, producto=self.productos[0]).update(stock=0)
+            return creados
+
+        with self.settings(VENTAS_SYNC_LOTE=2), \
+                mock.patch.object(DetalleVenta.objects, "bulk_create", side_effect=con_venta_concurrente):
+            data = self._sincronizar(
+                self._venta("pos-1", 0, 1), self._venta("pos-2", 1), self._venta("pos-3", 0, 0, 1),
+            )
+        self.assertEqual(
+            self._estados(data), [("pos-1", "rechazada"), ("pos-2", "rechazada"), ("pos-3", "creada")]
+        )
+        self.assertIn("El stock cambió", data["resultados"][0]["detail"])
+        self.assertEqual(list(Venta.objects.values_list("clave_cliente", flat=True)), ["pos-3"])
+        self.assertEqual(Pago.objects.count(), 1)
+        self.assertEqual(self._stock(), [5, 5, 4])
+
+
+# ---------------------------------------------------------------------
+# 🔹 Exportación de ventas (CSV / NDJSON en streaming)
+# ---------------------------------------------------------------------
+class ExportarVentasTests(DatosDeVentas):
+    def _exportar(self, url):
+        request = APIRequestFactory().get(url)
+        force_authenticate(request, user=self.usuario)
+        return ExportarVentasView.as_view()(request)
+
+    def _descargar(self, url):
+        response = self._exportar(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, list(response.streaming_content)
+
+    def test_csv_por_trozos(self):
+        self._crear_ventas(5)
+        with mock.patch.object(exportar, "FILAS_POR_TROZO", 2):
+            response, trozos = self._descargar("/?tipo=detalles")
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertEqual(response["Content-Disposition"], f'attachment; filename="detalles_{self.empresa.id}.csv"')
+        # Cabecera y 15 detalles de a 2 filas por trozo
+        self.assertEqual(len(trozos), 1 + 8)
+        filas = list(csv.DictReader(io.StringIO(b"".join(trozos).decode())))
+        self.assertEqual(len(filas), 15)
+        self.assertEqual(
+            [int(fila["id"]) for fila in filas],
+            list(DetalleVenta.objects.order_by("id").values_list("id", flat=True)),
+        )
+        self.assertEqual(filas[0]["producto"], "Producto 0")
+        self.assertEqual(filas[0]["subtotal"], "10.00")
+
+    def test_ndjson_con_rango_de_fechas(self):
+        self._crear_ventas(2)
+        vieja = Venta.objects.order_by("id").first()
+        Venta.objects.filter(pk=vieja.pk).update(fecha=timezone.now() - timedelta(days=40))
+        hoy = timezone.localdate().isoformat()
+        _, trozos = self._descargar(f"/?formato=ndjson&desde={hoy}&hasta={hoy}")
+        lineas = [json.loads(linea) for linea in b"".join(trozos).decode().splitlines()]
+        self.assertEqual([venta["id"] for venta in lineas], [Venta.objects.order_by("id").last().id])
+        self.assertEqual(lineas[0]["metodo_pago"], "Efectivo")
+        self.assertEqual(lineas[0]["total"], "30.00")
+
+    def test_gzip_es_el_mismo_archivo(self):
+        self._crear_ventas(3)
+        _, plano = self._descargar("/")
+        response, comprimido = self._descargar("/?gzip=1")
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        self.assertTrue(response["Content-Disposition"].endswith('.csv.gz"'))
+        self.assertEqual(gzip.decompress(b"".join(comprimido)), b"".join(plano))
+
+    def test_detalles_solo_de_ventas_de_la_empresa(self):
+        self._crear_ventas(1)
+        otra = Empresa.objects.create(nombre="Otra", nit="200")
+        ajena = Venta.objects.create(
+            empresa=otra, usuario=self.usuario, sucursal=Sucursal.objects.create(nombre="X", empresa=otra),
+            fecha=timezone.now(), total=Decimal("10"),
+        )
+        # Un detalle con la empresa equivocada no arrastra la venta de la otra empresa
+        DetalleVenta.objects.create(
+            empresa=self.empresa, venta=ajena, producto=self.productos[0], cantidad=1, precio_unitario=Decimal("10"),
+        )
+        _, trozos = self._descargar("/?tipo=detalles&formato=ndjson")
+        lineas = [json.loads(linea) for linea in b"".join(trozos).decode().splitlines()]
+        self.assertEqual(len(lineas), 3)
+        self.assertNotIn(ajena.id, {linea["venta_id"] for linea in lineas})
+
+    def test_plan_sin_exportaciones(self):
+        self.empresa.plan = Plan.objects.create(nombre="Básico", permite_exportar_excel=False)
+        self.empresa.save(update_fields=["plan"])
+        response = self._exportar("/")
+        self.assertEqual(response.status_code, 403)
+
+        Plan.objects.filter(pk=self.empresa.plan_id).update(permite_exportar_excel=True)
+        self.assertEqual(self._exportar("/").status_code, 200)
+
+    def test_parametros_invalidos(self):
+        self.assertEqual(self._exportar("/?tipo=pagos").status_code, 400)
+
+    def test_requiere_permiso_de_ver_ventas(self):
+        rol = Role.objects.create(name="CAJERO", empresa=self.empresa)
+        cajero = User.objects.create_user("caja@tienda.com", "x", empresa=self.empresa, role=rol)
+        request = APIRequestFactory().get("/")
+        force_authenticate(request, user=cajero)
+        self.assertEqual(ExportarVentasView.as_view()(request).status_code, 403)
 
-# Create your tests here.
+        Permission.objects.create(role=rol, module=Module.objects.create(name="Venta"), can_view=True)
+        request = APIRequestFactory().get("/")
+        force_authenticate(request, user=cajero)
+        self.assertEqual(ExportarVentasView.as_view()(request).status_code, 200)
+        self.assertEqual(self._exportar("/?formato=xlsx").status_code, 400)
+        self.assertEqual(self._exportar("/?desde=01-02-2025").status_code, 400)
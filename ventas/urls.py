@@ -6,6 +6,7 @@ from .views import (
     VentaViewSet,
     DetalleVentaViewSet,
     CrearStripePaymentIntentView,
+    ExportarVentasView,
 )
 
 router = DefaultRouter()
@@ -21,4 +22,5 @@ urlpatterns = [
         CrearStripePaymentIntentView.as_view(), 
         name='crear_payment_intent'
     ),
+    path('exportar-ventas/', ExportarVentasView.as_view(), name='exportar_ventas'),
 ]
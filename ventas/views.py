@@ -1,12 +1,19 @@
 # ventas/views.py
 import stripe
+from datetime import datetime, time, timedelta
 from django.conf import settings
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from utils.viewsets import SoftDeleteViewSet
 from utils.permissions import ModulePermission
 from utils.logging_utils import log_action
+from utils.idempotency import clave_de, idempotente
+from utils.pagination import FechaCursorPagination, IdCursorPagination
 from rest_framework.views import APIView
 import logging
 
@@ -15,14 +22,15 @@ logger = logging.getLogger(__name__)
 stripe.api_key = settings.STRIPE_SECRET_KEY
 
 from .models import Metodo_pago, Pago, Venta, DetalleVenta
+from . import exportar, services
 from .serializers import (
     MetodoPagoSerializer,
     PagoSerializer,
     VentaSerializer,
     DetalleVentaSerializer,
 )
-from products.models import Producto
-from sucursales.models import Sucursal, StockSucursal
+from sucursales.models import Sucursal
+from tenants.models import Empresa
 
 # ---------------------------------------------------------------------
 # 🔹 ViewSet: Métodos de Pago
@@ -49,6 +57,7 @@ class VentaViewSet(SoftDeleteViewSet):
     queryset = Venta.objects.all().order_by("-fecha")
     serializer_class = VentaSerializer
     module_name = "Venta"
+    pagination_class = FechaCursorPagination
 
     @action(detail=True, methods=["get"], url_path="detalles")
     def obtener_detalles(self, request, pk=None):
@@ -61,9 +70,14 @@ class VentaViewSet(SoftDeleteViewSet):
         return Response(serializer.data)
 
     @action(detail=False, methods=["post"], url_path="registrar")
+    @idempotente
     def registrar_venta(self, request):
         """
         Permite registrar una nueva venta con sus detalles.
+        Todo o nada: la venta, el pago, los detalles y el descuento de stock
+        se confirman juntos (ver ventas/services.py).
+        Con cabecera Idempotency-Key un reintento devuelve la misma venta
+        en vez de registrar otra (ver utils/idempotency.py).
         """
         data = request.data
         user = request.user
@@ -83,73 +97,30 @@ class VentaViewSet(SoftDeleteViewSet):
                 status=400
             )
         canal_venta = data.get("canal", "POS") # 'POS' como default si no se envía
-        # Crear el pago si viene incluido
-        pago_data = data.get("pago")
-        pago_instance = None
-        if pago_data:
-            pago_serializer = PagoSerializer(data=pago_data)
-            pago_serializer.is_valid(raise_exception=True)
-            pago_instance = pago_serializer.save(empresa=empresa)
-            
-        # Crear la venta
-        venta = Venta.objects.create(
-            empresa=empresa,
-            usuario=user,
-            sucursal=sucursal,
-            canal=canal_venta,
-            pago=pago_instance,
-            total=data.get("total", 0),
-            estado=data.get("estado", "pendiente"),
-        )
-
-        # Crear los detalles Y ACTUALIZAR STOCK
-        for det in detalles:
-            producto_id = det.get("producto")
-            cantidad = det.get("cantidad")
-            precio = det.get("precio_unitario")
-
-            try:
-                producto = Producto.objects.get(id=producto_id, empresa=empresa)
-            except Producto.DoesNotExist:
-                return Response(
-                    {"detail": f"Producto ID {producto_id} no encontrado o pertenece a otra empresa."},
-                    status=404,
-                )
 
-            # ✅ CREAR DETALLE DE VENTA
-            DetalleVenta.objects.create(
-                empresa=empresa,
-                venta=venta,
-                producto=producto,
-                cantidad=cantidad,
-                precio_unitario=precio,
-                subtotal=cantidad * float(precio),
-            )
+        try:
+            with transaction.atomic():
+                # Crear el pago si viene incluido (se descarta si la venta no se registra)
+                pago_data = data.get("pago")
+                pago_instance = None
+                if pago_data:
+                    pago_serializer = PagoSerializer(data=pago_data)
+                    pago_serializer.is_valid(raise_exception=True)
+                    pago_instance = pago_serializer.save(empresa=empresa)
 
-            # ✅ ACTUALIZAR STOCK EN LA SUCURSAL ESPECÍFICA
-            try:
-                stock_item = StockSucursal.objects.get(
+                # Crear la venta, los detalles Y ACTUALIZAR STOCK (en la sucursal de la venta)
+                venta = services.registrar_venta(
                     empresa=empresa,
-                    producto=producto,
-                    sucursal=sucursal  # ← MISMA SUCURSAL DE LA VENTA
-                )
-                
-                # Verificar que haya suficiente stock
-                if stock_item.stock < cantidad:
-                    return Response(
-                        {"detail": f"Stock insuficiente para {producto.nombre}. Stock disponible: {stock_item.stock}, solicitado: {cantidad}"},
-                        status=400
-                    )
-                
-                # Reducir el stock
-                stock_item.stock -= cantidad
-                stock_item.save()
-                
-            except StockSucursal.DoesNotExist:
-                return Response(
-                    {"detail": f"Producto {producto.nombre} no tiene stock registrado en la sucursal {sucursal.nombre}"},
-                    status=400
+                    usuario=user,
+                    sucursal=sucursal,
+                    detalles=detalles,
+                    canal=canal_venta,
+                    pago=pago_instance,
+                    total=data.get("total"),
+                    estado=data.get("estado", "pendiente"),
                 )
+        except services.VentaRechazada as e:
+            return Response({"detail": e.detail}, status=e.status)
 
         log_action(
             user=user,
@@ -160,16 +131,58 @@ class VentaViewSet(SoftDeleteViewSet):
         )
 
         return Response(VentaSerializer(venta).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=["post"], url_path="sincronizar")
+    def sincronizar(self, request):
+        """
+        Sube de una vez las ventas que un POS hizo sin conexión:
+        {"ventas": [{"clave", "sucursal", "detalles", "fecha", "pago", ...}]}.
+        Cada venta trae una `clave` generada en la caja: reenviar el mismo lote
+        no duplica las que ya se aplicaron. Responde el resultado de cada una.
+        """
+        user = request.user
+        empresa = getattr(user, "empresa", None)
+        ventas = request.data.get("ventas")
+        if not isinstance(ventas, list) or not ventas:
+            return Response({"detail": "Debe incluir la lista 'ventas'."}, status=400)
+        maximo = getattr(settings, "VENTAS_SYNC_MAX", 1000)
+        if len(ventas) > maximo:
+            return Response(
+                {"detail": f"Se pueden sincronizar hasta {maximo} ventas por request."}, status=400
+            )
+
+        resultados = services.sincronizar_ventas(empresa, user, ventas)
+        resumen = {
+            estado: sum(r["estado"] == estado for r in resultados)
+            for estado in (services.CREADA, services.DUPLICADA, services.RECHAZADA)
+        }
+
+        # Una entrada en la bitácora por sincronización, no una por venta
+        if resumen[services.CREADA]:
+            log_action(
+                user=user,
+                modulo=self.module_name,
+                accion="CREAR",
+                descripcion=(
+                    f"Sincronizó {resumen[services.CREADA]} venta(s) del POS "
+                    f"({resumen[services.DUPLICADA]} ya aplicada(s), {resumen[services.RECHAZADA]} rechazada(s))"
+                ),
+                request=request,
+            )
+
+        return Response({"resumen": resumen, "resultados": resultados}, status=status.HTTP_200_OK)
 # ---------------------------------------------------------------------
 # 🔹 ViewSet: Detalles de Venta
 # ---------------------------------------------------------------------
 class DetalleVentaViewSet(SoftDeleteViewSet):
-    queryset = DetalleVenta.objects.all().order_by("venta__id")
+    queryset = DetalleVenta.objects.all().order_by("id")
     serializer_class = DetalleVentaSerializer
     module_name = "DetalleVenta"
+    pagination_class = IdCursorPagination
 
 class CrearStripePaymentIntentView(APIView):
 
+    @idempotente
     def post(self, request, *args, **kwargs):
         # 1. Recibimos los productos del carrito (igual que en tu Node.js)
         productos = request.data.get('productos', [])
@@ -198,6 +211,9 @@ class CrearStripePaymentIntentView(APIView):
                 amount=int(total * 100), # Stripe usa centavos (ej: $10.50 son 1050)
                 currency='bob', # O 'usd', 'eur', etc.
                 automatic_payment_methods={'enabled': True},
+                # La misma clave también en Stripe: aunque la respuesta guardada ya
+                # se haya purgado, Stripe devuelve el mismo PaymentIntent
+                idempotency_key=clave_de(request),
             )
 
             # 4. Le devolvemos la "llave" a React
@@ -211,3 +227,82 @@ class CrearStripePaymentIntentView(APIView):
                 {'error': f"Error de pago: {e}"}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+
+# ---------------------------------------------------------------------
+# 🔹 Exportación de ventas (CSV / NDJSON en streaming)
+# ---------------------------------------------------------------------
+class ExportarVentasView(APIView):
+    """
+    Descarga las ventas o los detalles de venta de la empresa sin armar la
+    lista en memoria (ver ventas/exportar.py). Requiere un plan con
+    `permite_exportar_excel`.
+
+    Query params:
+      - tipo: ventas (default) o detalles
+      - formato: csv (default) o ndjson
+      - desde, hasta: fechas AAAA-MM-DD de la venta, ambas incluidas
+      - gzip: 1 para descargar el archivo comprimido (.gz)
+      - empresa: solo SUPER_ADMIN (default: la del usuario)
+    """
+    permission_classes = [ModulePermission]
+    module_name = "Venta"
+
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        tipo = params.get("tipo", "ventas")
+        formato = params.get("formato", "csv").lower()
+        if tipo not in exportar.COLUMNAS:
+            return Response({"detail": "'tipo' debe ser 'ventas' o 'detalles'."}, status=status.HTTP_400_BAD_REQUEST)
+        if formato not in exportar.FORMATOS:
+            return Response({"detail": "'formato' debe ser 'csv' o 'ndjson'."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            desde = self._dia(params.get("desde"))
+            hasta = self._dia(params.get("hasta"))
+        except ValueError:
+            return Response({"detail": "'desde' y 'hasta' deben tener el formato AAAA-MM-DD."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if hasta is not None:
+            hasta += timedelta(days=1)  # 'hasta' incluye ese día completo
+
+        user = request.user
+        if user.is_superuser or getattr(user.role, "name", "") == "SUPER_ADMIN":
+            empresa_id = params.get("empresa") or getattr(user, "empresa_id", None)
+        else:
+            empresa_id = getattr(user, "empresa_id", None)
+        empresa = Empresa.objects.select_related("plan").filter(pk=empresa_id).first() if empresa_id else None
+        if empresa is None:
+            return Response({"detail": "Empresa no encontrada."}, status=status.HTTP_404_NOT_FOUND)
+        if empresa.plan is not None and not empresa.plan.permite_exportar_excel:
+            return Response({"detail": "El plan de la empresa no incluye exportaciones."},
+                            status=status.HTTP_403_FORBIDDEN)
+
+        comprimir = params.get("gzip") in ("1", "true")
+        content_type, extension = exportar.FORMATOS[formato]
+        nombre = f"{tipo}_{empresa.id}.{extension}"
+        tuplas = exportar.filas(tipo, empresa.id, desde, hasta)
+        respuesta = StreamingHttpResponse(
+            exportar.contenido(tipo, formato, tuplas, comprimir),
+            content_type="application/gzip" if comprimir else f"{content_type}; charset=utf-8",
+        )
+        respuesta["Content-Disposition"] = f'attachment; filename="{nombre}{".gz" if comprimir else ""}"'
+
+        log_action(
+            user=user,
+            modulo="Venta",
+            accion="OTRO",
+            descripcion=f"Exportó {tipo} ({formato}{', gzip' if comprimir else ''}) "
+                        f"desde {params.get('desde') or 'el inicio'} hasta {params.get('hasta') or 'hoy'}",
+            request=request,
+        )
+        return respuesta
+
+    @staticmethod
+    def _dia(valor):
+        """Inicio del día `valor` (AAAA-MM-DD) en la zona horaria del proyecto; None si no viene."""
+        if not valor:
+            return None
+        dia = parse_date(valor)
+        if dia is None:
+            raise ValueError(valor)
+        return timezone.make_aware(datetime.combine(dia, time.min))